@@ -0,0 +1,149 @@
+"""
+Adaptive Model Refresh Module for Keystroke Dynamics Authentication Backend
+
+This module lets models follow a user's typing as it drifts without extra
+enrollment calls. /predict offers the feature vector of every genuine
+sample scoring clearly above the user's decision threshold; accepted
+samples are buffered in memory and a background thread periodically hands
+each user's buffered samples to the app, which stores them with one append
+and schedules one training run per user. Nothing is written or fitted on
+the request path.
+
+Each user may contribute at most max_per_user samples per rate window, so
+a burst of logins cannot swamp their history, and the buffer is bounded;
+samples offered beyond either limit are dropped. Limits and buffers are
+kept per worker process.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+ACCEPTED = 'accepted'
+RATE_LIMITED = 'rate_limited'
+BUFFER_FULL = 'buffer_full'
+
+
+class AdaptiveRefresh:
+    """Buffers accepted /predict samples and folds them into models in batches."""
+
+    def __init__(self, apply, interval_seconds=300.0, max_per_user=5, rate_window_seconds=86400.0,
+                 max_pending=10000):
+        """
+        Args:
+            apply (callable): Stores and trains one user's batch, called as
+                              apply(user_id, schema, features_list) from the
+                              refresh thread
+            interval_seconds (float): Time between batched refreshes
+            max_per_user (int): Samples accepted per user per rate window
+            rate_window_seconds (float): Length of the per-user rate window
+            max_pending (int): Samples buffered between refreshes
+        """
+        self.apply = apply
+        self.interval_seconds = interval_seconds
+        self.max_per_user = max_per_user
+        self.rate_window_seconds = rate_window_seconds
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        # user_id -> (schema, feature vectors) waiting for the next refresh
+        self._pending = {}
+        self._n_pending = 0
+        # user_id -> monotonic times of the samples accepted in the rate window
+        self._accepted = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+        self.offered = {ACCEPTED: 0, RATE_LIMITED: 0, BUFFER_FULL: 0}
+        self.refreshed_users = 0
+        self.failed_users = 0
+
+    @property
+    def pending(self):
+        """Number of samples waiting for the next refresh."""
+        return self._n_pending
+
+    def offer(self, user_id, schema, features):
+        """
+        Offer a high-confidence genuine sample for the user's next refresh.
+
+        Only updates memory; the refresh thread is started on first use.
+
+        Args:
+            user_id (str): Unique identifier for the user
+            schema (str): Feature schema of the user's model
+            features (list): Feature vector of the sample
+
+        Returns:
+            str: 'accepted', 'rate_limited' or 'buffer_full'
+        """
+        now = time.monotonic()
+        with self._lock:
+            accepted = self._accepted.setdefault(user_id, deque())
+            while accepted and accepted[0] <= now - self.rate_window_seconds:
+                accepted.popleft()
+            if len(accepted) >= self.max_per_user:
+                result = RATE_LIMITED
+            elif self._n_pending >= self.max_pending:
+                result = BUFFER_FULL
+            else:
+                result = ACCEPTED
+                accepted.append(now)
+                entry = self._pending.get(user_id)
+                if entry is None or entry[0] != schema:
+                    # A schema change drops samples buffered for the old model
+                    self._n_pending -= len(entry[1]) if entry is not None else 0
+                    entry = self._pending[user_id] = (schema, [])
+                entry[1].append(features)
+                self._n_pending += 1
+            if not accepted:
+                del self._accepted[user_id]
+            self.offered[result] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='adaptive-refresh', daemon=True)
+                self._thread.start()
+        return result
+
+    def flush(self):
+        """Hand every buffered batch to apply, one user at a time."""
+        with self._lock:
+            pending, self._pending, self._n_pending = self._pending, {}, 0
+            self._expire_rate_limits()
+
+        for user_id, (schema, features_list) in pending.items():
+            try:
+                self.apply(user_id, schema, features_list)
+                self.refreshed_users += 1
+            except Exception as e:
+                self.failed_users += 1
+                logger.warning(f"Could not refresh model for user {user_id} with {len(features_list)} samples: {e}")
+        if pending:
+            logger.info(f"Adaptive refresh stored {sum(len(batch) for _, batch in pending.values())} samples "
+                        f"of {len(pending)} users")
+
+    def stop(self):
+        """Stop the refresh thread and refresh the samples still buffered."""
+        self._stop.set()
+        self.flush()
+
+    def _expire_rate_limits(self):
+        """Drop rate windows without recent samples. Called with the lock held."""
+        deadline = time.monotonic() - self.rate_window_seconds
+        for user_id in [user_id for user_id, accepted in self._accepted.items() if accepted[-1] <= deadline]:
+            del self._accepted[user_id]
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.flush()
+
+    def status(self):
+        """Counters for /health."""
+        return {
+            'pending_samples': self._n_pending,
+            'offered': dict(self.offered),
+            'refreshed_users': self.refreshed_users,
+            'failed_users': self.failed_users
+        }
@@ -12,16 +12,35 @@ Author: Generated for Samsung Prism Project
 Date: August 27, 2025
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from sklearn.ensemble import IsolationForest
 import numpy as np
-import joblib
 import os
 import json
 import logging
+import atexit
+import multiprocessing
+import random
+import time
+import uuid
 from datetime import datetime
+from itertools import count, repeat
+from operator import itemgetter
 from config import get_config, FeatureExtractionConfig, ModelConfig, APIConfig, DEFAULT_MODEL_METADATA
+from training import IncrementalUpdateUnsupported, fit_full_model, needs_full_refit, update_model_incrementally
+from training_queue import TrainingQueue, TrainingQueueFull
+from model_cache import ModelCache, estimate_model_bytes
+from model_warmup import AccessLog, ModelWarmer
+from adaptive_refresh import AdaptiveRefresh
+from storage import create_storage
+from user_locks import UserLocks
+from bulk_enrollment import extract_user_samples, get_extraction_executor
+from keystroke_stream import press_timings, sliding_window_features, window_features
+from sessions import SessionStore, TypingSession
+from compact_forest import FlatForest
+from feature_schema import FEATURE_SCHEMAS, POSITIONAL_SCHEMA, FIXED_SCHEMA, fixed_features, sample_presses
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry, StageTimer
+from structured_logging import dropped_records, setup_logging
 
 # Initialize Flask application
 app = Flask(__name__)
@@ -61,23 +80,90 @@ if config.ENABLE_CORS:
             }
         })
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format=config.LOG_FORMAT
-)
+# Configure logging: records are queued and written by a background thread
+setup_logging(config)
 logger = logging.getLogger(__name__)
+request_logger = logging.getLogger(f"{__name__}.requests")
+
+# Marks high-volume log records that are only kept for LOG_SAMPLE_RATE of calls
+SAMPLED = {'sampled': True}
 
 # Create model directory if it doesn't exist
 if not os.path.exists(config.MODEL_DIR):
     os.makedirs(config.MODEL_DIR)
     logger.info(f"Created directory: {config.MODEL_DIR}")
 
-# Global model cache for better performance
-model_cache = {} if config.MODEL_CACHE_ENABLED else None
+# Per-user samples, metadata and models
+storage = create_storage(config)
+
+# Serializes training and metadata updates of a user across threads and processes
+user_locks = UserLocks(os.path.join(config.MODEL_DIR, 'locks'))
+
+# Event type marking a key press in keystroke data
+DOWN_EVENTS = frozenset(['down'])
+
+# Global model cache for better performance, bounded by entry count and estimated model bytes
+model_cache = ModelCache(
+    max_entries=config.MODEL_CACHE_MAX_ENTRIES,
+    max_bytes=config.MODEL_CACHE_MAX_MB * 1024 * 1024
+) if config.MODEL_CACHE_ENABLED else None
+
+# Recently scored users, read at startup to choose the models to preload
+access_log = AccessLog(os.path.join(config.MODEL_DIR, 'access.log'), flush_seconds=config.ACCESS_LOG_FLUSH_SECONDS)
+atexit.register(access_log.flush)
+
+# Continuous authentication sessions of this worker process
+sessions = SessionStore(max_sessions=config.MAX_SESSIONS, ttl_seconds=config.SESSION_TTL_SECONDS)
+
+# Metrics exposed on /metrics, kept per worker process
+metrics = MetricsRegistry()
+http_requests = metrics.counter(
+    'keystroke_http_requests_total', 'HTTP requests by endpoint and status code', ('endpoint', 'status'))
+http_request_duration = metrics.histogram(
+    'keystroke_http_request_duration_seconds', 'Time to build the response of a request', ('endpoint',))
+stage_duration = metrics.histogram(
+    'keystroke_request_stage_duration_seconds', 'Time spent in each stage of /train and /predict', ('endpoint', 'stage'))
+predictions = metrics.counter(
+    'keystroke_predictions_total', 'Samples scored by /predict by decision', ('result',))
+model_fit_duration = metrics.histogram(
+    'keystroke_model_fit_duration_seconds', 'Time to fit or update a model', ('mode',))
+training_samples = metrics.histogram(
+    'keystroke_training_samples', 'Stored samples per model training run', ('mode',),
+    buckets=(5, 10, 20, 50, 100, 200, 500, 1000, 5000))
+training_jobs = metrics.counter(
+    'keystroke_training_jobs_total', 'Finished background training jobs by status', ('status',))
+training_fits_deduplicated = metrics.counter(
+    'keystroke_training_fits_deduplicated_total', 'Training runs skipped because the model already covered every sample')
+adaptive_samples = metrics.counter(
+    'keystroke_adaptive_refresh_samples_total', 'Genuine /predict samples offered for adaptive refresh by result', ('result',))
+
+
+def _model_cache_metrics():
+    """Model cache statistics in metric form, collected when /metrics is rendered."""
+    if model_cache is None:
+        return []
+    stats = model_cache.stats()
+    return [
+        ('keystroke_model_cache_hits_total', 'counter', 'Model cache hits', stats['hits']),
+        ('keystroke_model_cache_misses_total', 'counter', 'Model cache misses', stats['misses']),
+        ('keystroke_model_cache_hit_ratio', 'gauge', 'Model cache hits per lookup', stats['hit_ratio']),
+        ('keystroke_model_cache_evictions_total', 'counter', 'Models evicted from the cache', stats['evictions']),
+        ('keystroke_model_cache_entries', 'gauge', 'Cached user models', stats['entries']),
+        ('keystroke_model_cache_bytes', 'gauge', 'Estimated memory of cached models', stats['bytes'])
+    ]
+
+
+def _logging_metrics():
+    """Log records dropped by the logging queue, collected when /metrics is rendered."""
+    return [('keystroke_log_records_dropped_total', 'counter', 'Log records dropped because the logging queue was full',
+             dropped_records())]
+
+
+metrics.register_collector(_model_cache_metrics)
+metrics.register_collector(_logging_metrics)
 
 
-def extract_features(keystroke_data):
+def extract_features(keystroke_data, schema=None):
     """
     Extract meaningful features from raw keystroke data.
     
@@ -86,9 +172,19 @@ def extract_features(keystroke_data):
     2. Keydown-Keydown Time: Time between consecutive keydown events  
     3. Keyup-Keydown Time (Flight Time): Time between keyup and next keydown
     
+    The events are converted to NumPy arrays once and all timings are computed
+    with array operations. Each keydown is paired with the event that precedes
+    it in the pairing chain (the first event, then every keydown in turn), and
+    hold/flight times use the last keydown and keyup seen for each key.
+    
+    The timings are laid out according to the feature schema (see
+    feature_schema.py): in typing order for 'positional', or as per-key
+    aggregates and summary statistics of constant length for 'fixed'.
+    
     Args:
         keystroke_data (list): List of dictionaries with format:
                               [{'key': 'a', 'event': 'down', 'timestamp': 123}, ...]
+        schema (str): Feature schema, defaults to the configured FEATURE_SCHEMA
     
     Returns:
         list: Feature vector containing calculated timing features in seconds
@@ -104,137 +200,183 @@ def extract_features(keystroke_data):
         logger.warning(f"Too many keystroke events ({len(keystroke_data)}), truncating to {config.MAX_KEYSTROKE_EVENTS}")
         keystroke_data = keystroke_data[:config.MAX_KEYSTROKE_EVENTS]
     
-    # Group events by key to match press/release pairs
-    key_events = {}
-    event_sequence = []
+    scale = FeatureExtractionConfig.FEATURE_SCALE_FACTOR
+    n_events = len(keystroke_data)
     
-    # First pass: organize events and create sequence
-    for event in keystroke_data:
-        key = event['key']
-        event_type = event['event']
-        timestamp = event['timestamp']
-        
-        if key not in key_events:
-            key_events[key] = {'down': None, 'up': None}
-            
-        if event_type == 'down':
-            key_events[key]['down'] = timestamp
-        elif event_type == 'up':
-            key_events[key]['up'] = timestamp
-            
-        event_sequence.append({
-            'key': key,
-            'event': event_type,
-            'timestamp': timestamp
-        })
+    # Convert the event list to columns once
+    keys = list(map(itemgetter('key'), keystroke_data))
+    event_types = list(map(itemgetter('event'), keystroke_data))
+    timestamps = np.fromiter(map(itemgetter('timestamp'), keystroke_data), dtype=float, count=n_events)
+    is_down = np.fromiter(map(DOWN_EVENTS.__contains__, event_types), dtype=bool, count=n_events)
     
-    features = []
+    # Last keydown and keyup timestamp of every key (NaN if never seen);
+    # later events overwrite earlier ones for the same (key, event) pair
+    last_seen = dict(zip(zip(keys, event_types), timestamps.tolist()))
+    distinct_keys = list(dict.fromkeys(keys))
+    key_ids = np.fromiter(map(dict(zip(distinct_keys, count())).__getitem__, keys), dtype=np.intp, count=n_events)
+    last_down = np.fromiter(map(last_seen.get, zip(distinct_keys, repeat('down')), repeat(np.nan)), dtype=float, count=len(distinct_keys))
+    last_up = np.fromiter(map(last_seen.get, zip(distinct_keys, repeat('up')), repeat(np.nan)), dtype=float, count=len(distinct_keys))
     
-    # Process consecutive key pairs to extract features
-    # Following the logic from KeyDataStore.java
-    i = 0
-    while i < len(event_sequence) - 1:
-        current_event = event_sequence[i]
-        
-        # Find the next keydown event to form a pair
-        next_keydown_idx = i + 1
-        while (next_keydown_idx < len(event_sequence) and 
-               event_sequence[next_keydown_idx]['event'] != 'down'):
-            next_keydown_idx += 1
-            
-        if next_keydown_idx >= len(event_sequence):
-            break
-            
-        next_event = event_sequence[next_keydown_idx]
+    hold_times = (last_up - last_down) / scale
+    valid_hold = (hold_times > 0) & (hold_times <= FeatureExtractionConfig.MAX_HOLD_TIME)
+    
+    # Pairs: every keydown after the first event, paired with the previous chain position
+    next_idx = np.flatnonzero(is_down[1:]) + 1
+    current_idx = np.concatenate(([0], next_idx[:-1]))[:len(next_idx)]
+    current_keys = key_ids[current_idx]
+    
+    # 1. Hold Time of the current key
+    pair_hold_valid = valid_hold[current_keys]
+    
+    # 2. Keydown-Keydown Time between the current keydown and the next keydown
+    pair_dd = (timestamps[next_idx] - timestamps[current_idx]) / scale
+    pair_dd_valid = is_down[current_idx] & (pair_dd > FeatureExtractionConfig.MIN_TIMING)
+    
+    # 3. Keyup-Keydown Time between the current key's keyup and the next keydown
+    pair_ud = (timestamps[next_idx] - last_up[current_keys]) / scale
+    pair_ud_valid = (pair_ud > 0) & (pair_ud <= FeatureExtractionConfig.MAX_FLIGHT_TIME)
+    
+    last_key = key_ids[-1]
+    skipped_holds = int(np.count_nonzero(~pair_hold_valid & ~np.isnan(hold_times[current_keys])))
+    if skipped_holds:
+        logger.warning(f"Skipped {skipped_holds} invalid hold times")
+    
+    if (schema or config.FEATURE_SCHEMA) == FIXED_SCHEMA:
+        # Hold times in pairing order, including the last key, as in the positional layout
+        holds = hold_times[current_keys][pair_hold_valid]
+        if valid_hold[last_key]:
+            holds = np.append(holds, hold_times[last_key])
+        timings = (holds, pair_dd[pair_dd_valid], pair_ud[pair_ud_valid])
+        if not any(len(values) for values in timings):
+            logger.warning("No valid timings in keystroke data")
+            return []
         
-        # Calculate features for this key pair
-        current_key = current_event['key']
+        features = fixed_features(
+            distinct_keys,
+            np.where(valid_hold, hold_times, np.nan),
+            current_keys[pair_dd_valid],
+            timings[1],
+            timings,
+            int(np.count_nonzero(is_down))
+        )
+    else:
+        # Interleave per pair as [hold, keydown-keydown, keyup-keydown]
+        values = np.stack((hold_times[current_keys], pair_dd, pair_ud), axis=1)
+        valid = np.stack((pair_hold_valid, pair_dd_valid, pair_ud_valid), axis=1)
+        features = values[valid].tolist()
         
-        # 1. Hold Time: Time between keydown and keyup for current key
-        if (key_events[current_key]['down'] is not None and 
-            key_events[current_key]['up'] is not None):
-            hold_time = (key_events[current_key]['up'] - key_events[current_key]['down']) / FeatureExtractionConfig.FEATURE_SCALE_FACTOR
-            
-            # Apply feature validation
-            if 0 < hold_time <= FeatureExtractionConfig.MAX_HOLD_TIME:
-                features.append(hold_time)
-            else:
-                logger.warning(f"Invalid hold time: {hold_time}s, skipping")
-        
-        # 2. Keydown-Keydown Time: Time between consecutive keydown events
-        if current_event['event'] == 'down' and next_event['event'] == 'down':
-            dd_time = (next_event['timestamp'] - current_event['timestamp']) / FeatureExtractionConfig.FEATURE_SCALE_FACTOR
-            if dd_time > FeatureExtractionConfig.MIN_TIMING:
-                features.append(dd_time)
-        
-        # 3. Keyup-Keydown Time: Time between keyup and next keydown
-        # Find the keyup event for current key
-        current_keyup_time = key_events[current_key]['up']
-        if current_keyup_time is not None:
-            ud_time = (next_event['timestamp'] - current_keyup_time) / FeatureExtractionConfig.FEATURE_SCALE_FACTOR
-            if 0 < ud_time <= FeatureExtractionConfig.MAX_FLIGHT_TIME:
-                features.append(ud_time)
-        
-        i = next_keydown_idx
-    
-    # Add hold time for the last key
-    if len(event_sequence) > 0:
-        last_key = event_sequence[-1]['key']
-        if (key_events[last_key]['down'] is not None and 
-            key_events[last_key]['up'] is not None):
-            last_hold_time = (key_events[last_key]['up'] - key_events[last_key]['down']) / FeatureExtractionConfig.FEATURE_SCALE_FACTOR
-            if 0 < last_hold_time <= FeatureExtractionConfig.MAX_HOLD_TIME:
-                features.append(last_hold_time)
-    
-    logger.info(f"Extracted {len(features)} features from {len(keystroke_data)} keystroke events")
+        # Add hold time for the last key
+        if valid_hold[last_key]:
+            features.append(float(hold_times[last_key]))
+    
+    logger.debug("Extracted %s features from %s keystroke events", len(features), len(keystroke_data), extra=SAMPLED)
     return features
 
 
-def load_user_features(user_id):
+def get_user_feature_schema(user_id, metadata=None):
+    """
+    Get the feature schema a user is enrolled with.
+    
+    The schema is recorded in the model metadata; models saved before it was
+    recorded use the positional schema. Users without a model yet keep the
+    schema of the samples they already have, and new users get FEATURE_SCHEMA.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        metadata (dict): Stored model metadata if already loaded by the caller
+        
+    Returns:
+        str: Feature schema name
+    """
+    if metadata is None:
+        metadata = load_user_metadata(user_id)
+    if metadata:
+        return metadata.get('feature_schema', POSITIONAL_SCHEMA)
+    
+    for schema in (config.FEATURE_SCHEMA,) + FEATURE_SCHEMAS:
+        if storage.has_samples(user_id, schema):
+            return schema
+    return config.FEATURE_SCHEMA
+
+
+def load_user_features(user_id, schema=None):
     """
     Load previously saved feature samples for a user.
     
+    Samples are float32 arrays; with file storage they are read-only views
+    into the memory-mapped sample log.
+    
     Args:
         user_id (str): Unique identifier for the user
+        schema (str): Feature schema of the samples, defaults to the user's schema
         
     Returns:
         list: List of feature vectors, empty list if no data exists
     """
-    features_file = os.path.join(config.MODEL_DIR, f"{user_id}_features.npy")
-    if os.path.exists(features_file):
-        try:
-            features = np.load(features_file, allow_pickle=True).tolist()
-            logger.info(f"Loaded {len(features)} existing feature samples for user {user_id}")
-            return features
-        except Exception as e:
-            logger.error(f"Error loading features for user {user_id}: {e}")
-            return []
-    return []
+    try:
+        features = storage.read_samples(user_id, schema or get_user_feature_schema(user_id))
+        logger.debug("Loaded %s existing feature samples for user %s", len(features), user_id, extra=SAMPLED)
+        return features
+    except Exception as e:
+        logger.error(f"Error loading features for user {user_id}: {e}")
+        return []
+
 
+def append_user_features(user_id, features, schema=None):
+    """
+    Append one feature sample to a user's sample log.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        features (list): Feature vector to append
+        schema (str): Feature schema of the sample, defaults to the user's schema
+        
+    Returns:
+        int: Number of samples stored for the user after the append
+    """
+    return storage.append_sample(user_id, features, schema or get_user_feature_schema(user_id))
 
-def save_user_features(user_id, features):
+
+def append_user_feature_batch(user_id, features_list, schema=None):
     """
-    Save feature samples for a user.
+    Append several feature samples to a user's sample log with a single write.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        features_list (list): Feature vectors to append
+        schema (str): Feature schema of the samples, defaults to the user's schema
+        
+    Returns:
+        int: Number of samples stored for the user after the append
+    """
+    return storage.append_samples(user_id, features_list, schema or get_user_feature_schema(user_id))
+
+
+def save_user_features(user_id, features, schema=None):
+    """
+    Replace all feature samples for a user.
     
     Args:
         user_id (str): Unique identifier for the user
         features (list): List of feature vectors to save
+        schema (str): Feature schema of the samples, defaults to the user's schema
     """
-    features_file = os.path.join(config.MODEL_DIR, f"{user_id}_features.npy")
     try:
-        np.save(features_file, features)
+        storage.write_samples(user_id, features, schema or get_user_feature_schema(user_id))
         logger.info(f"Saved {len(features)} feature samples for user {user_id}")
     except Exception as e:
         logger.error(f"Error saving features for user {user_id}: {e}")
 
 
-def pad_features(features_list):
+def pad_features(features_list, length=None):
     """
     Pad feature vectors to have the same length by adding zeros.
     This ensures consistent input dimensions for the ML model.
     
     Args:
         features_list (list): List of feature vectors with potentially different lengths
+        length (int): Target length; defaults to the longest vector. Longer
+                      vectors are truncated to this length.
         
     Returns:
         numpy.ndarray: 2D array with padded features of consistent length
@@ -242,94 +384,592 @@ def pad_features(features_list):
     if not features_list:
         return np.array([])
         
-    max_length = max(len(features) for features in features_list)
-    padded_features = []
+    max_length = length if length is not None else max(len(features) for features in features_list)
+    padded_features = np.zeros((len(features_list), max_length))
     
-    for features in features_list:
-        padded = features + [0.0] * (max_length - len(features))
-        padded_features.append(padded)
+    for row, features in zip(padded_features, features_list):
+        values = features[:max_length]
+        row[:len(values)] = values
     
-    return np.array(padded_features)
+    return padded_features
 
 
-def load_user_model(user_id):
+def load_user_metadata(user_id):
+    """
+    Load the stored model metadata for a user.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        
+    Returns:
+        dict: Metadata dictionary, empty if no model has been saved
+    """
+    try:
+        return storage.read_metadata(user_id) or {}
+    except Exception as e:
+        logger.error(f"Error loading metadata for user {user_id}: {e}")
+    return {}
+
+
+def save_user_metadata(user_id, metadata):
+    """
+    Overwrite the stored model metadata for a user and refresh the cached copy.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        metadata (dict): Metadata dictionary to store
+    """
+    stamp = storage.write_metadata(user_id, metadata)
+    
+    if model_cache is not None:
+        cached = model_cache.peek(user_id)
+        if cached is not None:
+            model_cache.replace(user_id, _model_cache_entry(
+                cached['model'], cached['max_feature_length'], metadata, stamp,
+                scorer=cached['scorer']
+            ))
+
+
+def load_user_model(user_id, with_metadata=False):
     """
     Load a trained model for a specific user.
     
     Args:
         user_id (str): Unique identifier for the user
+        with_metadata (bool): Also return the stored model metadata
         
     Returns:
-        tuple: (model, max_feature_length) or (None, None) if model doesn't exist
+        tuple: (model, max_feature_length) or (None, None) if model doesn't exist;
+               (model, max_feature_length, metadata) when with_metadata is set
     """
-    # Check cache first
-    if model_cache and user_id in model_cache:
-        logger.info(f"Loading model for user {user_id} from cache")
-        return model_cache[user_id]
+    entry = _load_user_model_entry(user_id)
+    if entry is None:
+        result = (None, None, {})
+    else:
+        result = (entry['model'], entry['max_feature_length'], entry['metadata'])
+    return result if with_metadata else result[:2]
+
+
+def load_user_scorer(user_id, n_samples=1, entry=None):
+    """
+    Load the model used to score samples for a specific user.
+    
+    This is the flattened native scorer unless SCORING_ENGINE is 'sklearn'.
+    Groups of more than ModelConfig.NATIVE_SCORER_MAX_ROWS samples are scored
+    by the scikit-learn model when one is loaded, as its compiled tree
+    traversal is faster for large batches.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        n_samples (int): Number of samples that will be scored in one call
+        entry (dict): Model entry already loaded by load_user_model_entries
+        
+    Returns:
+        tuple: (scorer, max_feature_length, metadata) or (None, None, {}) if model doesn't exist
+    """
+    if entry is None:
+        entry = _load_user_model_entry(user_id)
+    if entry is None:
+        return None, None, {}
+    access_log.touch(user_id)
+    scorer = entry['model'] if n_samples > ModelConfig.NATIVE_SCORER_MAX_ROWS else entry['scorer']
+    return scorer, entry['max_feature_length'], entry['metadata']
+
+
+def _build_scorer(model):
+    """Flatten a scikit-learn forest into the native scorer, falling back to the model itself."""
+    if config.SCORING_ENGINE != 'native':
+        return model
+    try:
+        scorer = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+        # Build the traversal tables now so they are counted by the model cache
+        scorer.compile()
+        return scorer
+    except Exception as e:
+        logger.warning(f"Could not build native scorer, using the model directly: {e}")
+        return model
+
+
+def _model_entry_bytes(entry):
+    """Estimated memory of a model cache entry, counting a separate scorer once."""
+    size = estimate_model_bytes(entry['model'])
+    if entry['scorer'] is not entry['model']:
+        size += estimate_model_bytes(entry['scorer'])
+    return size
+
+
+def _model_cache_entry(model, max_feature_length, metadata, stamp, scorer=None):
+    """Build a model cache entry remembering which metadata file state it was loaded from."""
+    return {
+        'model': model,
+        'scorer': scorer if scorer is not None else _build_scorer(model),
+        'max_feature_length': max_feature_length,
+        'metadata': metadata,
+        'stamp': stamp,
+        'checked_at': time.monotonic()
+    }
+
+
+def _is_cache_entry_current(user_id, entry, revalidate=False):
+    """
+    Check a cached model against the storage.
     
-    model_file = os.path.join(config.MODEL_DIR, f"{user_id}.joblib")
-    metadata_file = os.path.join(config.MODEL_DIR, f"{user_id}_metadata.json")
+    Another worker process may have saved a newer model. The metadata stamp is
+    checked at most once per MODEL_CACHE_REVALIDATE_SECONDS; only when it has
+    changed is the metadata read, and the model file is reloaded only when the stored
+    model_version differs. Metadata-only changes update the entry in place.
     
-    if os.path.exists(model_file) and os.path.exists(metadata_file):
+    Args:
+        user_id (str): Unique identifier for the user
+        entry (dict): Cached model entry
+        revalidate (bool): Check the storage even if the entry was checked recently
+        
+    Returns:
+        bool: True if the cached entry can be used
+    """
+    now = time.monotonic()
+    if not revalidate and now - entry['checked_at'] < config.MODEL_CACHE_REVALIDATE_SECONDS:
+        return True
+    
+    stamp = storage.metadata_stamp(user_id)
+    if stamp is None:
+        return False
+    if stamp != entry['stamp']:
         try:
-            model = joblib.load(model_file)
-            with open(metadata_file, 'r') as f:
-                metadata = json.load(f)
-            max_feature_length = metadata.get('max_feature_length', 0)
-            
-            result = (model, max_feature_length)
+            metadata, stamp = storage.read_metadata_with_stamp(user_id)
+        except Exception as e:
+            logger.error(f"Error reading metadata for user {user_id}: {e}")
+            return False
+        if metadata is None or metadata.get('model_version') != entry['metadata'].get('model_version'):
+            return False
+        entry['metadata'] = metadata
+        entry['stamp'] = stamp
+    entry['checked_at'] = now
+    return True
+
+
+def _load_user_model_entry(user_id, revalidate=False):
+    """
+    Load a model entry (see _model_cache_entry) from the cache or storage, None if missing.
+    
+    With revalidate, a cached entry is always checked against the storage.
+    """
+    # Check cache first
+    if model_cache is not None:
+        cached = model_cache.get(user_id)
+        if cached is not None:
+            if _is_cache_entry_current(user_id, cached, revalidate):
+                logger.debug("Loading model for user %s from cache", user_id, extra=SAMPLED)
+                return cached
+            logger.info(f"Cached model for user {user_id} is stale, reloading")
+            model_cache.pop(user_id)
+    
+    try:
+        metadata, stamp = storage.read_metadata_with_stamp(user_id)
+        if metadata is None:
+            return None
+        model = storage.read_model(user_id)
+        if model is None:
+            return None
+        max_feature_length = metadata.get('max_feature_length', 0)
+        entry = _model_cache_entry(model, max_feature_length, metadata, stamp)
+        
+        # Cache the model for future use
+        if model_cache is not None:
+            model_cache.put(user_id, entry, _model_entry_bytes(entry))
             
-            # Cache the model for future use
-            if model_cache:
-                model_cache[user_id] = result
-                
-            logger.info(f"Loaded model for user {user_id} with feature length {max_feature_length}")
-            return result
+        logger.info(f"Loaded model for user {user_id} with feature length {max_feature_length}")
+        return entry
+    except Exception as e:
+        logger.error(f"Error loading model for user {user_id}: {e}")
+        return None
+
+
+def load_user_model_entries(user_ids):
+    """
+    Load the model entries of several users.
+    
+    Models missing from the cache are read from the storage in one batched
+    read, which the SQLite backend serves with a single query per chunk of
+    users instead of one per user.
+    
+    Args:
+        user_ids (list): User identifiers
+        
+    Returns:
+        dict: user_id -> model entry (see _model_cache_entry) for users with a model
+    """
+    entries = {}
+    missing = [user_id for user_id in user_ids if model_cache is None or user_id not in model_cache]
+    if len(missing) > 1:
+        try:
+            for user_id, (model, metadata, stamp) in storage.read_models(missing).items():
+                entry = _model_cache_entry(model, metadata.get('max_feature_length', 0), metadata, stamp)
+                if model_cache is not None:
+                    model_cache.put(user_id, entry, _model_entry_bytes(entry))
+                entries[user_id] = entry
         except Exception as e:
-            logger.error(f"Error loading model for user {user_id}: {e}")
-            return None, None
-    return None, None
+            logger.error(f"Error loading models for {len(missing)} users: {e}")
+    
+    for user_id in user_ids:
+        if user_id not in entries:
+            entry = _load_user_model_entry(user_id)
+            if entry is not None:
+                entries[user_id] = entry
+    return entries
+
+
+def _preload_user_ids(limit):
+    """
+    Choose the users whose models are preloaded at startup.
+    
+    Users from the access log come first, most recently scored first; if there
+    are fewer than limit of them, the most recently trained models in the
+    storage fill the remaining places.
+    
+    Args:
+        limit (int): Maximum number of users
+        
+    Returns:
+        list: User identifiers
+    """
+    trained = storage.list_users()
+    user_ids = [user_id for user_id in access_log.recent_users() if user_id in trained][:limit]
+    if len(user_ids) < limit:
+        chosen = set(user_ids)
+        by_training_time = sorted((user_id for user_id in trained if user_id not in chosen),
+                                  key=trained.get, reverse=True)
+        user_ids += by_training_time[:limit - len(user_ids)]
+    return user_ids
+
+
+def start_model_warmup():
+    """
+    Load the models of recently active users into the model cache in a background thread.
+    
+    Warm-up stops early once the cache starts evicting, so preloaded models
+    never push each other out. Nothing is read from the storage before the
+    thread starts, so importing the app does not wait for it.
+    
+    Returns:
+        ModelWarmer: Warm-up in progress, reported by /health
+    """
+    limit = min(config.MODEL_PRELOAD_COUNT, config.MODEL_CACHE_MAX_ENTRIES or config.MODEL_PRELOAD_COUNT)
+    evictions = model_cache.evictions
+    warmer = ModelWarmer(
+        load_model=lambda user_id: _load_user_model_entry(user_id) is not None,
+        should_stop=lambda: model_cache.evictions > evictions
+    )
+    # Listing the storage can be slow, so users are chosen in the warm-up thread
+    warmer.start(lambda: _preload_user_ids(limit))
+    return warmer
 
 
-def save_user_model(user_id, model, max_feature_length):
+def get_decision_threshold(metadata):
+    """
+    Get the decision threshold applied to a user's anomaly scores.
+    
+    Scores at or above the threshold are accepted as the genuine user. The
+    default of 0.0 matches IsolationForest.predict.
+    
+    Args:
+        metadata (dict): Stored model metadata
+        
+    Returns:
+        float: Decision threshold
+    """
+    threshold = metadata.get('decision_threshold')
+    return float(threshold) if threshold is not None else config.DEFAULT_DECISION_THRESHOLD
+
+
+def save_user_model(user_id, model, max_feature_length, training_metadata=None):
     """
     Save a trained model and its metadata for a user.
     
     Args:
         user_id (str): Unique identifier for the user
-        model: Trained scikit-learn model
+        model: Trained IsolationForest or FlatForest, stored in the compact
+               format when MODEL_FORMAT is 'flat'
         max_feature_length (int): Maximum feature vector length used in training
+        training_metadata (dict): Extra training details to store in the metadata
     """
-    model_file = os.path.join(config.MODEL_DIR, f"{user_id}.joblib")
-    metadata_file = os.path.join(config.MODEL_DIR, f"{user_id}_metadata.json")
-    
     try:
-        joblib.dump(model, model_file)
+        if config.MODEL_FORMAT == 'flat' and not isinstance(model, FlatForest):
+            model = FlatForest.from_sklearn(model)
         
         metadata = DEFAULT_MODEL_METADATA.copy()
         metadata.update({
             'max_feature_length': max_feature_length,
             'created_at': datetime.now().isoformat(),
-            'user_id': user_id
+            'user_id': user_id,
+            'model_version': uuid.uuid4().hex
         })
+        if training_metadata:
+            metadata.update(training_metadata)
         
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        stamp = storage.write_model(user_id, model, metadata, compression=config.MODEL_COMPRESSION)
         
         # Update cache
-        if model_cache:
-            model_cache[user_id] = (model, max_feature_length)
+        if model_cache is not None:
+            entry = _model_cache_entry(model, max_feature_length, metadata, stamp)
+            model_cache.put(user_id, entry, _model_entry_bytes(entry))
             
         logger.info(f"Saved model for user {user_id} with feature length {max_feature_length}")
     except Exception as e:
         logger.error(f"Error saving model for user {user_id}: {e}")
 
 
+def train_user_model(user_id, n_jobs=None, full_refit=False, training_tag=None):
+    """
+    Train or update a user's model from their stored feature samples.
+    
+    Performs a full refit or an incremental update depending on the current
+    model and the refit cadence, then saves the model with its metadata.
+    Training holds the user's lock, so concurrent requests for the same user
+    run one after the other; a request that finds the model already trained
+    on every stored sample (by a concurrent request) skips the fit.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        n_jobs (int): Parallel jobs for a full refit, defaults to ModelConfig.N_JOBS
+        full_refit (bool): Always refit the whole model on every sample, e.g.
+                           after the model parameters changed
+        training_tag (str): Label of the training run stored in the metadata;
+                            later updates keep the previous tag
+        
+    Returns:
+        dict: Training summary with samples_count, model_trained and
+              training_mode; deduplicated is set when the fit was skipped
+    """
+    with user_locks.lock(user_id):
+        return _train_user_model_locked(user_id, n_jobs, full_refit, training_tag)
+
+
+def _train_user_model_locked(user_id, n_jobs=None, full_refit=False, training_tag=None):
+    """Body of train_user_model, called with the user's lock held."""
+    # Another process may have saved a model moments ago, so bypass the revalidation interval
+    entry = _load_user_model_entry(user_id, revalidate=True)
+    if entry is not None:
+        model, max_feature_length, metadata = entry['model'], entry['max_feature_length'], entry['metadata']
+    else:
+        model, max_feature_length, metadata = None, None, load_user_metadata(user_id)
+    schema = get_user_feature_schema(user_id, metadata)
+    
+    # Read the appended counter first, so samples stored while reading are not counted as trained
+    samples_appended = storage.read_user_info(user_id)['appended'].get(schema, 0)
+    existing_features = load_user_features(user_id, schema)
+    samples_count = len(existing_features)
+    # With a bounded sample history the stored count stops growing, the appended count does not
+    samples_seen = max(samples_appended, samples_count)
+    
+    if samples_count < config.MIN_SAMPLES_FOR_TRAINING:
+        return {"samples_count": samples_count, "model_trained": False, "training_mode": None}
+    
+    trained_seen = metadata.get('samples_seen', metadata.get('samples_count', 0))
+    if not full_refit and model is not None and trained_seen >= samples_seen:
+        logger.info(f"Model for user {user_id} already covers {samples_count} samples, skipping fit")
+        return {"samples_count": samples_count, "model_trained": True, "training_mode": None, "deduplicated": True}
+    
+    # Several samples may have arrived since the last training run
+    n_new = samples_seen - trained_seen
+    new_samples = existing_features[-max(n_new, 1):]
+    new_feature_length = max(len(features) for features in new_samples)
+    
+    # The stored history grew by less than the samples appended, so samples were evicted.
+    # If the history policy may have evicted new ones, the end of the history is not what
+    # was appended since the last training run and only a full refit is trained on it.
+    history = storage.history
+    new_samples_evicted = (history is not None and history.may_evict_new_samples and
+                           samples_count - metadata.get('samples_count', 0) < n_new)
+    
+    fit_started = time.perf_counter()
+    incremental = not (full_refit or new_samples_evicted or
+                       needs_full_refit(model, max_feature_length, metadata, samples_seen, new_feature_length))
+    if incremental:
+        # Grow replacement trees on the most recent samples only, the offset covers every stored sample
+        window = max(ModelConfig.INCREMENTAL_WINDOW, model.max_samples_)
+        history_features = pad_features(existing_features, max_feature_length)
+        try:
+            model = update_model_incrementally(model, history_features[-window:], history_features,
+                                               seed=config.RANDOM_STATE + samples_seen)
+            training_metadata = {
+                'training_mode': 'incremental',
+                'full_refit_samples': metadata['full_refit_samples'],
+                'incremental_updates': metadata.get('incremental_updates', 0) + 1
+            }
+        except IncrementalUpdateUnsupported as e:
+            logger.warning(f"Incremental update unavailable for user {user_id}, refitting: {e}")
+            incremental = False
+    
+    if not incremental:
+        # Pad features to ensure consistent dimensions
+        padded_features = pad_features(existing_features)
+        
+        # Train IsolationForest model on every stored sample
+        model = fit_full_model(padded_features, n_jobs=n_jobs)
+        max_feature_length = padded_features.shape[1]
+        training_metadata = {
+            'training_mode': 'full',
+            'full_refit_samples': samples_seen,
+            'incremental_updates': 0
+        }
+    
+    fit_seconds = time.perf_counter() - fit_started
+    
+    # Save the trained model with metadata, keeping a tuned decision threshold
+    training_metadata['samples_count'] = samples_count
+    training_metadata['samples_seen'] = samples_seen
+    training_metadata['feature_schema'] = schema
+    # Typical sample length, the default size of stream scoring windows
+    training_metadata['sample_presses'] = int(np.median([sample_presses(features, schema) for features in existing_features]))
+    if metadata.get('decision_threshold') is not None:
+        training_metadata['decision_threshold'] = metadata['decision_threshold']
+    if training_tag or metadata.get('training_tag'):
+        training_metadata['training_tag'] = training_tag or metadata['training_tag']
+    save_user_model(user_id, model, max_feature_length, training_metadata)
+    
+    logger.info(f"Successfully trained model for user {user_id} with {samples_count} samples ({training_metadata['training_mode']})")
+    return {
+        "samples_count": samples_count,
+        "model_trained": True,
+        "training_mode": training_metadata['training_mode'],
+        "fit_seconds": fit_seconds
+    }
+
+
+def record_training_metrics(result):
+    """Record the fit duration and sample count of a training summary from train_user_model."""
+    if result and result.get('deduplicated'):
+        training_fits_deduplicated.inc()
+    elif result and result.get('model_trained'):
+        model_fit_duration.observe(result['fit_seconds'], mode=result['training_mode'])
+        training_samples.observe(result['samples_count'], mode=result['training_mode'])
+
+
+def on_training_job_complete(user_id, job):
+    """Drop the cached model so the next request loads the one saved by the worker."""
+    if model_cache is not None:
+        model_cache.pop(user_id)
+    training_jobs.inc(status=job['status'])
+    record_training_metrics(job['result'])
+
+
+# Background training queue, the worker pool is started on first use
+training_queue = TrainingQueue(on_complete=on_training_job_complete) if config.ASYNC_TRAINING_ENABLED else None
+
+
+def refresh_user_model(user_id, schema, features_list):
+    """
+    Store a batch of accepted /predict samples and schedule the user's training.
+    
+    Called from the adaptive refresh thread, never on the request path. The
+    samples are stored with one append and trained like /train/bulk
+    enrollments: queued in the background, or inline in the refresh thread
+    when ASYNC_TRAINING_ENABLED is off. When the queue is full the samples
+    stay stored and are trained by the user's next scheduled job.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        schema (str): Feature schema the samples were extracted in
+        features_list (list): Feature vectors of the accepted samples
+    """
+    samples_count = append_user_feature_batch(user_id, features_list, schema)
+    if samples_count < config.MIN_SAMPLES_FOR_TRAINING:
+        return
+    if training_queue is None:
+        record_training_metrics(train_user_model(user_id))
+        return
+    try:
+        training_queue.submit(user_id)
+    except TrainingQueueFull as e:
+        logger.warning(f"Training queue full, refresh of user {user_id} not scheduled: {e}")
+
+
+# Opt-in refresh of models from high-confidence genuine /predict samples, the thread is started on first use
+adaptive_refresh = AdaptiveRefresh(
+    apply=refresh_user_model,
+    interval_seconds=config.ADAPTIVE_REFRESH_INTERVAL_SECONDS,
+    max_per_user=config.ADAPTIVE_REFRESH_MAX_PER_USER,
+    rate_window_seconds=config.ADAPTIVE_REFRESH_RATE_WINDOW_SECONDS,
+    max_pending=config.ADAPTIVE_REFRESH_MAX_PENDING
+) if config.ADAPTIVE_REFRESH_ENABLED else None
+if adaptive_refresh is not None:
+    atexit.register(adaptive_refresh.stop)
+
+# Preload models in serving processes only, not in training worker processes that import the app
+model_warmer = None
+if config.MODEL_PRELOAD_ENABLED and model_cache is not None and multiprocessing.parent_process() is None:
+    model_warmer = start_model_warmup()
+
+
+@app.before_request
+def start_request_timer():
+    """Remember when request handling started and collect fields for its summary log record."""
+    g.request_started = time.perf_counter()
+    g.log_fields = {}
+
+
+def add_request_log_fields(**fields):
+    """Attach fields to the single summary record logged for the current request."""
+    g.log_fields.update(fields)
+
+
+@app.after_request
+def record_request(response):
+    """
+    Count every response, observe its duration under the matched endpoint and
+    log one summary record for it.
+    
+    Successful requests are logged for LOG_REQUEST_SAMPLE_RATE of calls,
+    client and server errors always.
+    """
+    endpoint = request.endpoint or 'unmatched'
+    http_requests.inc(endpoint=endpoint, status=response.status_code)
+    started = g.get('request_started')
+    duration = time.perf_counter() - started if started is not None else None
+    if duration is not None:
+        http_request_duration.observe(duration, endpoint=endpoint)
+    
+    if response.status_code >= 400 or random.random() < config.LOG_REQUEST_SAMPLE_RATE:
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3) if duration is not None else None
+        }
+        fields.update(g.get('log_fields', {}))
+        request_logger.info(f"{request.method} {request.path} {response.status_code}", extra={'fields': fields})
+    return response
+
+
+def normalize_user_id(user_id):
+    """
+    User id from a request body as a string.
+    
+    JSON clients may send numeric ids; they name the same user as the string
+    form used in URLs, so every id is handled as a string.
+    
+    Args:
+        user_id: Value of the user_id field
+        
+    Returns:
+        str: Normalized user id, None if the value is not a string or an integer
+    """
+    if isinstance(user_id, bool) or not isinstance(user_id, (str, int)):
+        return None
+    return str(user_id)
+
+
 @app.route('/train', methods=['POST'])
 def train_endpoint():
     """
     API endpoint for training a user's keystroke dynamics model.
     
+    The sample is stored immediately. Once enough samples exist, model
+    training is queued in the background (see GET /train/<job_id>) unless
+    ASYNC_TRAINING_ENABLED is off, in which case it runs inline.
+    
     Expected JSON format:
     {
         "user_id": "unique_user_identifier",
@@ -341,8 +981,10 @@ def train_endpoint():
     }
     
     Returns:
-        JSON response indicating success/failure
+        JSON response indicating success/failure; 503 with a Retry-After
+        header when the sample was stored but the training queue is full
     """
+    timer = StageTimer(stage_duration, endpoint='train')
     try:
         # Validate request data
         if not request.is_json:
@@ -353,69 +995,197 @@ def train_endpoint():
         if 'user_id' not in data or 'keystroke_data' not in data:
             return jsonify({"error": "Missing required fields: user_id, keystroke_data"}), 400
             
-        user_id = data['user_id']
+        user_id = normalize_user_id(data['user_id'])
+        if user_id is None:
+            return jsonify({"error": "user_id must be a string or an integer"}), 400
         keystroke_data = data['keystroke_data']
         
         if not isinstance(keystroke_data, list) or len(keystroke_data) == 0:
             return jsonify({"error": "keystroke_data must be a non-empty list"}), 400
         
-        print(f"Training request for user {user_id} with {len(keystroke_data)} keystroke events")
+        add_request_log_fields(user_id=user_id, keystroke_events=len(keystroke_data))
+        timer.lap('parse_request')
         
-        # Extract features from the current sample
-        current_features = extract_features(keystroke_data)
+        # Extract features from the current sample in the user's feature schema
+        schema = get_user_feature_schema(user_id)
+        current_features = extract_features(keystroke_data, schema)
+        timer.lap('extract_features')
         
         if not current_features:
             return jsonify({"error": "Unable to extract features from keystroke data"}), 400
         
-        # Load existing features for this user
-        existing_features = load_user_features(user_id)
-        
-        # Add the new feature vector to the existing ones
-        existing_features.append(current_features)
+        # Append the new feature vector to the user's sample log
+        samples_count = append_user_features(user_id, current_features, schema)
+        timer.lap('store_sample')
         
-        # Save the updated feature collection
-        save_user_features(user_id, existing_features)
+        add_request_log_fields(samples_count=samples_count)
         
         # Check if we have enough samples to train a model
-        if len(existing_features) >= config.MIN_SAMPLES_FOR_TRAINING:
-            # Pad features to ensure consistent dimensions
-            padded_features = pad_features(existing_features)
-            
-            if padded_features.size > 0:
-                # Train IsolationForest model
-                # Using contamination from config to automatically determine the proportion of outliers
-                model = IsolationForest(
-                    contamination=config.ISOLATION_FOREST_CONTAMINATION,
-                    random_state=config.RANDOM_STATE,
-                    n_estimators=ModelConfig.N_ESTIMATORS,
-                    n_jobs=ModelConfig.N_JOBS
-                )
-                model.fit(padded_features)
-                
-                # Save the trained model with metadata
-                max_feature_length = padded_features.shape[1] if len(padded_features.shape) > 1 else len(current_features)
-                save_user_model(user_id, model, max_feature_length)
-                
-                logger.info(f"Successfully trained model for user {user_id} with {len(existing_features)} samples")
-                return jsonify({
-                    "status": APIConfig.TRAINING_SUCCESS,
-                    "samples_count": len(existing_features),
-                    "model_trained": True
-                }), 200
-            else:
-                return jsonify({"error": "Failed to process features for training"}), 500
-        else:
-            logger.info(f"User {user_id} has {len(existing_features)} samples, need {config.MIN_SAMPLES_FOR_TRAINING} for training")
+        if samples_count < config.MIN_SAMPLES_FOR_TRAINING:
+            logger.debug("User %s has %s samples, need %s for training", user_id, samples_count,
+                         config.MIN_SAMPLES_FOR_TRAINING, extra=SAMPLED)
             return jsonify({
                 "status": APIConfig.TRAINING_SUCCESS,
-                "samples_count": len(existing_features),
+                "samples_count": samples_count,
                 "model_trained": False,
                 "message": f"Need {config.MIN_SAMPLES_FOR_TRAINING} samples to train model"
             }), 200
+        
+        if training_queue is not None:
+            try:
+                job = training_queue.submit(user_id)
+            except TrainingQueueFull as e:
+                # Never fit on the request thread; the stored sample is trained by the next job
+                logger.warning(f"Training queue full, training of user {user_id} not scheduled: {e}")
+                add_request_log_fields(training_job=None)
+                response = jsonify({
+                    "error": APIConfig.TRAINING_QUEUE_FULL,
+                    "samples_count": samples_count,
+                    "training_job": None
+                })
+                return response, 503, {'Retry-After': str(config.TRAINING_RETRY_AFTER_SECONDS)}
+            timer.lap('enqueue_training')
+            add_request_log_fields(training_job=job['job_id'])
+            model, _ = load_user_model(user_id)
+            return jsonify({
+                "status": APIConfig.TRAINING_SUCCESS,
+                "samples_count": samples_count,
+                "model_trained": model is not None,
+                "training_job": job
+            }), 200
+        
+        result = train_user_model(user_id)
+        timer.lap('train_model')
+        record_training_metrics(result)
+        add_request_log_fields(training_mode=result['training_mode'])
+        return jsonify({
+            "status": APIConfig.TRAINING_SUCCESS,
+            "samples_count": result['samples_count'],
+            "model_trained": result['model_trained'],
+            "training_mode": result['training_mode']
+        }), 200
             
     except Exception as e:
-        print(f"Error in train endpoint: {e}")
+        logger.error(f"Error in train endpoint: {e}")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/train/bulk', methods=['POST'])
+def train_bulk_endpoint():
+    """
+    API endpoint for enrolling many samples of many users at once.
+    
+    Features are extracted in BULK_EXTRACTION_WORKERS worker processes, each
+    user's samples are stored with a single append, and each user with
+    enough samples gets one training run (queued in the background like
+    /train, or inline when ASYNC_TRAINING_ENABLED is off). Users whose job
+    cannot be queued because the queue is full get a null training_job and
+    the response carries a Retry-After header.
+    
+    Expected JSON format:
+    {
+        "users": [
+            {"user_id": "unique_user_identifier", "samples": [[{"key": "p", "event": "down", "timestamp": 100}, ...], ...]},
+            ...
+        ]
+    }
+    
+    Returns:
+        JSON with a summary per user and the total stored and rejected samples
+    """
+    timer = StageTimer(stage_duration, endpoint='train_bulk')
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    
+    data = request.get_json()
+    entries = data.get('users') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or len(entries) == 0:
+        return jsonify({"error": "users must be a non-empty list"}), 400
+    
+    # Group the samples by user, a user may appear several times
+    users = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or 'user_id' not in entry or not isinstance(entry.get('samples'), list):
+            return jsonify({"error": "Each user needs a user_id and a samples list"}), 400
+        user_id = normalize_user_id(entry['user_id'])
+        if user_id is None:
+            return jsonify({"error": "user_id must be a string or an integer"}), 400
+        users.setdefault(user_id, []).extend(entry['samples'])
+    
+    n_samples = sum(len(samples) for samples in users.values())
+    if n_samples > config.MAX_BULK_SAMPLES:
+        return jsonify({"error": f"Too many samples ({n_samples}), maximum per request is {config.MAX_BULK_SAMPLES}"}), 400
+    
+    add_request_log_fields(users=len(users), samples=n_samples)
+    timer.lap('parse_request')
+    
+    try:
+        extracted = extract_user_samples(
+            [(user_id, get_user_feature_schema(user_id), samples) for user_id, samples in users.items()],
+            executor=get_extraction_executor()
+        )
+        timer.lap('extract_features')
+        
+        results = []
+        for user_id, (features, rejected) in extracted.items():
+            result = {"user_id": user_id, "samples_added": len(features), "rejected": rejected,
+                      "samples_count": None, "model_trained": False}
+            if features:
+                result['samples_count'] = append_user_feature_batch(user_id, features)
+            results.append(result)
+        timer.lap('store_sample')
+        
+        queue_full = False
+        for result in results:
+            user_id = result['user_id']
+            if not result['samples_added'] or result['samples_count'] < config.MIN_SAMPLES_FOR_TRAINING:
+                continue
+            if training_queue is not None:
+                try:
+                    result['training_job'] = training_queue.submit(user_id)
+                except TrainingQueueFull as e:
+                    # The samples stay stored and are trained by the user's next job
+                    logger.warning(f"Training queue full, training of user {user_id} not scheduled: {e}")
+                    result['training_job'] = None
+                    queue_full = True
+                continue
+            summary = train_user_model(user_id)
+            record_training_metrics(summary)
+            result['model_trained'] = summary['model_trained']
+            result['training_mode'] = summary['training_mode']
+        timer.lap('train_model')
+        
+    except Exception as e:
+        logger.error(f"Error in bulk train endpoint: {e}")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+    
+    response = jsonify({
+        "status": APIConfig.TRAINING_SUCCESS,
+        "samples_added": sum(result['samples_added'] for result in results),
+        "rejected": sum(result['rejected'] for result in results),
+        "users": results
+    })
+    if queue_full:
+        # Samples are stored either way; tell clients when to retry the users left untrained
+        return response, 200, {'Retry-After': str(config.TRAINING_RETRY_AFTER_SECONDS)}
+    return response, 200
+
+
+@app.route('/train/<job_id>', methods=['GET'])
+def get_training_job(job_id):
+    """
+    Get the state of a background training job.
+    
+    Args:
+        job_id (str): Job identifier returned by /train
+        
+    Returns:
+        JSON with job status (queued, running, completed or failed)
+    """
+    job = training_queue.get_job(job_id) if training_queue is not None else None
+    if job is None:
+        return jsonify({"error": APIConfig.TRAINING_JOB_NOT_FOUND}), 404
+    return jsonify(job), 200
 
 
 @app.route('/predict', methods=['POST'])
@@ -431,6 +1201,7 @@ def predict_endpoint():
         - {"authenticated": false, "reason": "..."} for imposter
         - {"error": "..."} for errors
     """
+    timer = StageTimer(stage_duration, endpoint='predict')
     try:
         # Validate request data
         if not request.is_json:
@@ -441,46 +1212,51 @@ def predict_endpoint():
         if 'user_id' not in data or 'keystroke_data' not in data:
             return jsonify({"error": "Missing required fields: user_id, keystroke_data"}), 400
             
-        user_id = data['user_id']
+        user_id = normalize_user_id(data['user_id'])
+        if user_id is None:
+            return jsonify({"error": "user_id must be a string or an integer"}), 400
         keystroke_data = data['keystroke_data']
         
         if not isinstance(keystroke_data, list) or len(keystroke_data) == 0:
             return jsonify({"error": "keystroke_data must be a non-empty list"}), 400
         
-        print(f"Prediction request for user {user_id} with {len(keystroke_data)} keystroke events")
+        add_request_log_fields(user_id=user_id, keystroke_events=len(keystroke_data))
+        timer.lap('parse_request')
         
-        # Load the trained model for this user
-        model, max_feature_length = load_user_model(user_id)
+        # Load the scorer of the trained model for this user
+        scorer, max_feature_length, metadata = load_user_scorer(user_id)
+        timer.lap('load_model')
         
-        if model is None:
+        if scorer is None:
             return jsonify({"error": APIConfig.USER_MODEL_NOT_FOUND}), 404
         
-        # Extract features from the new keystroke data
-        new_features = extract_features(keystroke_data)
+        # Extract features from the new keystroke data in the schema the model was trained on
+        schema = get_user_feature_schema(user_id, metadata)
+        new_features = extract_features(keystroke_data, schema)
+        timer.lap('extract_features')
         
         if not new_features:
             return jsonify({"error": APIConfig.FEATURE_EXTRACTION_FAILED}), 400
         
-        # Pad the new features to match the model's expected input dimensions
-        if len(new_features) < max_feature_length:
-            new_features.extend([0.0] * (max_feature_length - len(new_features)))
-        elif len(new_features) > max_feature_length:
-            # Truncate if longer (though this shouldn't happen in normal circumstances)
-            new_features = new_features[:max_feature_length]
+        # Pad or truncate to the model's expected input dimensions (model expects 2D array)
+        feature_vector = pad_features([new_features], max_feature_length)
         
-        # Reshape for prediction (model expects 2D array)
-        feature_vector = np.array(new_features).reshape(1, -1)
+        # Score once; the decision is derived from the anomaly score and the user's threshold
+        anomaly_score = scorer.decision_function(feature_vector)[0]
+        threshold = get_decision_threshold(metadata)
+        authenticated = anomaly_score >= threshold
+        timer.lap('score')
+        predictions.inc(result='genuine' if authenticated else 'anomaly')
         
-        # Make prediction
-        # IsolationForest returns 1 for inliers (genuine user) and -1 for outliers (imposter)
-        prediction = model.predict(feature_vector)[0]
+        add_request_log_fields(authenticated=bool(authenticated), confidence_score=float(anomaly_score))
         
-        # Get anomaly score for additional information
-        anomaly_score = model.decision_function(feature_vector)[0]
+        # Keep clearly genuine samples for the next batched model refresh
+        if adaptive_refresh is not None and anomaly_score >= threshold + config.ADAPTIVE_REFRESH_MARGIN:
+            refresh_result = adaptive_refresh.offer(user_id, schema, new_features)
+            adaptive_samples.inc(result=refresh_result)
+            add_request_log_fields(adaptive_refresh=refresh_result)
         
-        print(f"Prediction for user {user_id}: {prediction}, anomaly_score: {anomaly_score}")
-        
-        if prediction == 1:
+        if authenticated:
             # Genuine user (inlier)
             return jsonify({
                 "authenticated": True,
@@ -497,20 +1273,450 @@ def predict_endpoint():
             }), 200
             
     except Exception as e:
-        print(f"Error in predict endpoint: {e}")
+        logger.error(f"Error in predict endpoint: {e}")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch_endpoint():
+    """
+    API endpoint for scoring many keystroke samples in one request.
+    
+    Samples are grouped by user, each user's model is loaded once and every
+    group is scored with a single vectorized model call. Results are streamed
+    back as newline-delimited JSON, one line per sample, in per-user groups;
+    the "index" field refers to the position of the sample in the request.
+    
+    Expected JSON format:
+    {
+        "user_id": "default_user_identifier",     (optional)
+        "samples": [
+            {"user_id": "...", "sample_id": "...", "keystroke_data": [...]},
+            ...
+        ]
+    }
+    
+    Returns:
+        application/x-ndjson stream of per-sample results:
+        {"index": 0, "sample_id": "...", "user_id": "...", "authenticated": true, "confidence_score": 0.1}
+        or {"index": 1, "user_id": "...", "error": "..."} for samples that could not be scored;
+        samples that are not JSON objects or have an invalid user_id come first, without a user_id
+    """
+    timer = StageTimer(stage_duration, endpoint='predict_batch')
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    
+    data = request.get_json()
+    samples = data.get('samples') if isinstance(data, dict) else None
+    
+    if not isinstance(samples, list) or len(samples) == 0:
+        return jsonify({"error": "samples must be a non-empty list"}), 400
+    
+    if len(samples) > config.MAX_BATCH_SAMPLES:
+        return jsonify({"error": f"Too many samples ({len(samples)}), maximum is {config.MAX_BATCH_SAMPLES}"}), 400
+    
+    default_user_id = data.get('user_id')
+    
+    # Group sample positions by user; invalid samples get their own error line
+    groups = {}
+    invalid = []
+    for index, sample in enumerate(samples):
+        if not isinstance(sample, dict):
+            invalid.append((index, "sample must be an object"))
+            continue
+        user_id = sample.get('user_id', default_user_id)
+        if user_id is not None:
+            user_id = normalize_user_id(user_id)
+            if user_id is None:
+                invalid.append((index, "user_id must be a string or an integer"))
+                continue
+        groups.setdefault(user_id, []).append(index)
+    
+    add_request_log_fields(batch_samples=len(samples), batch_users=len(groups))
+    timer.lap('parse_request')
+    entries = {}
+    
+    def score_group(user_id, indices):
+        """
+        Results of every sample of a single user.
+        
+        The group is scored before any of its lines is sent, so the stage
+        timings do not include the time the client takes to read them.
+        """
+        def result(index, **fields):
+            sample = samples[index]
+            line = {"index": index, "user_id": user_id}
+            if 'sample_id' in sample:
+                line['sample_id'] = sample['sample_id']
+            line.update(fields)
+            return line
+        
+        if user_id is None:
+            return [result(index, error="Missing required field: user_id") for index in indices]
+        
+        # A timer per group, the generator is paused while earlier lines are sent
+        group_timer = StageTimer(stage_duration, endpoint='predict_batch')
+        scorer, max_feature_length, metadata = load_user_scorer(user_id, n_samples=len(indices),
+                                                                entry=entries.get(user_id))
+        group_timer.lap('load_model')
+        if scorer is None:
+            return [result(index, error=APIConfig.USER_MODEL_NOT_FOUND) for index in indices]
+        
+        schema = get_user_feature_schema(user_id, metadata)
+        lines = []
+        scored_indices = []
+        features_list = []
+        for index in indices:
+            keystroke_data = samples[index].get('keystroke_data')
+            if not isinstance(keystroke_data, list) or len(keystroke_data) == 0:
+                lines.append(result(index, error="keystroke_data must be a non-empty list"))
+                continue
+            features = extract_features(keystroke_data, schema)
+            if not features:
+                lines.append(result(index, error=APIConfig.FEATURE_EXTRACTION_FAILED))
+                continue
+            scored_indices.append(index)
+            features_list.append(features)
+        group_timer.lap('extract_features')
+        
+        if not features_list:
+            return lines
+        
+        # One vectorized call for the whole group
+        anomaly_scores = scorer.decision_function(pad_features(features_list, max_feature_length))
+        threshold = get_decision_threshold(metadata)
+        group_timer.lap('score')
+        
+        for index, anomaly_score in zip(scored_indices, anomaly_scores):
+            authenticated = anomaly_score >= threshold
+            predictions.inc(result='genuine' if authenticated else 'anomaly')
+            if authenticated:
+                lines.append(result(index, authenticated=True, confidence_score=float(anomaly_score)))
+            else:
+                lines.append(result(index, authenticated=False, reason=APIConfig.TYPING_PATTERN_ANOMALY,
+                                    confidence_score=float(anomaly_score)))
+        return lines
+    
+    def generate():
+        # Read every model missing from the cache in one batch
+        prefetch_timer = StageTimer(stage_duration, endpoint='predict_batch')
+        entries.update(load_user_model_entries([user_id for user_id in groups if user_id is not None]))
+        prefetch_timer.lap('load_model')
+        for index, error in invalid:
+            yield json.dumps({"index": index, "error": error}) + "\n"
+        for user_id, indices in groups.items():
+            try:
+                for line in score_group(user_id, indices):
+                    yield json.dumps(line) + "\n"
+            except Exception as e:
+                logger.error(f"Error in batch predict for user {user_id}: {e}")
+                for index in indices:
+                    yield json.dumps({"index": index, "user_id": user_id, "error": APIConfig.MODEL_PREDICTION_FAILED}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def default_window_presses(metadata):
+    """
+    Key presses per stream scoring window for a user's model.
+    
+    Windows as long as the user's typical enrollment sample keep the window
+    features, keydown_count in particular, in the range the model was
+    trained on. Models trained before sample lengths were recorded fall back
+    to SESSION_WINDOW_PRESSES.
+    """
+    return metadata.get('sample_presses') or config.SESSION_WINDOW_PRESSES
+
+
+def _window_size_parameter(data, name, default):
+    """Positive integer request parameter, None if invalid."""
+    value = data.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        return None
+    return value
+
+
+@app.route('/predict/windows', methods=['POST'])
+def predict_windows_endpoint():
+    """
+    Score a long keystroke stream in sliding windows of key presses.
+    
+    Windows are as long as the user's enrolled samples and, by default, do
+    not overlap, so each window is featurized like an enrollment sample. The
+    press timings of the stream are extracted once, the feature vectors of
+    all windows are built together and every window is scored with a single
+    model call. The stream is authenticated when the mean window score
+    reaches the user's decision threshold and at most
+    WINDOW_MAX_ANOMALY_RATIO of its windows are anomalous.
+    
+    Expected JSON format:
+    {
+        "user_id": "unique_user_identifier",
+        "keystroke_data": [{"key": "p", "event": "down", "timestamp": 100}, ...],
+        "window_presses": 40,  // optional, defaults to the user's enrolled sample length
+        "stride": 10           // optional, defaults to WINDOW_STRIDE_PRESSES or the window size
+    }
+    
+    Returns:
+        JSON with the per-window scores and the aggregated decision
+    """
+    timer = StageTimer(stage_duration, endpoint='predict_windows')
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    
+    data = request.get_json()
+    if not isinstance(data, dict) or 'user_id' not in data or 'keystroke_data' not in data:
+        return jsonify({"error": "Missing required fields: user_id, keystroke_data"}), 400
+    
+    user_id = normalize_user_id(data['user_id'])
+    if user_id is None:
+        return jsonify({"error": "user_id must be a string or an integer"}), 400
+    keystroke_data = data['keystroke_data']
+    if not isinstance(keystroke_data, list) or len(keystroke_data) == 0:
+        return jsonify({"error": "keystroke_data must be a non-empty list"}), 400
+    if len(keystroke_data) > config.MAX_STREAM_EVENTS:
+        return jsonify({"error": f"Too many keystroke events ({len(keystroke_data)}), maximum is {config.MAX_STREAM_EVENTS}"}), 400
+    
+    add_request_log_fields(user_id=user_id, keystroke_events=len(keystroke_data))
+    timer.lap('parse_request')
+    
+    scorer, max_feature_length, metadata = load_user_scorer(user_id)
+    timer.lap('load_model')
+    if scorer is None:
+        return jsonify({"error": APIConfig.USER_MODEL_NOT_FOUND}), 404
+    
+    window_presses = _window_size_parameter(data, 'window_presses', default_window_presses(metadata))
+    stride = _window_size_parameter(data, 'stride', config.WINDOW_STRIDE_PRESSES or window_presses)
+    if window_presses is None or stride is None:
+        return jsonify({"error": "window_presses and stride must be positive integers"}), 400
+    
+    try:
+        records = press_timings(sorted(keystroke_data, key=lambda event: event['timestamp']))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"{APIConfig.INVALID_KEYSTROKE_DATA}: {e}"}), 400
+    if len(records) < config.SESSION_MIN_PRESSES:
+        return jsonify({"error": f"At least {config.SESSION_MIN_PRESSES} key presses are needed, got {len(records)}"}), 400
+    
+    starts, ends, features = sliding_window_features(
+        records, window_presses, stride, get_user_feature_schema(user_id, metadata)
+    )
+    scored = [index for index, vector in enumerate(features) if vector]
+    timer.lap('extract_features')
+    if not scored:
+        return jsonify({"error": APIConfig.FEATURE_EXTRACTION_FAILED}), 400
+    
+    # One model call for every window
+    scores = scorer.decision_function(pad_features([features[index] for index in scored], max_feature_length))
+    threshold = get_decision_threshold(metadata)
+    genuine = scores >= threshold
+    anomaly_ratio = float(1.0 - genuine.mean())
+    # Averaging over windows evens out single windows scoring just below the threshold
+    authenticated = bool(scores.mean() >= threshold) and anomaly_ratio <= config.WINDOW_MAX_ANOMALY_RATIO
+    timer.lap('score')
+    predictions.inc(result='genuine' if authenticated else 'anomaly')
+    add_request_log_fields(windows=len(scored), authenticated=authenticated, anomaly_ratio=anomaly_ratio)
+    
+    return jsonify({
+        "user_id": user_id,
+        "authenticated": authenticated,
+        "presses": len(records),
+        "window_presses": window_presses,
+        "stride": stride,
+        "anomalous_window_ratio": anomaly_ratio,
+        "mean_confidence_score": float(scores.mean()),
+        "min_confidence_score": float(scores.min()),
+        "windows": [
+            {
+                "start": int(starts[index]),
+                "end": int(ends[index]),
+                "authenticated": bool(is_genuine),
+                "confidence_score": float(score)
+            }
+            for index, score, is_genuine in zip(scored, scores, genuine)
+        ]
+    }), 200
+
+
+def _timing_record_json(record):
+    """JSON form of a streaming timing record, null for missing timings."""
+    key, hold, keydown_keydown, keyup_keydown = record[:4]
+    return {
+        "key": key,
+        FeatureExtractionConfig.HOLD_TIME: None if np.isnan(hold) else hold,
+        FeatureExtractionConfig.KEYDOWN_KEYDOWN: None if np.isnan(keydown_keydown) else keydown_keydown,
+        FeatureExtractionConfig.KEYUP_KEYDOWN: None if np.isnan(keyup_keydown) else keyup_keydown
+    }
+
+
+def _score_session(session):
+    """
+    Score the rolling window of a session with the user's model.
+    
+    Returns:
+        dict: Score entry appended to the session history, or None if the
+              window is still too short or the model is gone
+    """
+    if len(session.window) < min(config.SESSION_MIN_PRESSES, session.window.maxlen):
+        return None
+    scorer, max_feature_length, metadata = load_user_scorer(session.user_id)
+    if scorer is None:
+        return None
+    features = window_features(list(session.window), session.schema)
+    if not features:
+        return None
+    
+    anomaly_score = float(scorer.decision_function(pad_features([features], max_feature_length))[0])
+    authenticated = anomaly_score >= get_decision_threshold(metadata)
+    predictions.inc(result='genuine' if authenticated else 'anomaly')
+    score = {
+        "presses": session.stream.presses,
+        "window_presses": len(session.window),
+        "authenticated": bool(authenticated),
+        "confidence_score": anomaly_score
+    }
+    session.scores.append(score)
+    return score
+
+
+@app.route('/session', methods=['POST'])
+def start_session():
+    """
+    Start a continuous authentication session for a user with a trained model.
+    
+    Expected JSON format:
+    {"user_id": "unique_user_identifier"}
+    
+    Returns:
+        JSON with the new session_id, used to post keystroke chunks
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    
+    data = request.get_json()
+    user_id = normalize_user_id(data.get('user_id')) if isinstance(data, dict) else None
+    if not user_id:
+        return jsonify({"error": "Missing required field: user_id"}), 400
+    
+    scorer, _, metadata = load_user_scorer(user_id)
+    if scorer is None:
+        return jsonify({"error": APIConfig.USER_MODEL_NOT_FOUND}), 404
+    
+    session = sessions.add(TypingSession(
+        user_id, get_user_feature_schema(user_id, metadata),
+        window_presses=default_window_presses(metadata), score_history=config.SESSION_SCORE_HISTORY
+    ))
+    add_request_log_fields(user_id=user_id, session_id=session.session_id)
+    return jsonify(session.summary()), 201
+
+
+@app.route('/session/<session_id>/keystrokes', methods=['POST'])
+def session_keystrokes(session_id):
+    """
+    Add a chunk of keystroke events to a session and score its rolling window.
+    
+    Only the new events are sent; the server keeps the presses still waiting
+    for a keyup or the next keydown. The timing records of the presses this
+    chunk completed are returned, and once the session has at least
+    SESSION_MIN_PRESSES presses, the score of its rolling window of the
+    user's enrolled sample length.
+    
+    Expected JSON format:
+    {"keystroke_data": [{"key": "p", "event": "down", "timestamp": 100}, ...]}
+    
+    Returns:
+        JSON with the session state, the new timing records and the rolling score (or null)
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": APIConfig.SESSION_NOT_FOUND}), 404
+    
+    data = request.get_json()
+    keystroke_data = data.get('keystroke_data') if isinstance(data, dict) else None
+    if not isinstance(keystroke_data, list) or len(keystroke_data) == 0:
+        return jsonify({"error": "keystroke_data must be a non-empty list"}), 400
+    if len(keystroke_data) > config.MAX_KEYSTROKE_EVENTS:
+        return jsonify({"error": f"Too many keystroke events ({len(keystroke_data)}), maximum per chunk is {config.MAX_KEYSTROKE_EVENTS}"}), 400
+    
+    add_request_log_fields(user_id=session.user_id, session_id=session_id, keystroke_events=len(keystroke_data))
+    try:
+        with session.lock:
+            records = session.add_events(keystroke_data)
+            score = _score_session(session) if records else None
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"{APIConfig.INVALID_KEYSTROKE_DATA}: {e}"}), 400
+    
+    if score is not None:
+        add_request_log_fields(authenticated=score['authenticated'], confidence_score=score['confidence_score'])
+    return jsonify({
+        "session_id": session_id,
+        "user_id": session.user_id,
+        "presses": session.stream.presses,
+        "pending_presses": session.stream.pending,
+        "timings": [_timing_record_json(record) for record in records],
+        "score": score
+    }), 200
+
+
+@app.route('/session/<session_id>', methods=['GET', 'DELETE'])
+def session_status(session_id):
+    """
+    Get a session's state and recent rolling scores, or end it with DELETE.
+    
+    Returns:
+        JSON with the session summary
+    """
+    session = sessions.pop(session_id) if request.method == 'DELETE' else sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": APIConfig.SESSION_NOT_FOUND}), 404
+    return jsonify(session.summary()), 200
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """
     Health check endpoint to verify the API is running.
+    
+    While models are being preloaded at startup the status is "warming" with
+    HTTP 503, so load balancers only route traffic to warm workers.
     """
-    return jsonify({
+    response = {
         "status": "healthy",
         "service": "Keystroke Dynamics Authentication API",
         "timestamp": datetime.now().isoformat()
-    }), 200
+    }
+    if adaptive_refresh is not None:
+        response["adaptive_refresh"] = adaptive_refresh.status()
+    if model_warmer is not None:
+        response["warmup"] = model_warmer.status()
+        if not model_warmer.ready:
+            response["status"] = "warming"
+            return jsonify(response), 503
+    return jsonify(response), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Expose request, stage, training and model cache metrics of this worker
+    process in the Prometheus text format.
+    """
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Get model cache usage, hit/miss counters and evictions for this worker process.
+    """
+    if model_cache is None:
+        return jsonify({"enabled": False}), 200
+    
+    stats = model_cache.stats()
+    stats['enabled'] = True
+    return jsonify(stats), 200
 
 
 @app.route('/user/<user_id>/info', methods=['GET'])
@@ -518,6 +1724,9 @@ def get_user_info(user_id):
     """
     Get information about a user's training data and model status.
     
+    Answered from the storage's per-user info index, so neither the samples
+    nor the model are read.
+    
     Args:
         user_id (str): User identifier in URL path
         
@@ -525,23 +1734,82 @@ def get_user_info(user_id):
         JSON with user training information
     """
     try:
-        # Check if user has training data
-        existing_features = load_user_features(user_id)
+        info = storage.read_user_info(user_id)
+        model_info = info['model']
+        has_model = info['has_model'] and model_info is not None
         
-        # Check if user has a trained model
-        model, max_feature_length = load_user_model(user_id)
-        has_model = model is not None
+        # Same rules as get_user_feature_schema, from the indexed sample counts
+        if model_info is not None:
+            schema = model_info.get('feature_schema') or POSITIONAL_SCHEMA
+        else:
+            schema = next((schema for schema in (config.FEATURE_SCHEMA,) + FEATURE_SCHEMAS
+                           if info['samples'].get(schema)), config.FEATURE_SCHEMA)
         
         return jsonify({
             "user_id": user_id,
-            "training_samples": len(existing_features),
+            "training_samples": info['samples'].get(schema, 0),
             "has_trained_model": has_model,
             "min_samples_required": config.MIN_SAMPLES_FOR_TRAINING,
-            "max_feature_length": max_feature_length if has_model else None
+            "max_feature_length": model_info.get('max_feature_length') if has_model else None,
+            "feature_schema": schema,
+            "model_version": model_info.get('model_version') if has_model else None,
+            "trained_samples": model_info.get('samples_count') if has_model else None,
+            "last_trained_at": model_info.get('created_at') if has_model else None,
+            "training_job": training_queue.get_user_job(user_id) if training_queue is not None else None
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting user info for {user_id}: {e}")
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route('/user/<user_id>/threshold', methods=['GET', 'PUT'])
+def user_threshold(user_id):
+    """
+    Get or set the decision threshold applied to a user's anomaly scores.
+    
+    Samples scoring at or above the threshold are authenticated. Raising it
+    makes authentication stricter; the model does not need to be retrained.
+    
+    Expected JSON format for PUT:
+    {"threshold": -0.02}    (null restores the default)
+    
+    Returns:
+        JSON with the user's current threshold
+    """
+    try:
+        metadata = load_user_metadata(user_id)
+        if not metadata:
+            return jsonify({"error": APIConfig.USER_MODEL_NOT_FOUND}), 404
+        
+        if request.method == 'PUT':
+            if not request.is_json:
+                return jsonify({"error": "Request must be JSON"}), 400
+            
+            data = request.get_json()
+            if 'threshold' not in data:
+                return jsonify({"error": "Missing required field: threshold"}), 400
+            
+            threshold = data['threshold']
+            if threshold is not None:
+                if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not -1.0 <= threshold <= 1.0:
+                    return jsonify({"error": "threshold must be a number between -1 and 1, or null"}), 400
+                threshold = float(threshold)
+            
+            # Re-read under the user's lock so metadata saved by a concurrent training run is kept
+            with user_locks.lock(user_id):
+                metadata = load_user_metadata(user_id) or metadata
+                metadata['decision_threshold'] = threshold
+                save_user_metadata(user_id, metadata)
+        
+        return jsonify({
+            "user_id": user_id,
+            "decision_threshold": get_decision_threshold(metadata),
+            "is_default": metadata.get('decision_threshold') is None
         }), 200
         
     except Exception as e:
-        print(f"Error getting user info for {user_id}: {e}")
+        logger.error(f"Error handling threshold for {user_id}: {e}")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
 
@@ -578,9 +1846,19 @@ if __name__ == '__main__':
     print(f"Minimum samples for training: {config.MIN_SAMPLES_FOR_TRAINING}")
     print("Available endpoints:")
     print("  POST /train    - Train user keystroke model")
+    print("  POST /train/bulk - Enroll many samples of many users at once")
+    print("  GET  /train/<job_id> - Get background training job status")
     print("  POST /predict  - Authenticate user via keystroke")
+    print("  POST /predict/batch - Score many samples, streamed as NDJSON")
+    print("  POST /predict/windows - Score a long keystroke stream over sliding windows")
+    print("  POST /session  - Start a continuous authentication session")
+    print("  POST /session/<id>/keystrokes - Stream keystrokes, get rolling scores")
+    print("  GET/DELETE /session/<id> - Session state, or end the session")
     print("  GET  /health   - Health check")
+    print("  GET  /cache/stats - Model cache statistics")
+    print("  GET  /metrics - Prometheus-style metrics")
     print("  GET  /user/<id>/info - Get user training info")
+    print("  GET/PUT /user/<id>/threshold - Get or tune the decision threshold")
     print("=" * 60)
     
     # Run the Flask app
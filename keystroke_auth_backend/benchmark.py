@@ -0,0 +1,358 @@
+"""
+Load Testing Benchmark for Keystroke Dynamics Authentication Backend
+
+This script starts the Flask application on a local port (or targets a running
+server), enrolls synthetic users with realistic keystroke streams and measures
+throughput and latency percentiles of /train, /predict and /user/<id>/info
+under concurrent load. Results are written as JSON so they can be compared
+between runs; with --baseline the run fails when a latency percentile or the
+throughput regresses by more than --max-regression.
+
+Usage:
+    python benchmark.py --users 50 --concurrency 8 --output results.json
+    python benchmark.py --baseline results.json
+    python benchmark.py --base-url http://localhost:5000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import requests
+
+# Letters typed by the synthetic users, with a space between words
+WORDS = [
+    'secure', 'keyboard', 'rhythm', 'samsung', 'mobile', 'password', 'typing', 'pattern',
+    'network', 'digital', 'galaxy', 'private', 'access', 'signal', 'monday', 'river'
+]
+PERCENTILES = (50, 95, 99)
+
+
+class TypingProfile:
+    """Typing rhythm of one synthetic user."""
+
+    def __init__(self, rng, hold_ms=None, flight_ms=None):
+        """
+        Args:
+            rng (numpy.random.Generator): Random source
+            hold_ms (float): Mean hold time, drawn per user if omitted
+            flight_ms (float): Mean keyup-keydown time, drawn per user if omitted
+        """
+        self.rng = rng
+        base_hold = hold_ms if hold_ms is not None else rng.uniform(70, 140)
+        base_flight = flight_ms if flight_ms is not None else rng.uniform(60, 220)
+        # Every key has its own typical timing around the user's base rhythm
+        self.hold = {key: max(20.0, rng.normal(base_hold, 0.2 * base_hold)) for key in 'abcdefghijklmnopqrstuvwxyz '}
+        self.flight = {key: rng.normal(base_flight, 0.3 * base_flight) for key in 'abcdefghijklmnopqrstuvwxyz '}
+        self.noise = rng.uniform(0.05, 0.15)
+
+    def type_text(self, text):
+        """
+        Generate the keystroke events of typing a text once.
+
+        Flight times may be negative, in which case the next key is pressed
+        before the previous one is released (key rollover).
+
+        Args:
+            text (str): Text to type
+
+        Returns:
+            list: Keystroke events sorted by timestamp
+        """
+        events = []
+        now = float(self.rng.integers(1000, 2000))
+        for key in text:
+            hold = max(15.0, self.rng.normal(self.hold[key], self.noise * self.hold[key]))
+            flight = self.rng.normal(self.flight[key], self.noise * abs(self.flight[key]) + 5)
+            events.append({"key": key, "event": "down", "timestamp": int(now)})
+            events.append({"key": key, "event": "up", "timestamp": int(now + hold)})
+            now += max(10.0, hold + flight)
+        events.sort(key=lambda event: event['timestamp'])
+        return events
+
+
+def latency_summary(latencies_ms, errors, wall_seconds):
+    """
+    Summarize the latencies of one benchmark phase.
+
+    Args:
+        latencies_ms (list): Latency of every request in milliseconds
+        errors (int): Number of failed requests
+        wall_seconds (float): Wall time of the phase
+
+    Returns:
+        dict: Request counts, throughput and latency statistics
+    """
+    summary = {
+        'requests': len(latencies_ms),
+        'errors': errors,
+        'wall_seconds': round(wall_seconds, 4),
+        'throughput_rps': round(len(latencies_ms) / wall_seconds, 2) if wall_seconds > 0 else 0.0
+    }
+    if latencies_ms:
+        values = np.asarray(latencies_ms)
+        summary['latency_ms'] = {
+            'mean': round(float(values.mean()), 3),
+            'min': round(float(values.min()), 3),
+            **{f"p{q}": round(float(np.percentile(values, q)), 3) for q in PERCENTILES},
+            'max': round(float(values.max()), 3)
+        }
+    return summary
+
+
+class Benchmark:
+    """Runs the load phases against one server."""
+
+    def __init__(self, base_url, concurrency, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _call(self, method, path, payload=None):
+        """Send one request, returning (latency_ms, ok, json_body)."""
+        start = time.perf_counter()
+        try:
+            response = self._session().request(method, self.base_url + path, json=payload, timeout=self.timeout)
+            latency_ms = (time.perf_counter() - start) * 1000
+            body = response.json() if response.content else None
+            return latency_ms, response.status_code < 400, body
+        except (requests.RequestException, ValueError):
+            return (time.perf_counter() - start) * 1000, False, None
+
+    def run_phase(self, requests_to_send):
+        """
+        Send requests concurrently and measure them.
+
+        Args:
+            requests_to_send (list): (method, path, payload) tuples
+
+        Returns:
+            tuple: (summary dict, list of response bodies in request order)
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(lambda request: self._call(*request), requests_to_send))
+        wall_seconds = time.perf_counter() - start
+
+        latencies = [latency for latency, ok, _ in results if ok]
+        errors = sum(1 for _, ok, _ in results if not ok)
+        return latency_summary(latencies, errors, wall_seconds), [body for _, _, body in results]
+
+    def wait_for_models(self, user_ids, timeout):
+        """Poll /user/<id>/info until every user has a trained model and no pending job."""
+        deadline = time.monotonic() + timeout
+        pending = set(user_ids)
+        while pending and time.monotonic() < deadline:
+            for user_id in list(pending):
+                _, ok, body = self._call('GET', f"/user/{user_id}/info")
+                job = body.get('training_job') if ok and body else None
+                if ok and body.get('has_trained_model') and not (job and job['status'] in ('queued', 'running')):
+                    pending.discard(user_id)
+            if pending:
+                time.sleep(0.2)
+        return len(pending)
+
+
+def start_local_server(model_dir, log_level):
+    """
+    Import the application with its storage in model_dir and serve it on a free port.
+
+    Args:
+        model_dir (str): Model storage directory for the application
+        log_level (str): Logging level of the in-process application
+
+    Returns:
+        tuple: (base_url, server)
+    """
+    os.environ['MODEL_DIR'] = model_dir
+    # Measure the production configuration unless another one is selected
+    os.environ.setdefault('FLASK_ENV', 'production')
+
+    from werkzeug.serving import make_server
+    import app as app_module
+
+    # Per-request logging of the application would dominate the measurements
+    logging.getLogger().setLevel(log_level)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def compare_with_baseline(results, baseline, max_regression):
+    """
+    List the metrics that got worse than the baseline by more than max_regression.
+
+    Args:
+        results (dict): Current benchmark results
+        baseline (dict): Results of an earlier run
+        max_regression (float): Allowed relative slowdown, e.g. 0.2 for 20%
+
+    Returns:
+        list: Regression descriptions
+    """
+    regressions = []
+    for endpoint, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if not previous:
+            continue
+        for metric in [f"p{q}" for q in PERCENTILES]:
+            before = previous.get('latency_ms', {}).get(metric)
+            after = current.get('latency_ms', {}).get(metric)
+            if before and after and after > before * (1 + max_regression):
+                regressions.append(f"{endpoint} {metric} latency {before}ms -> {after}ms")
+        before, after = previous.get('throughput_rps'), current.get('throughput_rps')
+        if before and after is not None and after < before / (1 + max_regression):
+            regressions.append(f"{endpoint} throughput {before} -> {after} req/s")
+    return regressions
+
+
+def run(args):
+    """Run every benchmark phase and return the results dict."""
+    rng = np.random.default_rng(args.seed)
+    random.seed(args.seed)
+
+    server = None
+    model_dir = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        model_dir = args.model_dir or tempfile.mkdtemp(prefix='keystroke_bench_')
+        base_url, server = start_local_server(model_dir, args.log_level)
+
+    benchmark = Benchmark(base_url, args.concurrency, args.timeout)
+    run_id = datetime.now().strftime('%Y%m%d%H%M%S')
+    user_ids = [f"bench_{run_id}_{index}" for index in range(args.users)]
+    profiles = {user_id: TypingProfile(rng) for user_id in user_ids}
+    texts = {user_id: ' '.join(rng.choice(WORDS, size=args.words)) for user_id in user_ids}
+
+    # Enrollment: samples of all users interleaved, each user's samples in order
+    train_requests = [
+        ('POST', '/train', {'user_id': user_id, 'keystroke_data': profiles[user_id].type_text(texts[user_id])})
+        for _ in range(args.samples) for user_id in user_ids
+    ]
+    train_summary, _ = benchmark.run_phase(train_requests)
+
+    wait_start = time.perf_counter()
+    untrained = benchmark.wait_for_models(user_ids, args.training_timeout)
+    training_wait = time.perf_counter() - wait_start
+
+    # Authentication: genuine samples, and the same texts typed by another user
+    predict_requests = []
+    genuine = []
+    for _ in range(args.predictions):
+        for index, user_id in enumerate(user_ids):
+            is_genuine = random.random() >= args.imposter_ratio or len(user_ids) == 1
+            typist = user_id if is_genuine else user_ids[(index + 1) % len(user_ids)]
+            keystroke_data = profiles[typist].type_text(texts[user_id])
+            predict_requests.append(('POST', '/predict', {'user_id': user_id, 'keystroke_data': keystroke_data}))
+            genuine.append(is_genuine)
+    predict_summary, predict_bodies = benchmark.run_phase(predict_requests)
+
+    info_requests = [('GET', f"/user/{user_id}/info", None) for _ in range(args.info_requests) for user_id in user_ids]
+    info_summary, _ = benchmark.run_phase(info_requests)
+
+    accepted = [bool(body and body.get('authenticated')) for body in predict_bodies]
+    genuine_total = sum(genuine)
+    imposter_total = len(genuine) - genuine_total
+
+    if server is not None:
+        server.shutdown()
+
+    return {
+        'benchmark': 'keystroke_auth_backend',
+        'timestamp': datetime.now().isoformat(),
+        'target': 'local' if args.base_url is None else base_url,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'parameters': {
+            'users': args.users,
+            'samples_per_user': args.samples,
+            'predictions_per_user': args.predictions,
+            'info_requests_per_user': args.info_requests,
+            'words_per_sample': args.words,
+            'imposter_ratio': args.imposter_ratio,
+            'concurrency': args.concurrency,
+            'seed': args.seed
+        },
+        'endpoints': {
+            'train': train_summary,
+            'predict': predict_summary,
+            'user_info': info_summary
+        },
+        'training': {
+            'wait_seconds': round(training_wait, 4),
+            'users_without_model': untrained
+        },
+        'accuracy': {
+            'genuine_accept_rate': round(sum(a for a, g in zip(accepted, genuine) if g) / genuine_total, 4) if genuine_total else None,
+            'imposter_reject_rate': round(sum(not a for a, g in zip(accepted, genuine) if not g) / imposter_total, 4) if imposter_total else None
+        }
+    }
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Load test the keystroke authentication API")
+    parser.add_argument('--base-url', help="Benchmark a running server instead of starting one")
+    parser.add_argument('--model-dir', help="Model directory of the local server (default: new temp dir)")
+    parser.add_argument('--users', type=int, default=20, help="Synthetic users")
+    parser.add_argument('--samples', type=int, default=10, help="Enrollment samples per user")
+    parser.add_argument('--predictions', type=int, default=20, help="/predict requests per user")
+    parser.add_argument('--info-requests', type=int, default=5, help="/user/<id>/info requests per user")
+    parser.add_argument('--words', type=int, default=2, help="Words typed per sample")
+    parser.add_argument('--imposter-ratio', type=float, default=0.3, help="Share of /predict samples typed by another user")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent client threads")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument('--training-timeout', type=float, default=300.0, help="Seconds to wait for background training")
+    parser.add_argument('--log-level', default='WARNING', help="Logging level of the local server")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    parser.add_argument('--baseline', help="Earlier results to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="Allowed relative slowdown against the baseline")
+    args = parser.parse_args()
+
+    # Keep the in-process server's request logging out of the JSON output
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run(args)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            results['regressions'] = compare_with_baseline(results, json.load(f), args.max_regression)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    for regression in results.get('regressions', []):
+        print(f"❌ Regression: {regression}", file=sys.stderr)
+    return not results.get('regressions')
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
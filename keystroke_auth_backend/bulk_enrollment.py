@@ -0,0 +1,213 @@
+"""
+Bulk Enrollment Module for Keystroke Dynamics Authentication Backend
+
+This module imports many enrollment samples for many users at once, e.g. when
+migrating users from another system. Instead of one /train call per sample,
+the features of all samples are extracted in parallel worker processes, each
+user's samples are stored with a single append, and each user's model is
+fitted once after all of their samples are stored.
+
+It backs the POST /train/bulk endpoint and an offline command line tool that
+works directly on the configured storage:
+
+    python bulk_enrollment.py samples.jsonl --workers 8
+
+The input file holds {"user_id": ..., "keystroke_data": [...]} objects, one
+per line or as a single JSON list; a user's samples may be spread over the
+file.
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from config import get_config
+from training_queue import run_user_jobs
+
+config = get_config()
+logger = logging.getLogger(__name__)
+
+# Samples per extraction task, so the samples of one large user still spread over the workers
+EXTRACTION_CHUNK_SAMPLES = 50
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_extraction_executor():
+    """
+    Process pool extracting /train/bulk features, created on first use.
+
+    Returns:
+        ProcessPoolExecutor: Shared pool, None if BULK_EXTRACTION_WORKERS is 0
+    """
+    global _executor
+    if config.BULK_EXTRACTION_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=config.BULK_EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context(config.TRAINING_START_METHOD)
+            )
+            atexit.register(_executor.shutdown, wait=False)
+    return _executor
+
+
+def extract_samples(schema, samples):
+    """
+    Extract the feature vectors of several keystroke samples.
+
+    Runs in worker processes, which import the app lazily like training jobs do.
+
+    Args:
+        schema (str): Feature schema of the user
+        samples (list): Keystroke event lists
+
+    Returns:
+        tuple: (features, rejected) with the extracted feature vectors and the
+               number of samples no features could be extracted from
+    """
+    from app import extract_features
+    features = []
+    for keystroke_data in samples:
+        try:
+            vector = extract_features(keystroke_data, schema)
+        except (KeyError, TypeError, ValueError):
+            vector = None
+        if vector:
+            features.append(vector)
+    return features, len(samples) - len(features)
+
+
+def extract_user_samples(users, executor=None):
+    """
+    Extract the features of many users' samples, in parallel if an executor is given.
+
+    Args:
+        users (list): (user_id, schema, samples) tuples, one per user
+        executor (Executor): Pool running the extraction tasks, None to extract inline
+
+    Returns:
+        dict: user_id -> (features, rejected)
+    """
+    tasks = [
+        (user_id, schema, samples[start:start + EXTRACTION_CHUNK_SAMPLES])
+        for user_id, schema, samples in users
+        for start in range(0, len(samples), EXTRACTION_CHUNK_SAMPLES)
+    ]
+    if executor is None or len(tasks) < 2:
+        results = [extract_samples(schema, chunk) for _, schema, chunk in tasks]
+    else:
+        results = executor.map(extract_samples, [task[1] for task in tasks], [task[2] for task in tasks])
+
+    extracted = {user_id: ([], 0) for user_id, _, _ in users}
+    for (user_id, _, _), (features, rejected) in zip(tasks, results):
+        user_features, user_rejected = extracted[user_id]
+        user_features.extend(features)
+        extracted[user_id] = (user_features, user_rejected + rejected)
+    return extracted
+
+
+def import_user(user_id, samples, train=True):
+    """
+    Extract, store and train one user's samples inside a worker process.
+
+    Args:
+        user_id (str): Unique identifier for the user
+        samples (list): Keystroke event lists
+        train (bool): Fit the user's model once the samples are stored
+
+    Returns:
+        dict: user_id, samples_added, rejected, samples_count, model_trained and training_mode
+    """
+    from app import append_user_feature_batch, get_user_feature_schema, train_user_model
+    schema = get_user_feature_schema(user_id)
+    features, rejected = extract_samples(schema, samples)
+    result = {
+        'user_id': user_id,
+        'samples_added': len(features),
+        'rejected': rejected,
+        'samples_count': None,
+        'model_trained': False,
+        'training_mode': None
+    }
+    if features:
+        result['samples_count'] = append_user_feature_batch(user_id, features, schema)
+    if train and features and result['samples_count'] >= config.MIN_SAMPLES_FOR_TRAINING:
+        summary = train_user_model(user_id, n_jobs=1)
+        result['model_trained'] = summary['model_trained']
+        result['training_mode'] = summary['training_mode']
+    return result
+
+
+def read_enrollment_file(path):
+    """
+    Read samples from a JSON lines file or a JSON list, grouped by user.
+
+    Args:
+        path (str): Input file
+
+    Returns:
+        OrderedDict: user_id -> list of keystroke event lists, in order of first appearance
+    """
+    with open(path, 'r') as f:
+        content = f.read()
+    stripped = content.lstrip()
+    if stripped.startswith('['):
+        records = json.loads(stripped)
+    else:
+        records = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    users = OrderedDict()
+    for record in records:
+        users.setdefault(str(record['user_id']), []).append(record['keystroke_data'])
+    return users
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Import enrollment samples for many users")
+    parser.add_argument('input', help="JSON lines file (or JSON list) of {user_id, keystroke_data} samples")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--no-train', action='store_true', help="Only store the samples, do not fit models")
+    args = parser.parse_args()
+
+    users = read_enrollment_file(args.input)
+    n_samples = sum(len(samples) for samples in users.values())
+    print(f"Importing {n_samples} samples of {len(users)} users into {config.MODEL_DIR} with {args.workers} workers")
+
+    started = time.monotonic()
+    done = added = rejected = trained = failed = 0
+    progress_every = max(1, len(users) // 20)
+    jobs = [(user_id, (samples, not args.no_train)) for user_id, samples in users.items()]
+    for user_id, result, error in run_user_jobs(import_user, jobs, args.workers):
+        done += 1
+        if error is not None:
+            failed += 1
+            print(f"Failed to import user {user_id}: {error}", file=sys.stderr)
+        else:
+            added += result['samples_added']
+            rejected += result['rejected']
+            trained += result['model_trained']
+        if done % progress_every == 0 or done == len(users):
+            elapsed = time.monotonic() - started
+            print(f"[{done}/{len(users)}] {added} samples stored, {trained} models trained, "
+                  f"{done / elapsed:.1f} users/s")
+
+    elapsed = time.monotonic() - started
+    print(f"Imported {added} samples ({rejected} rejected) of {len(users) - failed} users "
+          f"and trained {trained} models in {elapsed:.1f}s")
+    return failed == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,456 @@
+"""
+Compact IsolationForest Format for Keystroke Dynamics Authentication Backend
+
+This module flattens a fitted scikit-learn IsolationForest into a handful of
+contiguous NumPy arrays (one entry per tree node) and stores them in a single
+binary file. Loading the file needs only NumPy: uncompressed files are
+memory-mapped, so cold loads are cheap and the operating system page cache is
+shared between worker processes. The loaded FlatForest object can score
+samples exactly like the original model, and can take over trees from another
+forest for incremental training, but it carries no scikit-learn estimators.
+
+File layout:
+
+    b'KFOREST1' | uint32 header length | JSON header | padding | array payload
+
+The JSON header lists every array with its dtype, shape and offset inside the
+payload, the forest attributes needed for scoring, and the payload compression.
+
+Usage (convert existing joblib models): python compact_forest.py export [model_dir]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import zlib
+
+import numpy as np
+
+MAGIC = b'KFOREST1'
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+COMPRESSION_NONE = 'none'
+COMPRESSION_ZLIB = 'zlib'
+
+# Node arrays stored for every tree node of every tree
+NODE_ARRAYS = ('feature', 'threshold', 'children_left', 'children_right', 'path_length')
+LEAF = -1
+
+
+def average_path_length(n_samples):
+    """
+    Average path length of an unsuccessful search in a binary search tree of n_samples.
+
+    Mirrors sklearn.ensemble._iforest._average_path_length for a scalar.
+
+    Args:
+        n_samples (int): Number of samples
+
+    Returns:
+        float: Average path length
+    """
+    if n_samples <= 1:
+        return 0.0
+    if n_samples == 2:
+        return 1.0
+    return 2.0 * (np.log(n_samples - 1.0) + np.euler_gamma) - 2.0 * (n_samples - 1.0) / n_samples
+
+
+def _round_down_float32(values):
+    """Largest float32 <= value, so `x <= t` is unchanged for float32 inputs x."""
+    rounded = values.astype(np.float32)
+    too_large = rounded.astype(np.float64) > values
+    rounded[too_large] = np.nextafter(rounded[too_large], np.float32(-np.inf))
+    return rounded
+
+
+class FlatForest:
+    """Scoring-only IsolationForest whose trees are stored as flat node arrays."""
+
+    def __init__(self, arrays, offset, n_features, max_samples):
+        """
+        Args:
+            arrays (dict): 'roots' plus the per-node arrays listed in NODE_ARRAYS
+            offset (float): Decision offset (IsolationForest.offset_)
+            n_features (int): Number of input features
+            max_samples (int): Samples drawn per tree (IsolationForest.max_samples_)
+        """
+        self.roots = arrays['roots']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children_left = arrays['children_left']
+        self.children_right = arrays['children_right']
+        self.path_length = arrays['path_length']
+        self.offset_ = float(offset)
+        self.n_features_in_ = int(n_features)
+        self.max_samples_ = int(max_samples)
+        # Traversal tables built by compile()
+        self._compiled = None
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Flatten a fitted IsolationForest.
+
+        Args:
+            model (IsolationForest): Fitted model
+
+        Returns:
+            FlatForest: Equivalent scoring-only forest
+        """
+        subsample_features = model._max_features != model.n_features_in_
+        parts = {name: [] for name in NODE_ARRAYS}
+        roots = []
+        node_offset = 0
+
+        for tree_idx, (estimator, features) in enumerate(zip(model.estimators_, model.estimators_features_)):
+            tree = estimator.tree_
+            is_leaf = tree.children_left == LEAF
+
+            feature = np.where(is_leaf, 0, tree.feature)
+            if subsample_features:
+                feature = np.asarray(features)[feature]
+
+            roots.append(node_offset)
+            parts['feature'].append(feature.astype(np.int32))
+            parts['threshold'].append(_round_down_float32(tree.threshold))
+            parts['children_left'].append(np.where(is_leaf, LEAF, tree.children_left + node_offset).astype(np.int32))
+            parts['children_right'].append(np.where(is_leaf, LEAF, tree.children_right + node_offset).astype(np.int32))
+            # Same per-node contribution IsolationForest adds for the leaf a sample lands in
+            parts['path_length'].append((
+                model._decision_path_lengths[tree_idx] +
+                model._average_path_length_per_tree[tree_idx] - 1.0
+            ).astype(np.float32))
+            node_offset += tree.node_count
+
+        arrays = {name: np.concatenate(values) for name, values in parts.items()}
+        arrays['roots'] = np.array(roots, dtype=np.int32)
+        return cls(arrays, model.offset_, model.n_features_in_, model.max_samples_)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        """Memory held by the node arrays and, once built, the traversal tables."""
+        total = sum(array.nbytes for array in self._arrays().values())
+        compiled = self._compiled
+        if compiled is not None:
+            total += compiled[0].nbytes + compiled[1].nbytes
+        return total
+
+    def _arrays(self):
+        arrays = {name: getattr(self, name) for name in NODE_ARRAYS}
+        arrays['roots'] = self.roots
+        return arrays
+
+    def score_samples(self, X):
+        """
+        Opposite of the anomaly score, as IsolationForest.score_samples.
+
+        Args:
+            X (array-like): 2D array of shape (n_samples, n_features)
+
+        Returns:
+            numpy.ndarray: Scores, the lower the more abnormal
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, expected (n_samples, {self.n_features_in_})")
+
+        children, feature, max_depth = self.compile()
+        threshold = self.threshold
+
+        if len(X) == 1:
+            # Single sample: one gather per level over all trees at once
+            x = X[0]
+            nodes = self.roots.astype(np.intp)
+            for _ in range(max_depth):
+                nodes = children[2 * nodes + (x[feature[nodes]] > threshold[nodes])]
+            depths = self.path_length[nodes].sum(dtype=np.float64)[None]
+        else:
+            # Index the flattened rows directly instead of 2D fancy indexing
+            values = X.ravel()
+            row_offsets = np.arange(0, X.size, X.shape[1], dtype=np.intp)[:, None]
+            nodes = np.broadcast_to(self.roots.astype(np.intp), (len(X), self.n_estimators))
+            for _ in range(max_depth):
+                go_right = values.take(row_offsets + feature.take(nodes)) > threshold.take(nodes)
+                nodes = children.take(2 * nodes + go_right)
+            depths = self.path_length.take(nodes).sum(axis=1, dtype=np.float64)
+
+        denominator = self.n_estimators * average_path_length(self.max_samples_)
+        if denominator == 0:
+            return -np.ones(len(X))
+        return -(2.0 ** (-depths / denominator))
+
+    def compile(self):
+        """
+        Build the traversal tables used for scoring, once per forest.
+
+        Children are interleaved as [left, right] per node and leaves point to
+        themselves, so every (sample, tree) pair can be advanced exactly
+        max_depth times without checking which ones already reached a leaf.
+        Index arrays are widened to the native index type to avoid casts.
+
+        Returns:
+            tuple: (children, feature, max_depth)
+        """
+        compiled = self._compiled
+        if compiled is None:
+            is_leaf = self.children_left == LEAF
+            node_ids = np.arange(self.node_count, dtype=np.intp)
+            children = np.empty(2 * self.node_count, dtype=np.intp)
+            children[0::2] = np.where(is_leaf, node_ids, self.children_left)
+            children[1::2] = np.where(is_leaf, node_ids, self.children_right)
+
+            max_depth = 0
+            frontier = self.roots[~is_leaf[self.roots]]
+            while len(frontier):
+                max_depth += 1
+                frontier = np.concatenate([self.children_left[frontier], self.children_right[frontier]])
+                frontier = frontier[~is_leaf[frontier]]
+
+            compiled = self._compiled = (children, self.feature.astype(np.intp), max_depth)
+        return compiled
+
+    def decision_function(self, X):
+        """Anomaly score shifted by the fitted offset; negative values are outliers."""
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        """Return +1 for inliers and -1 for outliers."""
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def replace_oldest_trees(self, donor, offset):
+        """
+        Build a forest without the oldest trees and with all trees of donor appended.
+
+        Args:
+            donor (FlatForest): Forest providing the new trees
+            offset (float): Decision offset of the resulting forest
+
+        Returns:
+            FlatForest: New forest with the same number of trees
+        """
+        n_new_trees = donor.n_estimators
+        first_kept_node = self.roots[n_new_trees] if n_new_trees < self.n_estimators else self.node_count
+        kept_nodes = self.node_count - first_kept_node
+        arrays = {}
+
+        for name in ('feature', 'threshold', 'path_length'):
+            arrays[name] = np.concatenate([getattr(self, name)[first_kept_node:], getattr(donor, name)])
+
+        for name in ('children_left', 'children_right'):
+            kept = getattr(self, name)[first_kept_node:]
+            added = getattr(donor, name)
+            arrays[name] = np.concatenate([
+                np.where(kept == LEAF, LEAF, kept - first_kept_node),
+                np.where(added == LEAF, LEAF, added + kept_nodes)
+            ]).astype(np.int32)
+
+        arrays['roots'] = np.concatenate([
+            self.roots[n_new_trees:] - first_kept_node,
+            donor.roots + kept_nodes
+        ]).astype(np.int32)
+        return FlatForest(arrays, offset, self.n_features_in_, self.max_samples_)
+
+    def to_bytes(self, compression=COMPRESSION_NONE, compression_level=6):
+        """
+        Serialize the forest in the compact file format.
+
+        Args:
+            compression (str): 'none' (memory-mappable) or 'zlib'
+            compression_level (int): zlib compression level
+
+        Returns:
+            bytes: Serialized forest
+        """
+        if compression not in (COMPRESSION_NONE, COMPRESSION_ZLIB):
+            raise ValueError(f"Unsupported compression: {compression}")
+
+        entries = {}
+        chunks = []
+        position = 0
+        for name, array in self._arrays().items():
+            data = np.ascontiguousarray(array).tobytes()
+            entries[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': position}
+            padding = -len(data) % ALIGNMENT
+            chunks.append(data + b'\0' * padding)
+            position += len(data) + padding
+
+        payload = b''.join(chunks)
+        if compression == COMPRESSION_ZLIB:
+            payload = zlib.compress(payload, compression_level)
+
+        header = json.dumps({
+            'version': FORMAT_VERSION,
+            'compression': compression,
+            'arrays': entries,
+            'offset': self.offset_,
+            'n_features': self.n_features_in_,
+            'max_samples': self.max_samples_
+        }).encode('utf-8')
+        prefix = MAGIC + np.array([len(header)], dtype='<u4').tobytes() + header
+        prefix += b'\0' * (-len(prefix) % ALIGNMENT)
+        return prefix + payload
+
+    def save(self, path, compression=COMPRESSION_NONE, compression_level=6):
+        """
+        Write the forest to a single file, atomically replacing an existing one.
+
+        Args:
+            path (str): Destination file path
+            compression (str): 'none' (memory-mappable) or 'zlib'
+            compression_level (int): zlib compression level
+        """
+        data = self.to_bytes(compression, compression_level)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_header(read, source):
+        """Parse the header with a read(n) callable, returning (header, payload_start)."""
+        if read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{source} is not a compact forest")
+        header_length = int(np.frombuffer(read(4), dtype='<u4')[0])
+        header = json.loads(bytes(read(header_length)).decode('utf-8'))
+        payload_start = len(MAGIC) + 4 + header_length
+        payload_start += -payload_start % ALIGNMENT
+
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact forest version: {header['version']}")
+        return header, payload_start
+
+    @classmethod
+    def _from_payload(cls, header, payload):
+        """Build a forest from a parsed header and its uint8 payload array."""
+        arrays = {}
+        for name, entry in header['arrays'].items():
+            dtype = np.dtype(entry['dtype'])
+            count = int(np.prod(entry['shape']))
+            start = entry['offset']
+            arrays[name] = payload[start:start + count * dtype.itemsize].view(dtype).reshape(entry['shape'])
+
+        return cls(arrays, header['offset'], header['n_features'], header['max_samples'])
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a forest written by save().
+
+        Uncompressed files are memory-mapped and the arrays are read-only views.
+
+        Args:
+            path (str): Forest file path
+
+        Returns:
+            FlatForest: Loaded forest
+        """
+        with open(path, 'rb') as f:
+            header, payload_start = cls._read_header(f.read, path)
+            if header['compression'] == COMPRESSION_ZLIB:
+                f.seek(payload_start)
+                payload = np.frombuffer(zlib.decompress(f.read()), dtype=np.uint8)
+            else:
+                payload = np.memmap(path, dtype=np.uint8, mode='r', offset=payload_start)
+
+        return cls._from_payload(header, payload)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Load a forest serialized by to_bytes().
+
+        Uncompressed arrays are read-only views into the given buffer.
+
+        Args:
+            data (bytes): Serialized forest
+
+        Returns:
+            FlatForest: Loaded forest
+        """
+        view = memoryview(data)
+        position = 0
+
+        def read(size):
+            nonlocal position
+            chunk = view[position:position + size]
+            position += size
+            return chunk
+
+        header, payload_start = cls._read_header(read, 'buffer')
+        if header['compression'] == COMPRESSION_ZLIB:
+            payload = np.frombuffer(zlib.decompress(view[payload_start:]), dtype=np.uint8)
+        else:
+            payload = np.frombuffer(data, dtype=np.uint8, offset=payload_start)
+
+        return cls._from_payload(header, payload)
+
+
+def export_model_dir(model_dir, compression=COMPRESSION_NONE, remove_joblib=False):
+    """
+    Convert every joblib model in a directory to the compact format.
+
+    Args:
+        model_dir (str): Directory containing {user_id}.joblib files, in any
+                         storage layout (subdirectories are searched)
+        compression (str): Compression for the written files
+        remove_joblib (bool): Delete each joblib file after a successful conversion
+
+    Returns:
+        tuple: (converted, failed) counts
+    """
+    import joblib
+
+    joblib_paths = sorted(
+        os.path.join(directory, filename)
+        for directory, _, filenames in os.walk(model_dir)
+        for filename in filenames if filename.endswith('.joblib')
+    )
+
+    converted = failed = 0
+    for joblib_path in joblib_paths:
+        filename = os.path.basename(joblib_path)
+        forest_path = joblib_path[:-len('.joblib')] + '.forest'
+        try:
+            flat = FlatForest.from_sklearn(joblib.load(joblib_path))
+            flat.save(forest_path, compression=compression)
+            if remove_joblib:
+                os.remove(joblib_path)
+            converted += 1
+            print(f"✅ {filename} -> {os.path.basename(forest_path)} "
+                  f"({os.path.getsize(forest_path)} bytes)")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {filename}: {e}")
+    return converted, failed
+
+
+def main():
+    """Command line entry point."""
+    from config import get_config
+
+    parser = argparse.ArgumentParser(description="Compact IsolationForest model tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help="Convert joblib models to the compact format")
+    export_parser.add_argument('model_dir', nargs='?', default=get_config().MODEL_DIR)
+    export_parser.add_argument('--compression', choices=[COMPRESSION_NONE, COMPRESSION_ZLIB], default=COMPRESSION_NONE)
+    export_parser.add_argument('--remove-joblib', action='store_true', help="Delete joblib files after conversion")
+    args = parser.parse_args()
+
+    converted, failed = export_model_dir(args.model_dir, args.compression, args.remove_joblib)
+    print(f"Converted {converted} models, {failed} failed")
+    return failed == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -18,23 +18,72 @@ class Config:
     
     # Model Storage Configuration
     MODEL_DIR = os.environ.get('MODEL_DIR', 'user_models')
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'files')  # 'files' or 'sqlite'
+    STORAGE_LAYOUT = os.environ.get('STORAGE_LAYOUT', 'flat')  # 'flat' or 'sharded' (hashed prefix directories), files backend
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', '')  # Database file, defaults to MODEL_DIR/keystroke.db
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 30.0))  # Seconds to wait for another writer
+    MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'joblib')  # 'joblib' or 'flat' (compact memory-mappable forest)
+    MODEL_COMPRESSION = os.environ.get('MODEL_COMPRESSION', 'none')  # 'none' (memory-mapped) or 'zlib', flat format only
+    SCORING_ENGINE = os.environ.get('SCORING_ENGINE', 'native')  # 'native' (flattened forest) or 'sklearn'
     
     # Machine Learning Configuration
     MIN_SAMPLES_FOR_TRAINING = int(os.environ.get('MIN_SAMPLES', 5))
+    SAMPLE_HISTORY_MAX = int(os.environ.get('SAMPLE_HISTORY_MAX', 0))  # Samples kept per user, 0 keeps every sample
+    SAMPLE_HISTORY_POLICY = os.environ.get('SAMPLE_HISTORY_POLICY', 'last')  # 'last', 'reservoir' or 'centroid'
+    SAMPLE_HISTORY_TRIM_FACTOR = float(os.environ.get('SAMPLE_HISTORY_TRIM_FACTOR', 2))  # Histories are trimmed to the cap once they exceed this multiple of it
     ISOLATION_FOREST_CONTAMINATION = float(os.environ.get('CONTAMINATION', 0.1))  # Expected proportion of outliers
     RANDOM_STATE = int(os.environ.get('RANDOM_STATE', 42))
+    DEFAULT_DECISION_THRESHOLD = float(os.environ.get('DECISION_THRESHOLD', 0.0))  # Minimum anomaly score to authenticate
+    
+    # Incremental Training Configuration
+    INCREMENTAL_TRAINING_ENABLED = os.environ.get('INCREMENTAL_TRAINING_ENABLED', 'True').lower() == 'true'
+    FULL_REFIT_INTERVAL = int(os.environ.get('FULL_REFIT_INTERVAL', 20))  # Samples between full refits
+    
+    # Background Training Configuration
+    ASYNC_TRAINING_ENABLED = os.environ.get('ASYNC_TRAINING_ENABLED', 'True').lower() == 'true'
+    TRAINING_WORKERS = int(os.environ.get('TRAINING_WORKERS', 2))  # Worker processes for model fitting
+    TRAINING_QUEUE_SIZE = int(os.environ.get('TRAINING_QUEUE_SIZE', 100))  # Max users with pending jobs
+    TRAINING_RETRY_AFTER_SECONDS = int(os.environ.get('TRAINING_RETRY_AFTER_SECONDS', 30))  # Retry-After sent when the queue is full
+    TRAINING_JOB_HISTORY = int(os.environ.get('TRAINING_JOB_HISTORY', 1000))  # Job records kept for lookups
+    TRAINING_START_METHOD = os.environ.get('TRAINING_START_METHOD', 'spawn')  # multiprocessing start method
+    BULK_EXTRACTION_WORKERS = int(os.environ.get('BULK_EXTRACTION_WORKERS', 2))  # Processes extracting /train/bulk features, 0 for inline
+    
+    # Adaptive Refresh Configuration
+    ADAPTIVE_REFRESH_ENABLED = os.environ.get('ADAPTIVE_REFRESH_ENABLED', 'False').lower() == 'true'
+    ADAPTIVE_REFRESH_MARGIN = float(os.environ.get('ADAPTIVE_REFRESH_MARGIN', 0.05))  # Score above the decision threshold a /predict sample needs to be kept
+    ADAPTIVE_REFRESH_INTERVAL_SECONDS = float(os.environ.get('ADAPTIVE_REFRESH_INTERVAL_SECONDS', 300))  # Time between batched refreshes
+    ADAPTIVE_REFRESH_MAX_PER_USER = int(os.environ.get('ADAPTIVE_REFRESH_MAX_PER_USER', 5))  # Samples kept per user per rate window
+    ADAPTIVE_REFRESH_RATE_WINDOW_SECONDS = float(os.environ.get('ADAPTIVE_REFRESH_RATE_WINDOW_SECONDS', 86400))
+    ADAPTIVE_REFRESH_MAX_PENDING = int(os.environ.get('ADAPTIVE_REFRESH_MAX_PENDING', 10000))  # Samples buffered per worker process
     
     # Feature Extraction Configuration
     TIMESTAMP_UNIT = os.environ.get('TIMESTAMP_UNIT', 'milliseconds')  # 'milliseconds' or 'seconds'
+    FEATURE_SCHEMA = os.environ.get('FEATURE_SCHEMA', 'fixed')  # 'fixed' or 'positional', for newly enrolled users
     FEATURE_PADDING_VALUE = float(os.environ.get('FEATURE_PADDING_VALUE', 0.0))
     
+    # Typing Session Configuration
+    SESSION_TTL_SECONDS = float(os.environ.get('SESSION_TTL_SECONDS', 1800))  # Inactivity before a session expires
+    MAX_SESSIONS = int(os.environ.get('MAX_SESSIONS', 10000))  # Live sessions per worker process
+    SESSION_WINDOW_PRESSES = int(os.environ.get('SESSION_WINDOW_PRESSES', 40))  # Scoring window for models without a recorded sample length
+    SESSION_MIN_PRESSES = int(os.environ.get('SESSION_MIN_PRESSES', 10))  # Key presses needed before a session is scored
+    SESSION_SCORE_HISTORY = int(os.environ.get('SESSION_SCORE_HISTORY', 100))  # Recent rolling scores kept per session
+    WINDOW_STRIDE_PRESSES = int(os.environ.get('WINDOW_STRIDE_PRESSES', 0))  # Key presses between /predict/windows windows, 0 for the window size
+    WINDOW_MAX_ANOMALY_RATIO = float(os.environ.get('WINDOW_MAX_ANOMALY_RATIO', 1.0))  # Anomalous window share still authenticated, 1.0 to only use the mean score
+    MAX_STREAM_EVENTS = int(os.environ.get('MAX_STREAM_EVENTS', 20000))  # Maximum events per /predict/windows request
+    
     # API Configuration
     MAX_KEYSTROKE_EVENTS = int(os.environ.get('MAX_KEYSTROKE_EVENTS', 1000))  # Maximum events per request
+    MAX_BATCH_SAMPLES = int(os.environ.get('MAX_BATCH_SAMPLES', 5000))  # Maximum samples per /predict/batch request
+    MAX_BULK_SAMPLES = int(os.environ.get('MAX_BULK_SAMPLES', 10000))  # Maximum samples per /train/bulk request
     REQUEST_TIMEOUT = int(os.environ.get('REQUEST_TIMEOUT', 30))  # Seconds
     
     # Logging Configuration
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    LOG_STRUCTURED = os.environ.get('LOG_STRUCTURED', 'True').lower() == 'true'  # JSON lines instead of LOG_FORMAT text
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))  # Records buffered before new ones are dropped
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))  # Share of high-volume debug/info records kept
+    LOG_REQUEST_SAMPLE_RATE = float(os.environ.get('LOG_REQUEST_SAMPLE_RATE', 1.0))  # Share of successful request summaries kept
     
     # Security Configuration
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
@@ -43,6 +92,12 @@ class Config:
     # Performance Configuration
     FEATURE_CACHE_ENABLED = os.environ.get('FEATURE_CACHE_ENABLED', 'True').lower() == 'true'
     MODEL_CACHE_ENABLED = os.environ.get('MODEL_CACHE_ENABLED', 'True').lower() == 'true'
+    MODEL_CACHE_MAX_ENTRIES = int(os.environ.get('MODEL_CACHE_MAX_ENTRIES', 500))  # Cached user models per worker, 0 for no limit
+    MODEL_CACHE_MAX_MB = int(os.environ.get('MODEL_CACHE_MAX_MB', 256))  # Estimated model memory per worker, 0 for no limit
+    MODEL_CACHE_REVALIDATE_SECONDS = float(os.environ.get('MODEL_CACHE_REVALIDATE_SECONDS', 1.0))  # Max staleness of cached models across workers
+    MODEL_PRELOAD_ENABLED = os.environ.get('MODEL_PRELOAD_ENABLED', 'False').lower() == 'true'  # Load recently active models at startup
+    MODEL_PRELOAD_COUNT = int(os.environ.get('MODEL_PRELOAD_COUNT', 100))  # Models preloaded per worker
+    ACCESS_LOG_FLUSH_SECONDS = float(os.environ.get('ACCESS_LOG_FLUSH_SECONDS', 30.0))  # Interval of model access log writes
 
 
 class DevelopmentConfig(Config):
@@ -64,6 +119,7 @@ class TestingConfig(Config):
     TESTING = True
     MODEL_DIR = 'test_models'
     MIN_SAMPLES_FOR_TRAINING = 2  # Lower threshold for faster testing
+    ASYNC_TRAINING_ENABLED = False  # Train inline so results are deterministic
 
 
 # Configuration mapping
@@ -98,6 +154,10 @@ class FeatureExtractionConfig:
     MAX_HOLD_TIME = 5.0  # Maximum reasonable hold time in seconds
     MAX_FLIGHT_TIME = 10.0  # Maximum reasonable flight time in seconds
     MIN_TIMING = 0.001  # Minimum timing value in seconds
+    
+    # Fixed-length feature schema
+    KEY_VOCABULARY = 'abcdefghijklmnopqrstuvwxyz0123456789 '  # Keys with their own aggregates, others are pooled
+    SUMMARY_PERCENTILES = (10, 50, 90)  # Percentiles summarizing each timing type
 
 
 # Model configuration
@@ -112,6 +172,13 @@ class ModelConfig:
     BOOTSTRAP = False
     N_JOBS = -1  # Use all available CPU cores
     
+    # Incremental training parameters
+    INCREMENTAL_TREES_PER_UPDATE = 10  # Oldest trees replaced per new sample
+    INCREMENTAL_WINDOW = 32  # Most recent samples used to grow replacement trees
+    
+    # Scoring parameters
+    NATIVE_SCORER_MAX_ROWS = 256  # Larger groups are scored by sklearn when its model is loaded
+    
     # Model validation
     ENABLE_MODEL_VALIDATION = True
     VALIDATION_SPLIT = 0.2
@@ -136,6 +203,9 @@ class APIConfig:
     INSUFFICIENT_TRAINING_DATA = "Insufficient training data for model creation"
     MODEL_TRAINING_FAILED = "Failed to train the model"
     MODEL_PREDICTION_FAILED = "Failed to make prediction"
+    TRAINING_JOB_NOT_FOUND = "Training job not found"
+    TRAINING_QUEUE_FULL = "Sample stored, but the training queue is full. Retry later to train the model."
+    SESSION_NOT_FOUND = "Session not found or expired"
     INTERNAL_SERVER_ERROR = "Internal server error occurred"
     
     # Authentication reasons
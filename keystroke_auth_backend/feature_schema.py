@@ -0,0 +1,221 @@
+"""
+Feature Schemas for Keystroke Dynamics Authentication Backend
+
+This module defines how the timings extracted from a keystroke sample are laid
+out as a model input vector.
+
+- 'positional': the original layout, [hold, keydown-keydown, keyup-keydown]
+  per key press in typing order. Its length depends on the sample, so vectors
+  are zero-padded to the longest enrolled sample.
+- 'fixed': a vector of constant length made of per-key aggregates over a fixed
+  key vocabulary (mean hold time and mean keydown-keydown latency to the next
+  key) followed by summary statistics of each timing type. Models trained on
+  it keep the same small input dimension however long the typed text is.
+
+A user's schema is chosen when enrollment starts and recorded in the model
+metadata; existing positional users keep their schema.
+"""
+
+import numpy as np
+
+from config import FeatureExtractionConfig
+
+POSITIONAL_SCHEMA = 'positional'
+FIXED_SCHEMA = 'fixed'
+FEATURE_SCHEMAS = (POSITIONAL_SCHEMA, FIXED_SCHEMA)
+
+# Keys outside the vocabulary share the last bucket
+KEY_BUCKETS = {key: index for index, key in enumerate(FeatureExtractionConfig.KEY_VOCABULARY)}
+OTHER_BUCKET = len(KEY_BUCKETS)
+N_KEY_BUCKETS = OTHER_BUCKET + 1
+
+SUMMARY_STATISTICS = ['mean', 'std'] + [f"p{int(q)}" for q in FeatureExtractionConfig.SUMMARY_PERCENTILES]
+_PERCENTILE_FRACTIONS = np.asarray(FeatureExtractionConfig.SUMMARY_PERCENTILES, dtype=float) / 100.0
+TIMING_TYPES = (
+    FeatureExtractionConfig.HOLD_TIME,
+    FeatureExtractionConfig.KEYDOWN_KEYDOWN,
+    FeatureExtractionConfig.KEYUP_KEYDOWN
+)
+
+
+def _bucket_names():
+    names = [repr(key) for key in FeatureExtractionConfig.KEY_VOCABULARY]
+    return names + ['other']
+
+
+# Names of the fixed schema features, in vector order
+FIXED_FEATURE_NAMES = (
+    [f"{FeatureExtractionConfig.HOLD_TIME}[{name}]" for name in _bucket_names()] +
+    [f"{FeatureExtractionConfig.KEYDOWN_KEYDOWN}[{name}]" for name in _bucket_names()] +
+    [f"{timing}_{statistic}" for timing in TIMING_TYPES for statistic in SUMMARY_STATISTICS] +
+    ['keydown_count']
+)
+FIXED_FEATURE_LENGTH = len(FIXED_FEATURE_NAMES)
+
+
+def key_bucket(key):
+    """
+    Map a key name to its vocabulary bucket.
+
+    Single characters are compared case-insensitively; named keys such as
+    "Shift" or "Enter" fall into the shared "other" bucket.
+
+    Args:
+        key (str): Key name from a keystroke event
+
+    Returns:
+        int: Bucket index
+    """
+    if isinstance(key, str) and len(key) == 1:
+        return KEY_BUCKETS.get(key.lower(), OTHER_BUCKET)
+    return OTHER_BUCKET
+
+
+def _bucket_means(buckets, values):
+    """Mean of values per key bucket, 0.0 for buckets without values."""
+    sums = np.bincount(buckets, weights=values, minlength=N_KEY_BUCKETS)
+    counts = np.bincount(buckets, minlength=N_KEY_BUCKETS)
+    return sums / np.maximum(counts, 1)
+
+
+def _summary(values):
+    """
+    Summary statistics of one timing type, zeros if there are no values.
+
+    Percentiles use linear interpolation like numpy.percentile, computed from
+    a single sort because np.percentile dominates the cost for short samples.
+    """
+    n_values = len(values)
+    if n_values == 0:
+        return np.zeros(len(SUMMARY_STATISTICS))
+    ordered = np.sort(values)
+    positions = _PERCENTILE_FRACTIONS * (n_values - 1)
+    lower = positions.astype(np.intp)
+    upper = np.minimum(lower + 1, n_values - 1)
+    percentiles = ordered[lower] + (ordered[upper] - ordered[lower]) * (positions - lower)
+    mean = ordered.sum() / n_values
+    std = np.sqrt(np.dot(ordered - mean, ordered - mean) / n_values)
+    return np.concatenate(([mean, std], percentiles))
+
+
+def fixed_features(distinct_keys, key_holds, pair_keys, pair_dd, timings, n_keydowns):
+    """
+    Build the fixed schema vector from the timings of one sample.
+
+    Args:
+        distinct_keys (list): Key names, indexed by key id
+        key_holds (numpy.ndarray): Hold time per key id, NaN where invalid
+        pair_keys (numpy.ndarray): Key id of the first key of every valid keydown-keydown pair
+        pair_dd (numpy.ndarray): Valid keydown-keydown times, aligned with pair_keys
+        timings (tuple): Valid (hold, keydown-keydown, keyup-keydown) values in seconds
+        n_keydowns (int): Number of keydown events in the sample
+
+    Returns:
+        list: Feature vector of length FIXED_FEATURE_LENGTH
+    """
+    buckets = np.fromiter(map(key_bucket, distinct_keys), dtype=np.intp, count=len(distinct_keys))
+    valid_hold = ~np.isnan(key_holds)
+
+    return np.concatenate((
+        _bucket_means(buckets[valid_hold], key_holds[valid_hold]),
+        _bucket_means(buckets[pair_keys], pair_dd),
+        np.concatenate([_summary(values) for values in timings]),
+        [n_keydowns]
+    )).tolist()
+
+
+def sample_presses(features, schema):
+    """
+    Number of key presses of the sample a feature vector was extracted from.
+
+    Exact for the fixed schema (its keydown_count); for the positional schema
+    it is estimated from the vector length, three timings per press and one
+    for the last press.
+
+    Args:
+        features (list): Feature vector
+        schema (str): Feature schema of the vector
+
+    Returns:
+        int: Key presses
+    """
+    if schema == FIXED_SCHEMA:
+        return int(features[-1])
+    return max(1, round((len(features) + 2) / 3))
+
+
+def _window_summaries(windows):
+    """
+    Summary statistics of one timing type for many windows at once.
+
+    Args:
+        windows (numpy.ndarray): (n_windows, width) timings of every window,
+                                 NaN where invalid or absent
+
+    Returns:
+        numpy.ndarray: (n_windows, len(SUMMARY_STATISTICS)) matrix, zeros for
+                       windows without valid values
+    """
+    # Sorted so the valid values of every row come first
+    windows = np.sort(windows, axis=1)
+    counts = np.count_nonzero(~np.isnan(windows), axis=1)
+    present = counts > 0
+    safe_counts = np.maximum(counts, 1)
+
+    filled = np.where(np.isnan(windows), 0.0, windows)
+    mean = filled.sum(axis=1) / safe_counts
+    deviations = np.where(np.isnan(windows), 0.0, windows - mean[:, None])
+    std = np.sqrt((deviations * deviations).sum(axis=1) / safe_counts)
+
+    ranks = _PERCENTILE_FRACTIONS[None, :] * (safe_counts[:, None] - 1)
+    lower = ranks.astype(np.intp)
+    upper = np.minimum(lower + 1, safe_counts[:, None] - 1)
+    lower_values = np.take_along_axis(filled, lower, axis=1)
+    upper_values = np.take_along_axis(filled, upper, axis=1)
+    percentiles = lower_values + (upper_values - lower_values) * (ranks - lower)
+
+    summaries = np.column_stack((mean, std, percentiles))
+    summaries[~present] = 0.0
+    return summaries
+
+
+def fixed_window_features(distinct_keys, key_holds, pair_keys, pair_dd, timings, n_keydowns):
+    """
+    Build fixed schema vectors for many windows at once.
+
+    The counterpart of fixed_features with one row per window: every
+    argument holds the values fixed_features gets for one sample, laid out
+    as matrices with NaN where a value is invalid or absent from the window.
+
+    Args:
+        distinct_keys (list): Key names, indexed by key id
+        key_holds (numpy.ndarray): (n_windows, n_keys) hold time per key id
+        pair_keys (numpy.ndarray): (n_windows, width) key id of the first key of every pair
+        pair_dd (numpy.ndarray): (n_windows, width) keydown-keydown times, aligned with pair_keys
+        timings (tuple): (hold, keydown-keydown, keyup-keydown) matrices with one row per window
+        n_keydowns (numpy.ndarray): Number of key presses in every window
+
+    Returns:
+        numpy.ndarray: (n_windows, FIXED_FEATURE_LENGTH) matrix
+    """
+    n_windows = len(key_holds)
+    buckets = np.fromiter(map(key_bucket, distinct_keys), dtype=np.intp, count=len(distinct_keys))
+    key_buckets = np.zeros((len(distinct_keys), N_KEY_BUCKETS))
+    key_buckets[np.arange(len(distinct_keys)), buckets] = 1.0
+
+    valid_hold = ~np.isnan(key_holds)
+    hold_means = (np.where(valid_hold, key_holds, 0.0) @ key_buckets) / np.maximum(valid_hold @ key_buckets, 1)
+
+    valid_dd = ~np.isnan(pair_dd)
+    rows = np.broadcast_to(np.arange(n_windows)[:, None], pair_dd.shape)[valid_dd]
+    dd_sums = np.zeros((n_windows, N_KEY_BUCKETS))
+    dd_counts = np.zeros((n_windows, N_KEY_BUCKETS))
+    np.add.at(dd_sums, (rows, buckets[pair_keys[valid_dd]]), pair_dd[valid_dd])
+    np.add.at(dd_counts, (rows, buckets[pair_keys[valid_dd]]), 1)
+
+    return np.hstack([
+        hold_means,
+        dd_sums / np.maximum(dd_counts, 1),
+        np.hstack([_window_summaries(values) for values in timings]),
+        np.asarray(n_keydowns, dtype=float)[:, None]
+    ])
@@ -0,0 +1,309 @@
+"""
+Streaming Keystroke Timings for Keystroke Dynamics Authentication Backend
+
+This module turns keystroke events into per key press timing records
+incrementally, so a long typing session can be processed chunk by chunk
+without re-sending or re-processing earlier events. Each record holds the
+key, three timings of the press in seconds (NaN where a timing is missing or
+invalid) and its raw keydown and keyup timestamps (NaN without a keyup):
+
+- hold time of the press (keydown to its keyup)
+- keydown-keydown time to the next key press
+- keyup-keydown time from the press's keyup to the next key press
+
+A press is emitted once the next keydown has arrived and its own keyup is
+known (or its hold time can no longer be valid). The only state kept between
+chunks is the presses still waiting for those events.
+
+window_features builds the feature vector of a sequence of records exactly
+as app.extract_features builds it from the keystroke events of those presses,
+so windows of a stream are scored in the feature space the models were
+trained in; sliding_window_features does the same for all overlapping
+windows of a long stream at once.
+"""
+
+from collections import deque
+from itertools import count
+
+import numpy as np
+
+from config import FeatureExtractionConfig
+from feature_schema import FIXED_SCHEMA, fixed_window_features
+
+NAN = float('nan')
+
+
+class KeystrokeStream:
+    """Incremental extractor of per key press timing records."""
+
+    def __init__(self, scale=FeatureExtractionConfig.FEATURE_SCALE_FACTOR):
+        """
+        Args:
+            scale (float): Timestamp units per second
+        """
+        self.scale = scale
+        # key -> press waiting for its keyup
+        self._open = {}
+        # Presses not emitted yet, in typing order
+        self._pending = deque()
+        self._previous = None
+        self.events = 0
+        self.presses = 0
+
+    @property
+    def pending(self):
+        """Number of presses waiting for a later event."""
+        return len(self._pending)
+
+    def feed(self, events):
+        """
+        Process a chunk of events in timestamp order.
+
+        Args:
+            events (list): Events like {'key': 'a', 'event': 'down', 'timestamp': 123}
+
+        Returns:
+            list: (key, hold, keydown_keydown, keyup_keydown, down, up)
+                  records of the presses completed by this chunk
+
+        Raises:
+            KeyError, TypeError, ValueError: If an event of the chunk is
+                malformed; the whole chunk is validated before any of it is
+                applied, so the stream is left as it was
+        """
+        parsed = [_parse_event(event) for event in events]
+
+        records = []
+        max_hold = FeatureExtractionConfig.MAX_HOLD_TIME * self.scale
+        for key, kind, timestamp in parsed:
+            if kind == 'down':
+                press = [key, timestamp, None, None]  # key, down, up, next down
+                if self._previous is not None:
+                    self._previous[3] = timestamp
+                self._previous = press
+                self._open[key] = press
+                self._pending.append(press)
+            elif kind == 'up':
+                press = self._open.pop(key, None)
+                if press is not None:
+                    press[2] = timestamp
+            self.events += 1
+
+            while self._pending:
+                press = self._pending[0]
+                if press[3] is None or (press[2] is None and timestamp - press[1] <= max_hold):
+                    break
+                records.append(self._record(self._pending.popleft()))
+        self.presses += len(records)
+        return records
+
+    def flush(self):
+        """
+        Emit every remaining press, e.g. at the end of a stream.
+
+        The last press has no following keydown, so only its hold time is set.
+
+        Returns:
+            list: Timing records of the remaining presses
+        """
+        records = [self._record(press) for press in self._pending]
+        self._pending.clear()
+        self._open.clear()
+        self._previous = None
+        self.presses += len(records)
+        return records
+
+    def _record(self, press):
+        key, down, up, next_down = press
+        hold = keydown_keydown = keyup_keydown = NAN
+        if up is not None:
+            hold = (up - down) / self.scale
+            if not 0 < hold <= FeatureExtractionConfig.MAX_HOLD_TIME:
+                hold = NAN
+        if next_down is not None:
+            keydown_keydown = (next_down - down) / self.scale
+            if not keydown_keydown > FeatureExtractionConfig.MIN_TIMING:
+                keydown_keydown = NAN
+            if up is not None:
+                keyup_keydown = (next_down - up) / self.scale
+                if not 0 < keyup_keydown <= FeatureExtractionConfig.MAX_FLIGHT_TIME:
+                    keyup_keydown = NAN
+        return (key, hold, keydown_keydown, keyup_keydown, down, NAN if up is None else up)
+
+
+def _parse_event(event):
+    """(key, event type, timestamp) of an event, raising on malformed events."""
+    key = event['key']
+    hash(key)  # Keys index the presses waiting for their keyup
+    return key, event['event'], float(event['timestamp'])
+
+
+def press_timings(events, scale=FeatureExtractionConfig.FEATURE_SCALE_FACTOR):
+    """
+    Timing records of every press in a complete event list.
+
+    Args:
+        events (list): Keystroke events in timestamp order
+        scale (float): Timestamp units per second
+
+    Returns:
+        list: (key, hold, keydown_keydown, keyup_keydown, down, up) records
+    """
+    stream = KeystrokeStream(scale)
+    return stream.feed(events) + stream.flush()
+
+
+def window_bounds(n_presses, size, stride):
+    """
+    Start and end (exclusive) press of every sliding window.
+
+    Windows of `size` presses start every `stride` presses; a final window
+    ending at the last press is added when the stride does not reach it. A
+    stream shorter than one window yields a single window over all presses.
+
+    Returns:
+        tuple: (starts, ends) integer arrays
+    """
+    if n_presses <= size:
+        return np.array([0]), np.array([n_presses])
+    starts = np.arange(0, n_presses - size + 1, stride)
+    if starts[-1] != n_presses - size:
+        starts = np.append(starts, n_presses - size)
+    return starts, starts + size
+
+
+def _window_timings(keys, downs, ups, starts, ends, scale):
+    """
+    Timings of every window as app.extract_features computes them for a sample.
+
+    Within a window the hold time of a key is that of its last keydown and
+    last keyup, every press but the last is paired with the next press
+    (keydown-keydown time, and keyup-keydown time from the last keyup of its
+    key), and the hold time of the key released last is added at the end.
+
+    Args:
+        keys (list): Key of every press
+        downs (numpy.ndarray): Keydown timestamp of every press
+        ups (numpy.ndarray): Keyup timestamp of every press, NaN if missing
+        starts (numpy.ndarray): First press of every window
+        ends (numpy.ndarray): End (exclusive) of every window
+        scale (float): Timestamp units per second
+
+    Returns:
+        tuple: (distinct_keys, key_holds, pair_keys, pair_timings, last_holds)
+               with key_holds (n_windows, n_keys) per key, pair_keys and the
+               (hold, keydown-keydown, keyup-keydown) pair_timings as
+               (n_windows, width) matrices over the window slots and
+               last_holds per window, all NaN where invalid or absent
+    """
+    distinct_keys = list(dict.fromkeys(keys))
+    key_ids = np.fromiter(map(dict(zip(distinct_keys, count())).__getitem__, keys), dtype=np.intp, count=len(keys))
+    n_windows = len(starts)
+    rows = np.arange(n_windows)[:, None]
+
+    # Press index of every window slot, clamped to the window start past its end
+    positions = starts[:, None] + np.arange(int((ends - starts).max()))
+    inside = positions < ends[:, None]
+    positions = np.where(inside, positions, starts[:, None])
+    slot_rows = np.broadcast_to(rows, positions.shape)
+    slot_keys = key_ids[positions]
+
+    # Last keydown and last keyup press of every key in every window, -1 (a NaN timestamp) if none
+    padded_downs = np.append(downs, NAN)
+    padded_ups = np.append(ups, NAN)
+    last_down = np.full((n_windows, len(distinct_keys)), -1, dtype=np.intp)
+    np.maximum.at(last_down, (slot_rows[inside], slot_keys[inside]), positions[inside])
+    has_up = inside & ~np.isnan(ups[positions])
+    last_up = np.full((n_windows, len(distinct_keys)), -1, dtype=np.intp)
+    np.maximum.at(last_up, (slot_rows[has_up], slot_keys[has_up]), positions[has_up])
+    last_up_times = padded_ups[last_up]
+
+    with np.errstate(invalid='ignore'):
+        key_holds = (last_up_times - padded_downs[last_down]) / scale
+        key_holds[~((key_holds > 0) & (key_holds <= FeatureExtractionConfig.MAX_HOLD_TIME))] = NAN
+
+        # Pairs of every press but the last of its window with the next press
+        is_pair = inside & (positions + 1 < ends[:, None])
+        next_downs = padded_downs[positions + 1]
+        pair_holds = np.where(is_pair, key_holds[slot_rows, slot_keys], NAN)
+        pair_dd = (next_downs - downs[positions]) / scale
+        pair_dd[~(is_pair & (pair_dd > FeatureExtractionConfig.MIN_TIMING))] = NAN
+        pair_ud = (next_downs - last_up_times[slot_rows, slot_keys]) / scale
+        pair_ud[~(is_pair & (pair_ud > 0) & (pair_ud <= FeatureExtractionConfig.MAX_FLIGHT_TIME))] = NAN
+
+    # Press of the window's last event, the later press on ties
+    event_times = np.where(inside, np.fmax(downs, ups)[positions], -np.inf)
+    width = positions.shape[1]
+    last_slot = width - 1 - np.argmax(event_times[:, ::-1], axis=1)
+    last_holds = key_holds[np.arange(n_windows), slot_keys[np.arange(n_windows), last_slot]]
+
+    return distinct_keys, key_holds, slot_keys, (pair_holds, pair_dd, pair_ud), last_holds
+
+
+def sliding_window_features(records, size, stride, schema, scale=FeatureExtractionConfig.FEATURE_SCALE_FACTOR):
+    """
+    Build the feature vectors of sliding windows over timing records.
+
+    Each window gets the vector window_features would build from its
+    records; all windows are computed together with array operations.
+
+    Args:
+        records (list): Timing records from KeystrokeStream
+        size (int): Presses per window
+        stride (int): Presses between the starts of consecutive windows
+        schema (str): Feature schema name
+        scale (float): Timestamp units per second
+
+    Returns:
+        tuple: (starts, ends, features) where features is a list with one
+               vector per window, empty for windows without valid timings
+    """
+    keys = [record[0] for record in records]
+    times = np.array([record[4:6] for record in records], dtype=float).reshape(len(records), 2)
+    starts, ends = window_bounds(len(records), size, stride)
+    if not records:
+        return starts, ends, [[]]
+
+    distinct_keys, key_holds, pair_keys, pair_timings, last_holds = _window_timings(
+        keys, times[:, 0], times[:, 1], starts, ends, scale
+    )
+    has_last = ~np.isnan(last_holds)
+    has_timings = has_last | np.any([~np.isnan(values).all(axis=1) for values in pair_timings], axis=0)
+
+    if schema == FIXED_SCHEMA:
+        holds = np.column_stack((pair_timings[0], last_holds))
+        matrix = fixed_window_features(
+            distinct_keys, key_holds, pair_keys, pair_timings[1], (holds,) + pair_timings[1:], ends - starts
+        )
+        features = [row.tolist() if ok else [] for row, ok in zip(matrix, has_timings)]
+    else:
+        # Interleave per pair as [hold, keydown-keydown, keyup-keydown], then the last hold time
+        values = np.stack(pair_timings, axis=2)
+        features = []
+        for row, last_hold, ok in zip(values, last_holds, has_last):
+            vector = row[~np.isnan(row)].tolist()
+            if ok:
+                vector.append(float(last_hold))
+            features.append(vector)
+    return starts, ends, features
+
+
+def window_features(records, schema, scale=FeatureExtractionConfig.FEATURE_SCALE_FACTOR):
+    """
+    Build the feature vector of a sequence of timing records.
+
+    The vector is the one app.extract_features builds from the keystroke
+    events of the same presses, in either schema; a whole sample fed through
+    a KeystrokeStream gives its enrollment feature vector.
+
+    Args:
+        records (list): Timing records from KeystrokeStream
+        schema (str): Feature schema name
+        scale (float): Timestamp units per second
+
+    Returns:
+        list: Feature vector, empty if the records hold no valid timing
+    """
+    if not records:
+        return []
+    return sliding_window_features(records, len(records), 1, schema, scale)[2][0]
@@ -0,0 +1,177 @@
+"""
+Model Cache for Keystroke Dynamics Authentication Backend
+
+This module provides a bounded, thread-safe LRU cache for per-user models.
+The cache is limited both by the number of cached users and by an estimate of
+the memory held by the cached models, which is derived from the node arrays
+of the fitted trees. Hits, misses and evictions are counted so the cache can
+be monitored over the API.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Rough per-estimator overhead of the Python objects wrapping each tree
+ESTIMATOR_OVERHEAD_BYTES = 1024
+
+
+def estimate_model_bytes(model):
+    """
+    Estimate the memory held by a fitted model.
+
+    Models exposing an ``nbytes`` attribute report their own size. For tree
+    ensembles the node and value arrays of every tree are counted, together
+    with the per-tree path length arrays kept by IsolationForest.
+
+    Args:
+        model: Fitted model
+
+    Returns:
+        int: Estimated size in bytes
+    """
+    if model is None:
+        return 0
+
+    nbytes = getattr(model, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+
+    total = 0
+    for estimator in getattr(model, 'estimators_', []):
+        tree = estimator.tree_
+        state = tree.__getstate__()
+        total += state['nodes'].nbytes + state['values'].nbytes + ESTIMATOR_OVERHEAD_BYTES
+
+    for arrays in (getattr(model, '_decision_path_lengths', ()),
+                   getattr(model, '_average_path_length_per_tree', ()),
+                   getattr(model, 'estimators_features_', ())):
+        total += sum(array.nbytes for array in arrays)
+
+    return total
+
+
+class ModelCache:
+    """Thread-safe LRU cache bounded by entry count and estimated bytes."""
+
+    def __init__(self, max_entries, max_bytes):
+        """
+        Args:
+            max_entries (int): Maximum number of cached users, 0 for no limit
+            max_bytes (int): Maximum estimated bytes of cached models, 0 for no limit
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        """
+        Look up an entry and mark it as most recently used.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Cached value or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key):
+        """Look up an entry without touching recency or counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key, value, size):
+        """
+        Insert or replace an entry, evicting least recently used entries as needed.
+
+        An entry larger than max_bytes on its own is not cached.
+
+        Args:
+            key (str): Cache key
+            value: Value to cache
+            size (int): Estimated size of the value in bytes
+        """
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes and size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while self._entries and (
+                (self.max_entries and len(self._entries) > self.max_entries) or
+                (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+                self.evicted_bytes += evicted_size
+
+    def replace(self, key, value):
+        """Replace the value of an existing entry, keeping its size and position."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (value, entry[1])
+
+    def pop(self, key):
+        """Remove an entry if present."""
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Get cache usage and effectiveness counters.
+
+        Returns:
+            dict: Entry count, estimated bytes, limits, hits, misses, hit ratio and evictions
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes
+            }
@@ -0,0 +1,210 @@
+"""
+Model Warm-up Module for Keystroke Dynamics Authentication Backend
+
+This module lets a freshly started worker load the models of recently active
+users before traffic needs them. Model accesses are recorded in memory and
+appended to a small access log in the model directory from time to time; at
+startup the log names the users to preload, most recently active first, and
+a background thread loads their models into the model cache while the
+worker already serves requests.
+
+The access log is a text file of "<unix time> <user_id>" lines shared by all
+worker processes. Appends are small single writes, and the file is rewritten
+with one line per user once it grows past its compaction size.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AccessLog:
+    """Records when each user's model was last used, shared through a file."""
+
+    def __init__(self, path, flush_seconds=30.0, max_bytes=1024 * 1024):
+        """
+        Args:
+            path (str): Access log file
+            flush_seconds (float): Minimum time between appends to the file
+            max_bytes (int): File size above which the log is compacted
+        """
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def touch(self, user_id):
+        """
+        Record an access to a user's model.
+
+        Only updates memory; the file is appended to at most once per
+        flush_seconds.
+        """
+        with self._lock:
+            self._pending[user_id] = time.time()
+        if time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Append the accesses recorded since the last flush to the file."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+
+        lines = ''.join(f"{accessed:.3f} {user_id}\n" for user_id, accessed in pending.items())
+        try:
+            with open(self.path, 'a') as f:
+                f.write(lines)
+            if os.path.getsize(self.path) > self.max_bytes:
+                self.compact()
+        except OSError as e:
+            logger.warning(f"Could not write access log {self.path}: {e}")
+
+    def _read(self):
+        """Latest access time per user found in the file."""
+        last_access = {}
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    accessed, _, user_id = line.rstrip('\n').partition(' ')
+                    try:
+                        accessed = float(accessed)
+                    except ValueError:
+                        continue
+                    if user_id and accessed > last_access.get(user_id, 0.0):
+                        last_access[user_id] = accessed
+        except FileNotFoundError:
+            pass
+        return last_access
+
+    def compact(self):
+        """Rewrite the file with only the latest access of every user."""
+        last_access = self._read()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.writelines(f"{accessed:.3f} {user_id}\n" for user_id, accessed in last_access.items())
+        os.replace(tmp_path, self.path)
+
+    def recent_users(self, limit=None):
+        """
+        Users ordered from most to least recently accessed.
+
+        Args:
+            limit (int): Maximum number of users to return, None for all
+
+        Returns:
+            list: User identifiers
+        """
+        last_access = self._read()
+        with self._lock:
+            last_access.update(self._pending)
+        users = sorted(last_access, key=last_access.get, reverse=True)
+        return users if limit is None else users[:limit]
+
+
+class ModelWarmer:
+    """Loads a list of user models in a background thread and tracks progress."""
+
+    def __init__(self, load_model, should_stop=None):
+        """
+        Args:
+            load_model (callable): Loads one user's model into the cache,
+                                   returning a false value if it is missing
+            should_stop (callable): Returns True when warm-up must end early,
+                                    e.g. because the cache is full
+        """
+        self.load_model = load_model
+        self.should_stop = should_stop
+
+        self.state = 'idle'
+        self.total = 0
+        self.loaded = 0
+        self.failed = 0
+        self.started_at = None
+        self.seconds = None
+        self._done = threading.Event()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def start(self, user_ids):
+        """
+        Start loading the given users' models in a daemon thread.
+
+        Args:
+            user_ids (iterable or callable): Users to load, or a callable
+                                             returning them, which is called
+                                             in the warm-up thread so that
+                                             choosing the users does not
+                                             delay startup
+        """
+        if not callable(user_ids):
+            user_ids = list(user_ids)
+            self.total = len(user_ids)
+        self.state = 'warming'
+        self.started_at = time.monotonic()
+        thread = threading.Thread(target=self._run, args=(user_ids,), name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, user_ids):
+        try:
+            if callable(user_ids):
+                try:
+                    user_ids = list(user_ids())
+                except Exception as e:
+                    logger.warning(f"Could not choose models to preload: {e}")
+                    user_ids = []
+                self.total = len(user_ids)
+                logger.info(f"Preloading models for {self.total} users")
+            for user_id in user_ids:
+                if self.should_stop is not None and self.should_stop():
+                    logger.info(f"Stopping model warm-up after {self.loaded} models, model cache is full")
+                    break
+                try:
+                    if self.load_model(user_id):
+                        self.loaded += 1
+                    else:
+                        self.failed += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning(f"Could not preload model for user {user_id}: {e}")
+        finally:
+            self.seconds = time.monotonic() - self.started_at
+            self.state = 'ready'
+            self._done.set()
+            logger.info(f"Model warm-up finished: {self.loaded} loaded, {self.failed} failed in {self.seconds:.2f}s")
+
+    def wait(self, timeout=None):
+        """Block until warm-up has finished, returning False on timeout."""
+        return self._done.wait(timeout)
+
+    def status(self):
+        """
+        Warm-up progress for the health endpoint.
+
+        Returns:
+            dict: state, total, loaded, failed and elapsed seconds
+        """
+        if self.seconds is not None:
+            seconds = self.seconds
+        elif self.started_at is not None:
+            seconds = time.monotonic() - self.started_at
+        else:
+            seconds = 0.0
+        return {
+            'state': self.state,
+            'total': self.total,
+            'loaded': self.loaded,
+            'failed': self.failed,
+            'seconds': round(seconds, 3)
+        }
@@ -0,0 +1,95 @@
+"""
+Offline Retraining Module for Keystroke Dynamics Authentication Backend
+
+This module refits the model of every enrolled user from their stored
+samples, e.g. after ModelConfig (number of estimators, contamination) has
+changed:
+
+    python retrain.py --workers 8 --tag estimators-200
+
+Users are distributed over a pool of worker processes and every fit uses a
+single core (n_jobs=1), so the pool rather than each fit uses the machine's
+cores. Each model is saved atomically like any other training run, with a
+new model_version and the run's tag in its metadata. Users whose model
+already carries the tag are skipped, so an interrupted run is resumed by
+running the same command again. It can run while the server is up; servers
+pick up the new models through the usual model cache revalidation.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from config import get_config
+from storage import create_storage
+from training_queue import run_user_jobs
+
+config = get_config()
+
+
+def retrain_user(user_id, training_tag):
+    """
+    Refit one user's model inside a worker process.
+
+    Args:
+        user_id (str): Unique identifier for the user
+        training_tag (str): Tag of the retraining run
+
+    Returns:
+        dict: Training summary from app.train_user_model, with skipped set
+              when the model already carries the tag
+    """
+    # Imported lazily so worker processes only load the app when they run a job
+    from app import load_user_metadata, train_user_model
+    if load_user_metadata(user_id).get('training_tag') == training_tag:
+        return {"samples_count": None, "model_trained": True, "training_mode": None, "skipped": True}
+    return train_user_model(user_id, n_jobs=1, full_refit=True, training_tag=training_tag)
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Refit the model of every enrolled user")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes, one fit per process")
+    parser.add_argument('--tag', default=datetime.now().strftime('retrain-%Y%m%dT%H%M%S'),
+                        help="Tag stored in the metadata of the new models; users already carrying it are skipped")
+    parser.add_argument('--users', nargs='+', help="Only retrain these users")
+    args = parser.parse_args()
+
+    user_ids = args.users or create_storage(config).user_ids()
+    print(f"Retraining {len(user_ids)} users in {config.MODEL_DIR} with {args.workers} workers, tag {args.tag}")
+
+    started = time.monotonic()
+    done = trained = skipped = insufficient = failed = samples = 0
+    fit_seconds = 0.0
+    progress_every = max(1, len(user_ids) // 20)
+    for user_id, result, error in run_user_jobs(retrain_user, [(user_id, (args.tag,)) for user_id in user_ids],
+                                                args.workers):
+        done += 1
+        if error is not None:
+            failed += 1
+            print(f"Failed to retrain user {user_id}: {error}", file=sys.stderr)
+        elif result.get('skipped'):
+            skipped += 1
+        elif not result['model_trained']:
+            insufficient += 1
+        else:
+            trained += 1
+            samples += result['samples_count']
+            fit_seconds += result['fit_seconds']
+        if done % progress_every == 0 or done == len(user_ids):
+            elapsed = time.monotonic() - started
+            remaining = (len(user_ids) - done) * elapsed / done
+            print(f"[{done}/{len(user_ids)}] {trained} retrained, {done / elapsed:.1f} users/s, "
+                  f"about {remaining:.0f}s left")
+
+    elapsed = time.monotonic() - started
+    print(f"Retrained {trained} models on {samples} samples in {elapsed:.1f}s "
+          f"({trained / elapsed if elapsed else 0.0:.1f} models/s, {fit_seconds:.1f}s of fitting)")
+    print(f"Skipped {skipped} users already tagged {args.tag}, {insufficient} with too few samples, {failed} failed")
+    return failed == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,130 @@
+"""
+Bounded Sample History for Keystroke Dynamics Authentication Backend
+
+This module decides which enrollment samples a user keeps once their sample
+history is full, so fitting time and storage per user stay bounded however
+many /train calls a user makes. Rewriting the history on every append past
+the cap would cost a full rewrite per /train call, so storage lets the
+history grow to trim_factor times SAMPLE_HISTORY_MAX samples and then
+applies the policy once to bring it back to SAMPLE_HISTORY_MAX:
+
+- 'last': keep the most recent samples.
+- 'reservoir': keep a uniform random sample of every sample ever appended
+  (reservoir sampling), so old typing keeps some weight while new samples
+  still enter at a decreasing rate.
+- 'centroid': keep the new samples and drop the older samples farthest from
+  the user's centroid (in per-feature standard deviations), which evicts
+  outliers first while the centroid follows the user's drift.
+
+Kept samples stay in the order they were appended. The 'last' and 'centroid'
+policies always keep the new samples, so they end the history as
+incremental training expects; the 'reservoir' policy may drop them, leaving
+older samples at the end, so training refits the whole model after it
+evicted samples. The reservoir is the first SAMPLE_HISTORY_MAX samples of a
+history; the samples appended after it since the last trim are offered to
+it in order when the history is trimmed.
+"""
+
+import numpy as np
+
+HISTORY_LAST = 'last'
+HISTORY_RESERVOIR = 'reservoir'
+HISTORY_CENTROID = 'centroid'
+HISTORY_POLICIES = (HISTORY_LAST, HISTORY_RESERVOIR, HISTORY_CENTROID)
+
+
+class SampleHistory:
+    """Cap and eviction policy of per-user sample histories."""
+
+    def __init__(self, max_samples, policy=HISTORY_LAST, seed=None, trim_factor=2):
+        """
+        Args:
+            max_samples (int): Samples kept per user and feature schema
+            policy (str): 'last', 'reservoir' or 'centroid'
+            seed (int): Random seed of the reservoir policy, None for a random one
+            trim_factor (float): Histories are trimmed back to max_samples once
+                                 they hold more than trim_factor * max_samples
+                                 samples, 1 trims on every append past the cap
+        """
+        if policy not in HISTORY_POLICIES:
+            raise ValueError(f"Unknown sample history policy {policy!r}, expected one of {HISTORY_POLICIES}")
+        if max_samples < 1:
+            raise ValueError("max_samples must be at least 1")
+        if trim_factor < 1:
+            raise ValueError("trim_factor must be at least 1")
+        self.max_samples = max_samples
+        self.policy = policy
+        self.trim_factor = trim_factor
+        self._rng = np.random.default_rng(seed)
+
+    def needs_trim(self, n_samples):
+        """Whether a history of n_samples stored samples is due to be trimmed back to max_samples."""
+        return n_samples > self.max_samples * self.trim_factor
+
+    @property
+    def may_evict_new_samples(self):
+        """Whether an append can drop the samples it appended, leaving older samples at the end."""
+        return self.policy == HISTORY_RESERVOIR
+
+    def keep(self, samples, n_new, appended):
+        """
+        Choose the samples to keep after an append.
+
+        Args:
+            samples (list): Stored samples, oldest first, ending with the new ones
+            n_new (int): Number of samples just appended
+            appended (int): Samples ever appended for the user, including the new ones
+
+        Returns:
+            list: Sorted indices into samples of the samples to keep
+        """
+        n_samples = len(samples)
+        if n_samples <= self.max_samples:
+            return list(range(n_samples))
+        if self.policy == HISTORY_LAST:
+            return list(range(n_samples - self.max_samples, n_samples))
+        if self.policy == HISTORY_RESERVOIR:
+            return self._keep_reservoir(n_samples, appended)
+        return self._keep_centroid(samples, n_new)
+
+    def _keep_reservoir(self, n_samples, appended):
+        # Samples past the reservoir were appended since the last trim, or the cap was lowered
+        kept = list(range(self.max_samples))
+        n_pending = n_samples - self.max_samples
+        for offset in range(n_pending):
+            index = self.max_samples + offset
+            position = appended - n_pending + offset  # Position of this sample in everything ever appended
+            if self._rng.random() < self.max_samples / (position + 1):
+                del kept[self._rng.integers(len(kept))]
+                kept.append(index)
+        return kept
+
+    def _keep_centroid(self, samples, n_new):
+        n_samples = len(samples)
+        n_new = min(n_new, self.max_samples)
+        n_old = n_samples - n_new
+
+        length = max(len(sample) for sample in samples)
+        matrix = np.zeros((n_samples, length))
+        for row, sample in zip(matrix, samples):
+            row[:len(sample)] = sample
+        scale = matrix.std(axis=0)
+        scale[scale == 0] = 1.0
+        distances = np.linalg.norm((matrix[:n_old] - matrix.mean(axis=0)) / scale, axis=1)
+
+        n_keep_old = self.max_samples - n_new
+        kept_old = np.sort(np.argsort(distances, kind='stable')[:n_keep_old]).tolist()
+        return kept_old + list(range(n_old, n_samples))
+
+
+def create_sample_history(config):
+    """
+    Create the sample history policy selected by the configuration.
+
+    Returns:
+        SampleHistory: Policy, None if SAMPLE_HISTORY_MAX is 0 (keep every sample)
+    """
+    if config.SAMPLE_HISTORY_MAX <= 0:
+        return None
+    return SampleHistory(config.SAMPLE_HISTORY_MAX, config.SAMPLE_HISTORY_POLICY,
+                         trim_factor=config.SAMPLE_HISTORY_TRIM_FACTOR)
@@ -0,0 +1,123 @@
+"""
+Append-Only Sample Log for Keystroke Dynamics Authentication Backend
+
+Each user's enrollment samples are stored in a single binary log file made of
+records laid out as:
+
+    [uint32 length][float32 value] * length
+
+Adding a sample is a single append, so enrollment cost does not depend on how
+many samples a user already has. Reading memory-maps the file and returns
+float32 views into it, so no copy and no pickle is needed. A record that was
+only partially written (e.g. after a crash) is ignored when reading.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+HEADER_DTYPE = np.dtype('<u4')
+VALUE_DTYPE = np.dtype('<f4')
+WORD_SIZE = 4
+
+
+def encode_sample(features):
+    """
+    Encode one feature vector as a log record.
+
+    Args:
+        features (list): Feature vector
+
+    Returns:
+        bytes: Record bytes (length header followed by float32 values)
+    """
+    values = np.asarray(features, dtype=VALUE_DTYPE)
+    return np.array([len(values)], dtype=HEADER_DTYPE).tobytes() + values.tobytes()
+
+
+def append_sample(path, features):
+    """
+    Append one feature vector to a sample log, creating the file if needed.
+
+    Args:
+        path (str): Sample log file path
+        features (list): Feature vector to append
+    """
+    with open(path, 'ab') as f:
+        f.write(encode_sample(features))
+
+
+def append_samples(path, samples):
+    """
+    Append several feature vectors to a sample log with a single write.
+
+    Args:
+        path (str): Sample log file path
+        samples (list): Feature vectors to append
+    """
+    with open(path, 'ab') as f:
+        f.write(b''.join(encode_sample(features) for features in samples))
+
+
+def read_samples(path):
+    """
+    Read every complete sample from a sample log.
+
+    Args:
+        path (str): Sample log file path
+
+    Returns:
+        list: One read-only float32 array per sample, backed by a memory map
+    """
+    if not os.path.exists(path):
+        return []
+
+    n_words = os.path.getsize(path) // WORD_SIZE
+    if n_words == 0:
+        return []
+
+    words = np.memmap(path, dtype=VALUE_DTYPE, mode='r', shape=(n_words,))
+    lengths = words.view(HEADER_DTYPE)
+
+    samples = []
+    position = 0
+    total = len(words)
+    while position < total:
+        length = int(lengths[position])
+        end = position + 1 + length
+        if end > total:
+            # Truncated trailing record
+            break
+        samples.append(words[position + 1:end])
+        position = end
+    return samples
+
+
+def count_samples(path):
+    """
+    Count complete samples in a sample log by walking the record headers.
+
+    Args:
+        path (str): Sample log file path
+
+    Returns:
+        int: Number of samples
+    """
+    return len(read_samples(path))
+
+
+def write_samples(path, samples):
+    """
+    Atomically replace a sample log with the given samples.
+
+    Args:
+        path (str): Sample log file path
+        samples (list): Feature vectors to store
+    """
+    # Unique per writer so concurrent rewrites never share a temporary file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for features in samples:
+            f.write(encode_sample(features))
+    os.replace(tmp_path, path)
@@ -0,0 +1,119 @@
+"""
+Typing Sessions for Keystroke Dynamics Authentication Backend
+
+This module keeps the state of continuous authentication sessions: the
+streaming timing extractor of each session, the most recent timing records
+that make up its rolling scoring window, and its recent scores. Sessions are
+held in the memory of the worker process that created them, bounded in
+number and expired after a period of inactivity, so clients of a
+multi-process server need sticky routing per session.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from keystroke_stream import KeystrokeStream
+
+
+class TypingSession:
+    """Rolling state of one user's typing session."""
+
+    def __init__(self, user_id, schema, window_presses, score_history):
+        """
+        Args:
+            user_id (str): User whose model scores the session
+            schema (str): Feature schema of the user's model
+            window_presses (int): Key presses in the rolling scoring window
+            score_history (int): Number of recent scores kept
+        """
+        self.session_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.schema = schema
+        self.stream = KeystrokeStream()
+        self.window = deque(maxlen=window_presses)
+        self.scores = deque(maxlen=score_history)
+        self.created_at = datetime.now().isoformat()
+        self.last_activity = time.monotonic()
+        # Chunks of one session are processed one at a time
+        self.lock = threading.Lock()
+
+    def add_events(self, events):
+        """
+        Feed a chunk of events and extend the scoring window.
+
+        Returns:
+            list: Timing records completed by this chunk
+        """
+        records = self.stream.feed(events)
+        self.window.extend(records)
+        self.last_activity = time.monotonic()
+        return records
+
+    def summary(self):
+        """Session state for API responses."""
+        return {
+            'session_id': self.session_id,
+            'user_id': self.user_id,
+            'feature_schema': self.schema,
+            'events': self.stream.events,
+            'presses': self.stream.presses,
+            'window_presses': len(self.window),
+            'created_at': self.created_at,
+            'scores': list(self.scores)
+        }
+
+
+class SessionStore:
+    """Thread-safe table of typing sessions with a size bound and idle expiry."""
+
+    def __init__(self, max_sessions, ttl_seconds):
+        """
+        Args:
+            max_sessions (int): Maximum number of live sessions; the least
+                                recently active one is dropped beyond it
+            ttl_seconds (float): Inactivity after which a session expires
+        """
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self.expired = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def add(self, session):
+        with self._lock:
+            self._expire()
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.expired += 1
+        return session
+
+    def get(self, session_id):
+        """Return a live session and mark it as recently active, None if unknown or expired."""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def pop(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def _expire(self):
+        """Drop sessions idle for longer than the TTL, oldest first. Called with the lock held."""
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_activity >= deadline:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
@@ -0,0 +1,1017 @@
+"""
+Storage Module for Keystroke Dynamics Authentication Backend
+
+This module hides where per-user artifacts live behind a small storage
+interface used by the API: enrollment samples, model metadata and trained
+models. Two backends implement it:
+
+- FileStorage keeps them as files in the model directory, either all in the
+  directory itself ('flat', the original layout) or spread over hashed
+  two-level prefix directories ('sharded'):
+
+      user_models/3f/a2/user123_metadata.json
+
+  so no directory grows beyond a few entries per user even with hundreds of
+  thousands of users. Sample logs of feature schemas other than the
+  positional one sit in a subdirectory named after the schema
+  (user_models/fixed/user123_samples.bin), so a user id ending in a schema
+  name is never mistaken for another user's file. File names are the same in
+  both layouts, and existing directories can be converted with:
+
+      python storage.py migrate [model_dir] --to sharded
+
+  Next to them a small per-user info file indexes what /user/<id>/info
+  reports (sample counts and a summary of the model metadata). It is
+  rewritten on every write and records the stamps of the files it
+  summarizes, so an entry left stale by a crash or written by an older
+  version is rebuilt from the files on the next read.
+
+- SQLiteStorage keeps them as rows of a single SQLite database in WAL mode,
+  which lets many worker processes on one machine read concurrently while
+  one of them writes. A model and its metadata are replaced in a single
+  transaction, and sample counts are kept in their own table updated in the
+  same transaction as the samples. File storage is copied into a database with:
+
+      python storage.py copy [model_dir] --to-sqlite keystroke.db
+
+Both backends can bound the samples kept per user with a SampleHistory
+policy (see sample_history.py), applied in the same locked write as the
+append that takes the history past its trim threshold, so the history is
+rewritten once per batch of evictions rather than on every append past the
+cap. They count every sample ever appended per user
+and schema, so training can tell new samples apart once the number of
+stored samples stops growing.
+"""
+
+import argparse
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import joblib
+import numpy as np
+
+from compact_forest import FlatForest
+from feature_schema import FEATURE_SCHEMAS, POSITIONAL_SCHEMA
+from sample_history import create_sample_history
+from sample_store import append_samples, count_samples, read_samples, write_samples
+from user_locks import UserLocks, user_digest
+
+BACKEND_FILES = 'files'
+BACKEND_SQLITE = 'sqlite'
+BACKENDS = (BACKEND_FILES, BACKEND_SQLITE)
+
+LAYOUT_FLAT = 'flat'
+LAYOUT_SHARDED = 'sharded'
+LAYOUTS = (LAYOUT_FLAT, LAYOUT_SHARDED)
+
+MODEL_FORMAT_FOREST = 'forest'
+MODEL_FORMAT_JOBLIB = 'joblib'
+
+# Users per query of batched reads, below SQLite's bound parameter limit
+SQLITE_BATCH_SIZE = 500
+
+# Hex digits of the user id hash used per directory level
+SHARD_WIDTH = 2
+SHARD_LEVELS = 2
+
+FOREST_SUFFIX = '.forest'
+JOBLIB_SUFFIX = '.joblib'
+METADATA_SUFFIX = '_metadata.json'
+INFO_SUFFIX = '_info.json'
+SAMPLES_SUFFIX = '_samples.bin'
+LEGACY_FEATURES_SUFFIX = '_features.npy'
+
+# Model metadata fields summarized in the user info index
+INFO_METADATA_FIELDS = ('model_version', 'max_feature_length', 'feature_schema', 'created_at', 'samples_count')
+
+
+def samples_directory(schema=POSITIONAL_SCHEMA):
+    """
+    Subdirectory of a user directory holding the sample logs of a feature schema.
+
+    Positional sample logs live next to the user's other files. Other schemas
+    get their own directory rather than a schema name in the file name, which
+    would make 'bob_fixed_samples.bin' both bob's fixed schema samples and the
+    positional samples of a user named 'bob_fixed'.
+    """
+    return '' if schema == POSITIONAL_SCHEMA else schema
+
+
+# Schemas whose sample logs sit in a subdirectory of the user directory
+SCHEMA_DIRECTORIES = {samples_directory(schema): schema for schema in FEATURE_SCHEMAS if samples_directory(schema)}
+
+# Suffixes of every per-user file; none ends with another, so user ids are split off unambiguously
+USER_FILE_SUFFIXES = [FOREST_SUFFIX, JOBLIB_SUFFIX, METADATA_SUFFIX, INFO_SUFFIX, SAMPLES_SUFFIX,
+                      LEGACY_FEATURES_SUFFIX]
+
+
+def split_user_file(filename):
+    """
+    Split a per-user file name into user id and suffix.
+
+    Returns:
+        tuple: (user_id, suffix), or (None, None) for other files
+    """
+    for suffix in USER_FILE_SUFFIXES:
+        if filename.endswith(suffix) and len(filename) > len(suffix):
+            return filename[:-len(suffix)], suffix
+    return None, None
+
+
+def shard_path(root, user_id):
+    """Directory holding a user's files in the sharded layout."""
+    digest = user_digest(user_id).hex()
+    parts = [digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH] for level in range(SHARD_LEVELS)]
+    return os.path.join(root, *parts)
+
+
+def _atomic_write(path, write, mode='wb'):
+    """
+    Write a file through a temporary file renamed over it.
+
+    Readers see either the old or the new file, never a partial one. The
+    temporary name is unique per process and thread, so concurrent writers
+    of the same file do not interfere.
+
+    Args:
+        path (str): Destination file path
+        write (callable): Writes the content to the open temporary file
+        mode (str): File mode, 'wb' or 'w'
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _file_stamp(path):
+    """Cheap change marker for a file: (mtime_ns, size, inode), None if missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _same_stamp(recorded, stamp):
+    """Compare a stamp recorded in JSON (a list) with a current one (a tuple)."""
+    if recorded is None or stamp is None:
+        return recorded is None and stamp is None
+    return tuple(recorded) == tuple(stamp)
+
+
+def _model_summary(metadata):
+    """Fields of the model metadata kept in the user info index, None without metadata."""
+    if metadata is None:
+        return None
+    return {field: metadata.get(field) for field in INFO_METADATA_FIELDS}
+
+
+class Storage:
+    """
+    Interface of the per-user artifact stores.
+
+    Metadata stamps are opaque markers that change whenever a user's metadata
+    is rewritten; the model cache compares them to notice models saved by
+    other worker processes.
+    """
+
+    # Sample history policy applied on append, None keeps every sample
+    history = None
+
+    def has_samples(self, user_id, schema):
+        """Whether samples in the given schema are stored for the user."""
+        raise NotImplementedError
+
+    def read_samples(self, user_id, schema):
+        """Stored samples of a user as a list of float32 arrays, empty if none."""
+        raise NotImplementedError
+
+    def append_sample(self, user_id, features, schema):
+        """Append one sample and return the number of samples stored afterwards."""
+        return self.append_samples(user_id, [features], schema)
+
+    def append_samples(self, user_id, samples, schema):
+        """
+        Append several samples in one write and return the number of samples stored afterwards.
+
+        When the storage has a sample history policy and the append takes
+        the history past its trim threshold, the samples the policy drops to
+        get back to its cap are removed in the same write.
+        """
+        raise NotImplementedError
+
+    def write_samples(self, user_id, samples, schema, appended=None):
+        """
+        Replace all samples of a user in the given schema.
+
+        Args:
+            appended (int): Samples ever appended to set the counter to,
+                            by default it is kept but at least len(samples)
+        """
+        raise NotImplementedError
+
+    def read_metadata(self, user_id):
+        """Stored model metadata of a user, None if there is none."""
+        raise NotImplementedError
+
+    def read_metadata_with_stamp(self, user_id):
+        """Stored model metadata together with its stamp, (None, None) if there is none."""
+        raise NotImplementedError
+
+    def metadata_stamp(self, user_id):
+        """Current metadata stamp of a user, None if there is no metadata."""
+        raise NotImplementedError
+
+    def write_metadata(self, user_id, metadata):
+        """Replace the model metadata of a user and return the new stamp."""
+        raise NotImplementedError
+
+    def read_model(self, user_id):
+        """Stored model of a user (FlatForest or scikit-learn model), None if there is none."""
+        raise NotImplementedError
+
+    def read_models(self, user_ids):
+        """
+        Read the models of several users at once.
+
+        Args:
+            user_ids (list): User identifiers
+
+        Returns:
+            dict: user_id -> (model, metadata, stamp) for users with a stored model
+        """
+        models = {}
+        for user_id in user_ids:
+            metadata, stamp = self.read_metadata_with_stamp(user_id)
+            if metadata is None:
+                continue
+            model = self.read_model(user_id)
+            if model is not None:
+                models[user_id] = (model, metadata, stamp)
+        return models
+
+    def write_model(self, user_id, model, metadata, compression=None):
+        """
+        Store a user's model together with its metadata and return the metadata stamp.
+
+        FlatForest models are stored in the compact format, other models with joblib.
+        """
+        raise NotImplementedError
+
+    def list_users(self):
+        """
+        Users with a stored model.
+
+        Returns:
+            dict: user_id -> time the model metadata was last written (Unix seconds)
+        """
+        raise NotImplementedError
+
+    def user_ids(self):
+        """Every user with stored samples, metadata or a model."""
+        raise NotImplementedError
+
+    def read_user_info(self, user_id):
+        """
+        Summary of what is stored for a user, without reading samples or models.
+
+        This default implementation reads everything; backends override it
+        with an index maintained on write.
+
+        Returns:
+            dict: 'samples' (schema -> sample count, for schemas with samples),
+                  'appended' (schema -> samples ever appended), 'has_model'
+                  and 'model' (INFO_METADATA_FIELDS of the metadata, None
+                  without metadata)
+        """
+        samples = {}
+        for schema in FEATURE_SCHEMAS:
+            count = len(self.read_samples(user_id, schema))
+            if count:
+                samples[schema] = count
+        metadata = self.read_metadata(user_id)
+        return {
+            'samples': samples,
+            'appended': dict(samples),
+            'has_model': metadata is not None and self.read_model(user_id) is not None,
+            'model': _model_summary(metadata)
+        }
+
+
+class FileStorage(Storage):
+    """Per-user artifacts stored as individual files, in a flat or sharded layout."""
+
+    def __init__(self, root, layout=LAYOUT_FLAT, history=None):
+        """
+        Args:
+            root (str): Model directory
+            layout (str): 'flat' or 'sharded'
+            history (SampleHistory): Bound on the samples kept per user, None keeps every sample
+        """
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown storage layout {layout!r}, expected one of {LAYOUTS}")
+        self.root = root
+        self.layout = layout
+        self.history = history
+        os.makedirs(root, exist_ok=True)
+        # Serializes the writes of a user's files with the update of their info file
+        self._index_locks = UserLocks(os.path.join(root, 'locks', 'index'))
+
+    def user_dir(self, user_id):
+        """Directory holding a user's files."""
+        if self.layout == LAYOUT_SHARDED:
+            return shard_path(self.root, user_id)
+        return self.root
+
+    def path(self, user_id, suffix):
+        """Path of one of a user's files."""
+        return os.path.join(self.user_dir(user_id), f"{user_id}{suffix}")
+
+    def _writable_path(self, user_id, suffix):
+        """Path of a user's file, creating its shard directory if needed."""
+        if self.layout == LAYOUT_SHARDED:
+            os.makedirs(self.user_dir(user_id), exist_ok=True)
+        return self.path(user_id, suffix)
+
+    def samples_path(self, user_id, schema):
+        """Path of a user's sample log in a feature schema."""
+        return os.path.join(self.user_dir(user_id), samples_directory(schema), f"{user_id}{SAMPLES_SUFFIX}")
+
+    def _writable_samples_path(self, user_id, schema):
+        """Path of a user's sample log, creating its directory if needed."""
+        samples_file = self.samples_path(user_id, schema)
+        os.makedirs(os.path.dirname(samples_file), exist_ok=True)
+        return samples_file
+
+    # Samples
+
+    def has_samples(self, user_id, schema):
+        if os.path.exists(self.samples_path(user_id, schema)):
+            return True
+        return schema == POSITIONAL_SCHEMA and os.path.exists(self.path(user_id, LEGACY_FEATURES_SUFFIX))
+
+    def _read_legacy_samples(self, user_id):
+        """Samples from a pickled .npy file used before the sample log, empty if there is none."""
+        try:
+            return np.load(self.path(user_id, LEGACY_FEATURES_SUFFIX), allow_pickle=True).tolist()
+        except FileNotFoundError:
+            return []
+
+    def read_samples(self, user_id, schema):
+        samples_file = self.samples_path(user_id, schema)
+        if os.path.exists(samples_file):
+            return read_samples(samples_file)
+        if schema == POSITIONAL_SCHEMA:
+            return self._read_legacy_samples(user_id)
+        return []
+
+    def append_samples(self, user_id, samples, schema):
+        samples_file = self._writable_samples_path(user_id, schema)
+        with self._index_locks.lock(user_id):
+            if schema == POSITIONAL_SCHEMA and not os.path.exists(samples_file):
+                self._migrate_legacy_samples(user_id)
+            previous_stamp = _file_stamp(samples_file)
+            append_samples(samples_file, samples)
+
+            info = self._read_info(user_id)
+            entry = info['samples'].get(schema) if info is not None else None
+            previous_appended = entry.get('appended', entry['count']) if entry is not None else 0
+            if entry is not None and _same_stamp(entry['stamp'], previous_stamp):
+                count = entry['count'] + len(samples)
+            else:
+                count = count_samples(samples_file)
+            appended = max(previous_appended + len(samples), count)
+
+            if self.history is not None and self.history.needs_trim(count):
+                stored = read_samples(samples_file)
+                keep = self.history.keep(stored, len(samples), appended)
+                write_samples(samples_file, [stored[index] for index in keep])
+                count = len(keep)
+            self._update_info(user_id, info,
+                              lambda info: self._set_sample_count(info, user_id, schema, count, appended))
+        return count
+
+    def write_samples(self, user_id, samples, schema, appended=None):
+        with self._index_locks.lock(user_id):
+            write_samples(self._writable_samples_path(user_id, schema), samples)
+            legacy_file = self.path(user_id, LEGACY_FEATURES_SUFFIX)
+            if os.path.exists(legacy_file):
+                os.remove(legacy_file)
+
+            def update(info):
+                entry = info['samples'].get(schema)
+                previous_appended = entry.get('appended', entry['count']) if entry is not None else 0
+                self._set_sample_count(info, user_id, schema, len(samples),
+                                       appended if appended is not None else max(previous_appended, len(samples)))
+
+            self._update_info(user_id, self._read_info(user_id), update)
+
+    def _migrate_legacy_samples(self, user_id):
+        """Move samples from a legacy .npy file into the positional sample log, if present."""
+        legacy_file = self.path(user_id, LEGACY_FEATURES_SUFFIX)
+        if os.path.exists(legacy_file):
+            write_samples(self.samples_path(user_id, POSITIONAL_SCHEMA), self._read_legacy_samples(user_id))
+            os.remove(legacy_file)
+
+    # Metadata
+
+    def read_metadata(self, user_id):
+        return self.read_metadata_with_stamp(user_id)[0]
+
+    def read_metadata_with_stamp(self, user_id):
+        try:
+            with open(self.path(user_id, METADATA_SUFFIX), 'r') as f:
+                stamp = _file_stamp(f.fileno())
+                return json.load(f), stamp
+        except FileNotFoundError:
+            return None, None
+
+    def metadata_stamp(self, user_id):
+        return _file_stamp(self.path(user_id, METADATA_SUFFIX))
+
+    def write_metadata(self, user_id, metadata):
+        with self._index_locks.lock(user_id):
+            return self._write_metadata(user_id, metadata)
+
+    def _write_metadata(self, user_id, metadata, has_model=None):
+        """Write the metadata file and update the info file. Called with the index lock held."""
+        metadata_file = self._writable_path(user_id, METADATA_SUFFIX)
+        _atomic_write(metadata_file, lambda f: json.dump(metadata, f, indent=2), mode='w')
+        stamp = _file_stamp(metadata_file)
+
+        def update(info):
+            info['metadata_stamp'] = stamp
+            info['model'] = _model_summary(metadata)
+            if has_model is not None:
+                info['has_model'] = has_model
+
+        self._update_info(user_id, self._read_info(user_id), update)
+        return stamp
+
+    # Models
+
+    def read_model(self, user_id):
+        # The compact file takes precedence; a missing file costs one failed lookup
+        try:
+            return FlatForest.load(self.path(user_id, FOREST_SUFFIX))
+        except FileNotFoundError:
+            pass
+        try:
+            return joblib.load(self.path(user_id, JOBLIB_SUFFIX))
+        except FileNotFoundError:
+            return None
+
+    def write_model(self, user_id, model, metadata, compression=None):
+        with self._index_locks.lock(user_id):
+            if isinstance(model, FlatForest):
+                model.save(self._writable_path(user_id, FOREST_SUFFIX), compression=compression or 'none')
+                stale_file = self.path(user_id, JOBLIB_SUFFIX)
+            else:
+                _atomic_write(self._writable_path(user_id, JOBLIB_SUFFIX), lambda f: joblib.dump(model, f))
+                stale_file = self.path(user_id, FOREST_SUFFIX)
+
+            # The compact file takes precedence when loading, so never leave an older one behind
+            if os.path.exists(stale_file):
+                os.remove(stale_file)
+            return self._write_metadata(user_id, metadata, has_model=True)
+
+    # User info index
+
+    def _samples_source(self, user_id, schema):
+        """File holding a user's samples in a schema (the legacy .npy file for old positional users)."""
+        samples_file = self.samples_path(user_id, schema)
+        if schema == POSITIONAL_SCHEMA and not os.path.exists(samples_file):
+            return self.path(user_id, LEGACY_FEATURES_SUFFIX)
+        return samples_file
+
+    def _read_info(self, user_id):
+        """Content of a user's info file, None if missing or unreadable."""
+        try:
+            with open(self.path(user_id, INFO_SUFFIX), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _build_info(self, user_id, previous=None):
+        """
+        Info of a user computed from the files themselves.
+
+        The appended counters cannot be recovered from the files; those of
+        a previous (stale) info are kept, otherwise they start at the count.
+        """
+        info = {'samples': {}}
+        for schema in FEATURE_SCHEMAS:
+            stamp = _file_stamp(self._samples_source(user_id, schema))
+            if stamp is not None:
+                count = len(self.read_samples(user_id, schema))
+                entry = previous['samples'].get(schema) if previous is not None else None
+                appended = max(entry.get('appended', entry['count']), count) if entry is not None else count
+                info['samples'][schema] = {'count': count, 'appended': appended, 'stamp': stamp}
+        metadata, info['metadata_stamp'] = self.read_metadata_with_stamp(user_id)
+        info['model'] = _model_summary(metadata)
+        info['has_model'] = (os.path.exists(self.path(user_id, FOREST_SUFFIX)) or
+                             os.path.exists(self.path(user_id, JOBLIB_SUFFIX)))
+        return info
+
+    def _update_info(self, user_id, info, update):
+        """
+        Apply an update to a user's info and rewrite the info file.
+
+        Called with the index lock held, after the change has been written.
+        Without a previous info file the info is first built from the files,
+        which already include the change; the update is still applied for
+        what the files cannot tell, like the appended counters.
+        """
+        if info is None:
+            info = self._build_info(user_id)
+        update(info)
+        self._write_info(user_id, info)
+
+    def _write_info(self, user_id, info):
+        _atomic_write(self._writable_path(user_id, INFO_SUFFIX), lambda f: json.dump(info, f), mode='w')
+
+    def _set_sample_count(self, info, user_id, schema, count, appended):
+        info['samples'][schema] = {
+            'count': count,
+            'appended': appended,
+            'stamp': _file_stamp(self._samples_source(user_id, schema))
+        }
+
+    def _is_info_current(self, user_id, info):
+        """Whether the stamps recorded in an info file still match the files it summarizes."""
+        for schema in FEATURE_SCHEMAS:
+            entry = info['samples'].get(schema)
+            stamp = _file_stamp(self._samples_source(user_id, schema))
+            if not _same_stamp(entry['stamp'] if entry is not None else None, stamp):
+                return False
+        return _same_stamp(info.get('metadata_stamp'), self.metadata_stamp(user_id))
+
+    def read_user_info(self, user_id):
+        info = self._read_info(user_id)
+        if info is None or not self._is_info_current(user_id, info):
+            with self._index_locks.lock(user_id):
+                # A writer may just have updated it
+                info = self._read_info(user_id)
+                if info is None or not self._is_info_current(user_id, info):
+                    info = self._build_info(user_id, previous=info)
+                    if info['samples'] or info['metadata_stamp'] is not None or info['has_model']:
+                        self._write_info(user_id, info)
+        samples = {schema: entry for schema, entry in info['samples'].items() if entry['count']}
+        return {
+            'samples': {schema: entry['count'] for schema, entry in samples.items()},
+            'appended': {schema: entry.get('appended', entry['count']) for schema, entry in samples.items()},
+            'has_model': info['has_model'],
+            'model': info['model']
+        }
+
+    def list_users(self):
+        users = {}
+        for directory in self._user_directories():
+            for entry in os.scandir(directory):
+                if entry.name.endswith(METADATA_SUFFIX) and entry.is_file():
+                    users[entry.name[:-len(METADATA_SUFFIX)]] = entry.stat().st_mtime
+        return users
+
+    def user_ids(self):
+        user_ids = set()
+        directories = self._user_directories()
+        directories += [os.path.join(directory, name) for directory in directories for name in SCHEMA_DIRECTORIES
+                        if os.path.isdir(os.path.join(directory, name))]
+        for directory in directories:
+            for entry in os.scandir(directory):
+                user_id, _ = split_user_file(entry.name)
+                if user_id is not None and entry.is_file():
+                    user_ids.add(user_id)
+        return sorted(user_ids)
+
+    def _user_directories(self):
+        """Directories that hold user files in this layout."""
+        directories = [self.root]
+        if self.layout == LAYOUT_SHARDED:
+            for _ in range(SHARD_LEVELS):
+                directories = [entry.path for directory in directories for entry in os.scandir(directory)
+                               if entry.is_dir() and len(entry.name) == SHARD_WIDTH]
+        return directories
+
+
+def _serialize_model(model, compression=None):
+    """Serialize a model for a database row, returning (format, bytes)."""
+    if isinstance(model, FlatForest):
+        return MODEL_FORMAT_FOREST, model.to_bytes(compression=compression or 'none')
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return MODEL_FORMAT_JOBLIB, buffer.getvalue()
+
+
+def _deserialize_model(model_format, data):
+    """Inverse of _serialize_model."""
+    if model_format == MODEL_FORMAT_FOREST:
+        return FlatForest.from_bytes(data)
+    return joblib.load(io.BytesIO(data))
+
+
+class SQLiteStorage(Storage):
+    """
+    Per-user artifacts stored in one SQLite database in WAL mode.
+
+    Each thread uses its own connection, opened on first use in every
+    process. Writes run in IMMEDIATE transactions, so concurrent writers
+    wait for each other (up to busy_timeout seconds) instead of failing;
+    readers are never blocked by a writer. The metadata stamp is a per-user
+    version number incremented by every metadata or model write.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            metadata TEXT,
+            model BLOB,
+            model_format TEXT,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL
+        )""",
+        """CREATE TABLE IF NOT EXISTS samples (
+            user_id TEXT NOT NULL,
+            schema TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            features BLOB NOT NULL,
+            PRIMARY KEY (user_id, schema, seq)
+        ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS sample_counts (
+            user_id TEXT NOT NULL,
+            schema TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            appended INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, schema)
+        ) WITHOUT ROWID"""
+    )
+
+    def __init__(self, path, busy_timeout=30.0, history=None):
+        """
+        Args:
+            path (str): Database file, created if missing
+            busy_timeout (float): Seconds to wait for another writer's lock
+            history (SampleHistory): Bound on the samples kept per user, None keeps every sample
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.history = history
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._transaction() as connection:
+            has_counts = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sample_counts'"
+            ).fetchone() is not None
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            if not has_counts:
+                # Databases created before sample counts were kept
+                connection.execute(
+                    """INSERT INTO sample_counts (user_id, schema, count, appended)
+                       SELECT user_id, schema, COUNT(*), COUNT(*) FROM samples GROUP BY user_id, schema"""
+                )
+            elif 'appended' not in [row[1] for row in connection.execute('PRAGMA table_info(sample_counts)')]:
+                # Databases created before appended samples were counted
+                connection.execute('ALTER TABLE sample_counts ADD COLUMN appended INTEGER NOT NULL DEFAULT 0')
+                connection.execute('UPDATE sample_counts SET appended = count')
+
+    def _connection(self):
+        """Connection of the current thread, reopened after a fork."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            # Autocommit mode: transactions are started explicitly
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in one write transaction, rolled back on error."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    # Samples
+
+    def has_samples(self, user_id, schema):
+        row = self._connection().execute(
+            'SELECT 1 FROM samples WHERE user_id = ? AND schema = ? LIMIT 1', (user_id, schema)
+        ).fetchone()
+        return row is not None
+
+    def read_samples(self, user_id, schema):
+        rows = self._connection().execute(
+            'SELECT features FROM samples WHERE user_id = ? AND schema = ? ORDER BY seq', (user_id, schema)
+        ).fetchall()
+        return [np.frombuffer(features, dtype='<f4') for features, in rows]
+
+    def append_samples(self, user_id, samples, schema):
+        values = [np.asarray(features, dtype='<f4').tobytes() for features in samples]
+        with self._transaction() as connection:
+            next_seq, = connection.execute(
+                'SELECT COALESCE(MAX(seq) + 1, 0) FROM samples WHERE user_id = ? AND schema = ?',
+                (user_id, schema)
+            ).fetchone()
+            connection.executemany(
+                'INSERT INTO samples (user_id, schema, seq, features) VALUES (?, ?, ?, ?)',
+                [(user_id, schema, next_seq + offset, features) for offset, features in enumerate(values)]
+            )
+            connection.execute(
+                """INSERT INTO sample_counts (user_id, schema, count, appended) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (user_id, schema) DO UPDATE SET
+                       count = count + excluded.count, appended = MAX(appended, count) + excluded.count""",
+                (user_id, schema, len(values), len(values))
+            )
+            count, appended = connection.execute(
+                'SELECT count, appended FROM sample_counts WHERE user_id = ? AND schema = ?', (user_id, schema)
+            ).fetchone()
+
+            if self.history is not None and self.history.needs_trim(count):
+                rows = connection.execute(
+                    'SELECT seq, features FROM samples WHERE user_id = ? AND schema = ? ORDER BY seq', (user_id, schema)
+                ).fetchall()
+                stored = [np.frombuffer(features, dtype='<f4') for _, features in rows]
+                keep = set(self.history.keep(stored, len(values), appended))
+                connection.executemany(
+                    'DELETE FROM samples WHERE user_id = ? AND schema = ? AND seq = ?',
+                    [(user_id, schema, seq) for index, (seq, _) in enumerate(rows) if index not in keep]
+                )
+                count = len(keep)
+                connection.execute(
+                    'UPDATE sample_counts SET count = ? WHERE user_id = ? AND schema = ?', (count, user_id, schema)
+                )
+        return count
+
+    def write_samples(self, user_id, samples, schema, appended=None):
+        rows = [(user_id, schema, seq, np.asarray(features, dtype='<f4').tobytes())
+                for seq, features in enumerate(samples)]
+        with self._transaction() as connection:
+            if appended is None:
+                previous = connection.execute(
+                    'SELECT MAX(count, appended) FROM sample_counts WHERE user_id = ? AND schema = ?', (user_id, schema)
+                ).fetchone()
+                appended = max(previous[0] if previous is not None else 0, len(rows))
+            connection.execute('DELETE FROM samples WHERE user_id = ? AND schema = ?', (user_id, schema))
+            connection.executemany('INSERT INTO samples (user_id, schema, seq, features) VALUES (?, ?, ?, ?)', rows)
+            connection.execute(
+                'INSERT OR REPLACE INTO sample_counts (user_id, schema, count, appended) VALUES (?, ?, ?, ?)',
+                (user_id, schema, len(rows), appended)
+            )
+
+    # Metadata
+
+    def read_metadata(self, user_id):
+        return self.read_metadata_with_stamp(user_id)[0]
+
+    def read_metadata_with_stamp(self, user_id):
+        row = self._connection().execute(
+            'SELECT metadata, version FROM users WHERE user_id = ? AND metadata IS NOT NULL', (user_id,)
+        ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def metadata_stamp(self, user_id):
+        row = self._connection().execute(
+            'SELECT version FROM users WHERE user_id = ? AND metadata IS NOT NULL', (user_id,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def _write_user(self, connection, user_id, metadata, model_row=None):
+        """Upsert a user's metadata (and model) and return the new version."""
+        if model_row is None:
+            connection.execute(
+                """INSERT INTO users (user_id, metadata, version, updated_at) VALUES (?, ?, 1, ?)
+                   ON CONFLICT (user_id) DO UPDATE SET
+                       metadata = excluded.metadata, version = version + 1, updated_at = excluded.updated_at""",
+                (user_id, json.dumps(metadata), time.time())
+            )
+        else:
+            model_format, data = model_row
+            connection.execute(
+                """INSERT INTO users (user_id, metadata, model, model_format, version, updated_at)
+                   VALUES (?, ?, ?, ?, 1, ?)
+                   ON CONFLICT (user_id) DO UPDATE SET
+                       metadata = excluded.metadata, model = excluded.model,
+                       model_format = excluded.model_format, version = version + 1,
+                       updated_at = excluded.updated_at""",
+                (user_id, json.dumps(metadata), data, model_format, time.time())
+            )
+        return connection.execute('SELECT version FROM users WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+    def write_metadata(self, user_id, metadata):
+        with self._transaction() as connection:
+            return self._write_user(connection, user_id, metadata)
+
+    # Models
+
+    def read_model(self, user_id):
+        row = self._connection().execute(
+            'SELECT model_format, model FROM users WHERE user_id = ? AND model IS NOT NULL', (user_id,)
+        ).fetchone()
+        return _deserialize_model(*row) if row is not None else None
+
+    def read_models(self, user_ids):
+        models = {}
+        user_ids = list(user_ids)
+        connection = self._connection()
+        for start in range(0, len(user_ids), SQLITE_BATCH_SIZE):
+            chunk = user_ids[start:start + SQLITE_BATCH_SIZE]
+            rows = connection.execute(
+                f"""SELECT user_id, metadata, version, model_format, model FROM users
+                    WHERE user_id IN ({', '.join('?' * len(chunk))})
+                    AND metadata IS NOT NULL AND model IS NOT NULL""",
+                chunk
+            ).fetchall()
+            for user_id, metadata, version, model_format, data in rows:
+                models[user_id] = (_deserialize_model(model_format, data), json.loads(metadata), version)
+        return models
+
+    def write_model(self, user_id, model, metadata, compression=None):
+        # Serialize before taking the write lock
+        model_row = _serialize_model(model, compression)
+        with self._transaction() as connection:
+            return self._write_user(connection, user_id, metadata, model_row)
+
+    def list_users(self):
+        rows = self._connection().execute(
+            'SELECT user_id, updated_at FROM users WHERE metadata IS NOT NULL'
+        ).fetchall()
+        return dict(rows)
+
+    def user_ids(self):
+        rows = self._connection().execute(
+            'SELECT user_id FROM users UNION SELECT DISTINCT user_id FROM samples ORDER BY user_id'
+        ).fetchall()
+        return [user_id for user_id, in rows]
+
+    def read_user_info(self, user_id):
+        connection = self._connection()
+        counts = connection.execute(
+            'SELECT schema, count, MAX(count, appended) FROM sample_counts WHERE user_id = ? AND count > 0', (user_id,)
+        ).fetchall()
+        # The model column is only tested for NULL, its content is not read
+        row = connection.execute(
+            'SELECT metadata, model IS NOT NULL FROM users WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        metadata, has_model = row if row is not None else (None, False)
+        return {
+            'samples': {schema: count for schema, count, _ in counts},
+            'appended': {schema: appended for schema, _, appended in counts},
+            'has_model': bool(has_model),
+            'model': _model_summary(json.loads(metadata) if metadata is not None else None)
+        }
+
+
+def copy_storage(source, destination):
+    """
+    Copy every user's samples, metadata and model from one storage to another.
+
+    Metadata is copied unchanged, including model_version.
+
+    Args:
+        source (Storage): Storage to read from
+        destination (Storage): Storage to write to
+
+    Returns:
+        int: Number of users copied
+    """
+    users = 0
+    for user_id in source.user_ids():
+        appended = source.read_user_info(user_id)['appended']
+        for schema in FEATURE_SCHEMAS:
+            if source.has_samples(user_id, schema):
+                destination.write_samples(user_id, source.read_samples(user_id, schema), schema,
+                                          appended=appended.get(schema))
+        metadata = source.read_metadata(user_id)
+        model = source.read_model(user_id) if metadata is not None else None
+        if model is not None:
+            destination.write_model(user_id, model, metadata)
+        elif metadata is not None:
+            destination.write_metadata(user_id, metadata)
+        users += 1
+    return users
+
+
+def migrate_layout(root, layout, dry_run=False):
+    """
+    Move every per-user file of a model directory to its place in a layout.
+
+    Files already in the right place are left alone, so an interrupted
+    migration can simply be run again. Other files (temporary files, the
+    access log) are not touched.
+
+    Args:
+        root (str): Model directory
+        layout (str): Target layout, 'flat' or 'sharded'
+        dry_run (bool): Only count the files that would be moved
+
+    Returns:
+        tuple: (moved, users) counts
+    """
+    target = FileStorage(root, layout)
+    moved = 0
+    users = set()
+    for directory, _, filenames in os.walk(root):
+        schema = SCHEMA_DIRECTORIES.get(os.path.basename(directory)) if directory != root else None
+        for filename in filenames:
+            user_id, suffix = split_user_file(filename)
+            if user_id is None or (schema is not None and suffix != SAMPLES_SUFFIX):
+                continue
+            source = os.path.join(directory, filename)
+            if schema is not None:
+                destination = target.samples_path(user_id, schema)
+            else:
+                destination = target.path(user_id, suffix)
+            if os.path.abspath(source) == os.path.abspath(destination):
+                continue
+            if not dry_run:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                os.replace(source, destination)
+            moved += 1
+            users.add(user_id)
+
+    if not dry_run and layout == LAYOUT_FLAT:
+        # Remove the shard directories emptied by the migration
+        for directory, _, _ in os.walk(root, topdown=False):
+            if directory != root and not os.listdir(directory):
+                os.rmdir(directory)
+    return moved, len(users)
+
+
+def create_storage(config):
+    """
+    Create the storage backend selected by the configuration.
+
+    Args:
+        config: Application configuration providing STORAGE_BACKEND, MODEL_DIR,
+                STORAGE_LAYOUT, SQLITE_PATH, SQLITE_BUSY_TIMEOUT and the
+                SAMPLE_HISTORY settings
+
+    Returns:
+        Storage: Storage backend
+    """
+    history = create_sample_history(config)
+    if config.STORAGE_BACKEND == BACKEND_SQLITE:
+        return SQLiteStorage(config.SQLITE_PATH or os.path.join(config.MODEL_DIR, 'keystroke.db'),
+                             busy_timeout=config.SQLITE_BUSY_TIMEOUT, history=history)
+    if config.STORAGE_BACKEND != BACKEND_FILES:
+        raise ValueError(f"Unknown storage backend {config.STORAGE_BACKEND!r}, expected one of {BACKENDS}")
+    return FileStorage(config.MODEL_DIR, config.STORAGE_LAYOUT, history=history)
+
+
+def main():
+    """Command line entry point."""
+    from config import get_config
+
+    parser = argparse.ArgumentParser(description="Model storage tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help="Move the files of a model directory to another layout")
+    migrate_parser.add_argument('model_dir', nargs='?', default=get_config().MODEL_DIR)
+    migrate_parser.add_argument('--to', dest='layout', choices=LAYOUTS, default=LAYOUT_SHARDED)
+    migrate_parser.add_argument('--dry-run', action='store_true', help="Only report what would be moved")
+    copy_parser = subparsers.add_parser('copy', help="Copy a model directory into a SQLite database")
+    copy_parser.add_argument('model_dir', nargs='?', default=get_config().MODEL_DIR)
+    copy_parser.add_argument('--layout', choices=LAYOUTS, default=get_config().STORAGE_LAYOUT,
+                             help="Layout of the model directory")
+    copy_parser.add_argument('--to-sqlite', required=True, help="Database file to copy into")
+    args = parser.parse_args()
+
+    if args.command == 'copy':
+        users = copy_storage(FileStorage(args.model_dir, args.layout), SQLiteStorage(args.to_sqlite))
+        print(f"Copied {users} users from {args.model_dir} to {args.to_sqlite}")
+        print(f"Set STORAGE_BACKEND=sqlite and SQLITE_PATH={args.to_sqlite} before restarting the server")
+        return True
+
+    moved, users = migrate_layout(args.model_dir, args.layout, args.dry_run)
+    action = "Would move" if args.dry_run else "Moved"
+    print(f"{action} {moved} files of {users} users to the {args.layout} layout in {args.model_dir}")
+    if not args.dry_run and moved:
+        print(f"Set STORAGE_LAYOUT={args.layout} before restarting the server")
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
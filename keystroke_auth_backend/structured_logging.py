@@ -0,0 +1,119 @@
+"""
+Structured Logging for Keystroke Dynamics Authentication Backend
+
+This module sets up a non-blocking logging pipeline. Request threads only put
+log records on a bounded in-memory queue; a background listener thread
+formats them (as JSON lines or plain text) and writes them to the output
+stream. When the queue is full, records are dropped and counted instead of
+blocking the request.
+
+High-volume records can be sampled: a record logged with
+``extra={'sampled': True}`` is only kept for a LOG_SAMPLE_RATE share of calls,
+unless it is a warning or worse. Structured fields are passed with
+``extra={'fields': {...}}`` and become keys of the JSON record.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a share of the records marked as sampled below WARNING."""
+
+    def __init__(self, sample_rate):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        if getattr(record, 'sampled', False) and record.levelno < logging.WARNING:
+            return random.random() < self.sample_rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text format with structured fields appended as key=value pairs."""
+
+    def format(self, record):
+        message = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return message
+
+
+# Handler installed by setup_logging, kept for the dropped record count
+_queue_handler = None
+
+
+def setup_logging(config):
+    """
+    Route all logging through a bounded queue drained by a background thread.
+
+    Args:
+        config: Application configuration providing LOG_LEVEL, LOG_FORMAT,
+                LOG_STRUCTURED, LOG_QUEUE_SIZE and LOG_SAMPLE_RATE
+    """
+    global _queue_handler
+
+    output_handler = logging.StreamHandler(sys.stderr)
+    if config.LOG_STRUCTURED:
+        output_handler.setFormatter(JsonFormatter())
+    else:
+        output_handler.setFormatter(TextFormatter(config.LOG_FORMAT))
+
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(config.LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(getattr(logging, config.LOG_LEVEL))
+
+    listener = QueueListener(log_queue, output_handler, respect_handler_level=True)
+    listener.start()
+    # Flush queued records when the process exits
+    atexit.register(listener.stop)
+
+
+def dropped_records():
+    """Number of log records dropped because the queue was full."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
@@ -142,6 +142,38 @@ def test_training(user_id, num_samples=6):
     return training_results
 
 
+def test_training_job(training_results, timeout=30):
+    """Wait for the last background training job to finish."""
+    jobs = [result['training_job'] for result in training_results if result.get('training_job')]
+    if not jobs:
+        print("   ℹ️  No background training job (inline training)")
+        return None
+    
+    job_id = jobs[-1]['job_id']
+    print(f"🔍 Waiting for training job {job_id}...")
+    
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            response = requests.get(f"{BASE_URL}/train/{job_id}")
+            if response.status_code != 200:
+                print(f"   ❌ Job lookup failed: {response.status_code} - {response.text}")
+                return None
+            
+            data = response.json()
+            if data['status'] in ('completed', 'failed'):
+                print(f"   ✅ Job {data['status']}: {data.get('result') or data.get('error')}")
+                return data
+        except Exception as e:
+            print(f"   ❌ Error checking training job: {e}")
+            return None
+        
+        time.sleep(0.5)
+    
+    print("   ⚠️  Training job did not finish in time")
+    return None
+
+
 def test_authentication(user_id, num_tests=3):
     """Test the authentication endpoint."""
     print(f"🔍 Testing authentication for user: {user_id}")
@@ -189,6 +221,44 @@ def test_authentication(user_id, num_tests=3):
     return auth_results
 
 
+def test_batch_prediction(user_id, num_samples=5):
+    """Test scoring several samples with one /predict/batch call."""
+    print(f"🔍 Testing batch prediction with {num_samples} samples...")
+    
+    payload = {
+        "user_id": user_id,
+        "samples": [
+            {"sample_id": f"sample_{i}", "keystroke_data": generate_sample_keystroke_data()}
+            for i in range(num_samples)
+        ]
+    }
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/predict/batch",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps(payload),
+            stream=True
+        )
+        
+        if response.status_code != 200:
+            print(f"   ❌ Batch prediction failed: {response.status_code} - {response.text}")
+            return []
+        
+        results = [json.loads(line) for line in response.iter_lines() if line]
+        for result in results:
+            if 'error' in result:
+                print(f"   ❌ {result.get('sample_id')}: {result['error']}")
+            else:
+                print(f"   {'✅' if result['authenticated'] else '❌'} {result.get('sample_id')}: "
+                      f"score {result['confidence_score']:.4f}")
+        return results
+        
+    except Exception as e:
+        print(f"   ❌ Error during batch prediction: {e}")
+        return []
+
+
 def test_imposter_detection(user_id):
     """Test authentication with different typing patterns (imposter simulation)."""
     print(f"🔍 Testing imposter detection for user: {user_id}")
@@ -271,6 +341,10 @@ def main():
     training_results = test_training(TEST_USER_ID, num_samples=6)
     print()
     
+    # Test 3b: Wait for background training to finish
+    test_training_job(training_results)
+    print()
+    
     # Test 4: User info after training
     test_user_info(TEST_USER_ID)
     print()
@@ -279,6 +353,10 @@ def main():
     auth_results = test_authentication(TEST_USER_ID, num_tests=3)
     print()
     
+    # Test 5b: Batch authentication
+    test_batch_prediction(TEST_USER_ID)
+    print()
+    
     # Test 6: Imposter detection
     test_imposter_detection(TEST_USER_ID)
     print()
@@ -0,0 +1,111 @@
+"""
+Unit Tests for the Compact IsolationForest Format
+
+A forest flattened from a fitted IsolationForest must score like
+scikit-learn within floating point tolerance, and a forest saved in the
+compact format and loaded back, from a file or from bytes, with or without
+compression, must score exactly like the forest that was saved.
+
+Usage: python -m unittest test_compact_forest
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from compact_forest import COMPRESSION_NONE, COMPRESSION_ZLIB, FlatForest
+
+
+def fit_forest(seed=0, n_samples=200, n_features=12, **params):
+    """IsolationForest fitted on random data, with data to score."""
+    rng = np.random.default_rng(seed)
+    X_train = rng.normal(100, 30, size=(n_samples, n_features))
+    X_test = np.vstack([rng.normal(100, 30, size=(150, n_features)), rng.normal(250, 60, size=(50, n_features))])
+    model = IsolationForest(random_state=seed, **params).fit(X_train)
+    return model, X_test
+
+
+class ScoringTest(unittest.TestCase):
+    """FlatForest must score like the IsolationForest it was built from."""
+
+    # Path lengths are summed in a different order than scikit-learn
+    TOLERANCE = 1e-8
+
+    def test_scores_match_isolation_forest(self):
+        for seed, params in ((0, {}), (1, {'n_estimators': 37}), (2, {'max_samples': 64}),
+                             (3, {'contamination': 0.1}), (4, {'max_features': 0.5})):
+            model, X = fit_forest(seed, **params)
+            forest = FlatForest.from_sklearn(model)
+            with self.subTest(seed=seed, params=params):
+                np.testing.assert_allclose(forest.score_samples(X), model.score_samples(X),
+                                           rtol=0, atol=self.TOLERANCE)
+                np.testing.assert_allclose(forest.decision_function(X), model.decision_function(X),
+                                           rtol=0, atol=self.TOLERANCE)
+                np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+
+    def test_single_samples_match_batches(self):
+        model, X = fit_forest(5)
+        forest = FlatForest.from_sklearn(model)
+        batch_scores = forest.score_samples(X)
+        for index in range(0, len(X), 17):
+            row = X[index:index + 1]
+            self.assertAlmostEqual(forest.score_samples(row)[0], batch_scores[index], delta=self.TOLERANCE)
+            self.assertAlmostEqual(forest.score_samples(row)[0], model.score_samples(row)[0], delta=self.TOLERANCE)
+
+    def test_values_on_split_thresholds(self):
+        # Rows made of the split thresholds themselves take the same branch as in scikit-learn
+        model, X = fit_forest(6)
+        forest = FlatForest.from_sklearn(model)
+        thresholds = np.concatenate([tree.tree_.threshold[tree.tree_.feature >= 0] for tree in model.estimators_])
+        X = np.resize(thresholds, (len(thresholds) // X.shape[1], X.shape[1]))
+        np.testing.assert_allclose(forest.score_samples(X), model.score_samples(X), rtol=0, atol=self.TOLERANCE)
+
+
+class RoundTripTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        model, cls.X = fit_forest()
+        cls.forest = FlatForest.from_sklearn(model)
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def assertSameForest(self, loaded):
+        self.assertEqual(loaded.n_estimators, self.forest.n_estimators)
+        self.assertEqual(loaded.n_features_in_, self.forest.n_features_in_)
+        self.assertEqual(loaded.max_samples_, self.forest.max_samples_)
+        self.assertEqual(loaded.offset_, self.forest.offset_)
+        np.testing.assert_array_equal(loaded.score_samples(self.X), self.forest.score_samples(self.X))
+        np.testing.assert_array_equal(loaded.decision_function(self.X[:1]), self.forest.decision_function(self.X[:1]))
+
+    def test_save_and_load(self):
+        for compression in (COMPRESSION_NONE, COMPRESSION_ZLIB):
+            with self.subTest(compression=compression):
+                path = os.path.join(self.tmp_dir.name, f'forest_{compression}.forest')
+                self.forest.save(path, compression=compression)
+                self.assertSameForest(FlatForest.load(path))
+
+    def test_bytes_round_trip(self):
+        for compression in (COMPRESSION_NONE, COMPRESSION_ZLIB):
+            with self.subTest(compression=compression):
+                self.assertSameForest(FlatForest.from_bytes(self.forest.to_bytes(compression=compression)))
+
+    def test_compression_shrinks_file(self):
+        self.assertLess(len(self.forest.to_bytes(compression=COMPRESSION_ZLIB)), len(self.forest.to_bytes()))
+
+    def test_rejects_other_files(self):
+        path = os.path.join(self.tmp_dir.name, 'not_a_forest.bin')
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            FlatForest.load(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
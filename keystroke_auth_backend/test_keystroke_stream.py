@@ -0,0 +1,154 @@
+"""
+Unit Tests for Streaming Keystroke Features
+
+Windows of a keystroke stream must be featurized exactly like enrollment
+samples of the same key presses, or stream scores are computed against a
+model trained on different features; a genuine stream scored on
+/predict/windows must then authenticate.
+
+Usage: python -m unittest test_keystroke_stream
+"""
+
+import random
+import unittest
+
+import numpy as np
+
+import test_support
+import app
+from app import extract_features
+from feature_schema import FIXED_SCHEMA, POSITIONAL_SCHEMA
+from keystroke_stream import KeystrokeStream, press_timings, sliding_window_features, window_features
+from sessions import TypingSession
+
+# Texts with repeated keys, where per-press and per-key timings differ
+TEXTS = ['the quick brown fox jumps', 'password', 'aaa bbb aaa', 'hello world hello', 'a']
+
+
+class WindowFeaturesTest(unittest.TestCase):
+
+    def assertSameFeatures(self, expected, actual, schema):
+        self.assertEqual(len(expected), len(actual))
+        if schema == POSITIONAL_SCHEMA:
+            self.assertEqual(expected, actual)
+        else:
+            # Summary statistics are summed in a different order
+            np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=0)
+
+    def test_whole_sample_matches_enrollment_features(self):
+        rng = random.Random(7)
+        for text in TEXTS:
+            for _ in range(20):
+                # Overlapping presses of different keys included
+                sample = test_support.generate_sample(text, hold=(30, 200), flight=(-100, 300), rng=rng)
+                for schema in (POSITIONAL_SCHEMA, FIXED_SCHEMA):
+                    with self.subTest(text=text, schema=schema):
+                        self.assertSameFeatures(
+                            extract_features(sample, schema), window_features(press_timings(sample), schema), schema
+                        )
+
+    def test_chunked_stream_matches_enrollment_features(self):
+        sample = test_support.generate_sample('hello world hello', rng=random.Random(3))
+        stream = KeystrokeStream()
+        records = []
+        for start in range(0, len(sample), 5):
+            records.extend(stream.feed(sample[start:start + 5]))
+        records.extend(stream.flush())
+        for schema in (POSITIONAL_SCHEMA, FIXED_SCHEMA):
+            self.assertSameFeatures(extract_features(sample, schema), window_features(records, schema), schema)
+
+    def test_sliding_windows_match_single_windows(self):
+        records = press_timings(test_support.generate_stream('the quick brown fox', 10, rng=random.Random(5)))
+        for schema in (POSITIONAL_SCHEMA, FIXED_SCHEMA):
+            for size, stride in ((19, 19), (40, 10), (7, 3)):
+                starts, ends, features = sliding_window_features(records, size, stride, schema)
+                for start, end, vector in zip(starts, ends, features):
+                    with self.subTest(schema=schema, size=size, stride=stride, start=start):
+                        self.assertSameFeatures(window_features(records[start:end], schema), vector, schema)
+
+    def test_windows_of_a_stream_match_its_samples(self):
+        rng = random.Random(11)
+        samples = [test_support.generate_sample('hello world', start=index * 10000, rng=rng) for index in range(4)]
+        records = press_timings([event for sample in samples for event in sample])
+        starts, _, features = sliding_window_features(records, 11, 11, FIXED_SCHEMA)
+        self.assertEqual(list(starts), [0, 11, 22, 33])
+        for sample, vector in zip(samples, features):
+            self.assertSameFeatures(extract_features(sample, FIXED_SCHEMA), vector, FIXED_SCHEMA)
+
+
+class MalformedChunkTest(unittest.TestCase):
+    """A chunk with a malformed event must leave the stream as it was."""
+
+    def test_bad_event_mid_chunk_changes_nothing(self):
+        sample = test_support.generate_sample('hello world hello', rng=random.Random(13))
+        first, second = sample[:10], sample[10:]
+        expected = KeystrokeStream()
+        expected_records = expected.feed(first) + expected.feed(second) + expected.flush()
+
+        for bad_event in ({'key': 'x', 'event': 'down'}, {'key': 'x', 'event': 'down', 'timestamp': 'soon'},
+                          {'key': ['x'], 'event': 'down', 'timestamp': 5}, 'x'):
+            with self.subTest(bad_event=bad_event):
+                stream = KeystrokeStream()
+                records = stream.feed(first)
+                state = (stream.events, stream.presses, stream.pending)
+                with self.assertRaises((KeyError, TypeError, ValueError)):
+                    stream.feed(second[:4] + [bad_event] + second[4:])
+                self.assertEqual((stream.events, stream.presses, stream.pending), state)
+
+                # The corrected chunk continues the stream as if the bad one never arrived
+                records += stream.feed(second) + stream.flush()
+                np.testing.assert_array_equal(np.array([record[1:] for record in records]),
+                                              np.array([record[1:] for record in expected_records]))
+                self.assertEqual([record[0] for record in records], [record[0] for record in expected_records])
+
+    def test_session_window_is_unchanged(self):
+        sample = test_support.generate_sample('the quick brown fox', rng=random.Random(17))
+        expected = TypingSession('alice', FIXED_SCHEMA, window_presses=50, score_history=5)
+        expected.add_events(sample[:12])
+        expected.add_events(sample[12:])
+
+        session = TypingSession('alice', FIXED_SCHEMA, window_presses=50, score_history=5)
+        session.add_events(sample[:12])
+        with self.assertRaises(KeyError):
+            session.add_events(sample[12:30] + [{'event': 'up', 'timestamp': 1}] + sample[30:])
+        session.add_events(sample[12:])
+        self.assertEqual(session.stream.presses, expected.stream.presses)
+        self.assertEqual([record[0] for record in session.window], [record[0] for record in expected.window])
+        np.testing.assert_array_equal(np.array([record[1:] for record in session.window]),
+                                      np.array([record[1:] for record in expected.window]))
+
+
+class PredictWindowsTest(unittest.TestCase):
+    """End to end: enroll a user, then score long streams on /predict/windows."""
+
+    TEXT = 'the quick brown fox jumps'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client = app.app.test_client()
+        cls.rng = random.Random(2024)
+        for _ in range(20):
+            response = cls.client.post('/train', json={
+                'user_id': 'stream_user',
+                'keystroke_data': test_support.generate_sample(cls.TEXT, rng=cls.rng)
+            })
+            assert response.status_code == 200, response.get_json()
+
+    def predict_windows(self, stream):
+        response = self.client.post('/predict/windows', json={'user_id': 'stream_user', 'keystroke_data': stream})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_genuine_stream_authenticates(self):
+        result = self.predict_windows(test_support.generate_stream(self.TEXT, 20, rng=self.rng))
+        self.assertEqual(result['window_presses'], len(self.TEXT))
+        self.assertEqual(result['stride'], len(self.TEXT))
+        self.assertTrue(result['authenticated'], result)
+
+    def test_imposter_stream_is_rejected(self):
+        stream = test_support.generate_stream(self.TEXT, 20, hold=(250, 400), flight=(400, 800), rng=self.rng)
+        self.assertFalse(self.predict_windows(stream)['authenticated'])
+
+
+if __name__ == '__main__':
+    unittest.main()
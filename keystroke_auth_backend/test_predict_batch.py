@@ -0,0 +1,81 @@
+"""
+Unit Tests for Batch Scoring
+
+/predict/batch answers with one NDJSON line per sample. A sample that
+cannot be scored gets an error line for its index and never fails the rest
+of the batch.
+
+Usage: python -m unittest test_predict_batch
+"""
+
+import json
+import random
+import unittest
+
+import test_support
+import app
+
+
+class PredictBatchTest(unittest.TestCase):
+
+    TEXT = 'batch of samples'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client = app.app.test_client()
+        cls.rng = random.Random(99)
+        for _ in range(6):
+            response = cls.client.post('/train', json={'user_id': 'batch_user', 'keystroke_data': cls.sample()})
+            assert response.status_code == 200, response.get_json()
+
+    @classmethod
+    def sample(cls):
+        return test_support.generate_sample(cls.TEXT, rng=cls.rng)
+
+    def predict_batch(self, body):
+        response = self.client.post('/predict/batch', json=body)
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        return {line['index']: line for line in lines}
+
+    def test_every_sample_gets_its_own_line(self):
+        results = self.predict_batch({'user_id': 'batch_user', 'samples': [
+            {'sample_id': 'ok', 'keystroke_data': self.sample()},
+            'not a sample',
+            {'user_id': ['batch_user'], 'keystroke_data': self.sample()},
+            {'user_id': {'id': 'batch_user'}, 'keystroke_data': self.sample()},
+            {'user_id': 'nobody', 'keystroke_data': self.sample()},
+            {'keystroke_data': []},
+            {'user_id': 12345, 'keystroke_data': self.sample()}
+        ]})
+        self.assertEqual(sorted(results), list(range(7)))
+        self.assertIn('authenticated', results[0])
+        self.assertEqual(results[0]['sample_id'], 'ok')
+        self.assertEqual(results[1]['error'], 'sample must be an object')
+        self.assertEqual(results[2]['error'], 'user_id must be a string or an integer')
+        self.assertEqual(results[3]['error'], 'user_id must be a string or an integer')
+        self.assertEqual(results[4]['error'], app.APIConfig.USER_MODEL_NOT_FOUND)
+        self.assertEqual(results[5]['error'], 'keystroke_data must be a non-empty list')
+        self.assertEqual(results[6]['user_id'], '12345')
+
+    def test_scored_samples_are_counted(self):
+        def counted():
+            return app.predictions.value(result='genuine') + app.predictions.value(result='anomaly')
+
+        before = counted()
+        results = self.predict_batch({'user_id': 'batch_user', 'samples': [
+            {'keystroke_data': self.sample()}, {'keystroke_data': self.sample()}, {'keystroke_data': []}
+        ]})
+        self.assertEqual(len(results), 3)
+        self.assertEqual(counted() - before, 2)
+        metrics = self.client.get('/metrics').get_data(as_text=True)
+        for stage in ('parse_request', 'load_model', 'extract_features', 'score'):
+            self.assertIn(f'endpoint="predict_batch",stage="{stage}"', metrics)
+
+    def test_missing_user_id(self):
+        results = self.predict_batch({'samples': [{'keystroke_data': self.sample()}]})
+        self.assertEqual(results[0]['error'], 'Missing required field: user_id')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+"""
+Unit Tests for Bounded Sample Histories
+
+Each eviction policy must keep the samples it promises, storage must apply
+it once a history outgrows its trim threshold, and /train must not mistake
+older samples for new ones after the reservoir policy dropped the samples
+just enrolled.
+
+Usage: python -m unittest test_sample_history
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+import test_support
+import app
+from feature_schema import FIXED_SCHEMA
+from sample_history import HISTORY_CENTROID, HISTORY_LAST, HISTORY_RESERVOIR, SampleHistory
+from storage import FileStorage, SQLiteStorage
+
+
+def ids(count, start=0):
+    """Samples that are just their append position, so kept samples can be told apart."""
+    return [np.array([float(position)], dtype=np.float32) for position in range(start, start + count)]
+
+
+def append_one_at_a_time(history, total):
+    """Append positions 0..total-1 one by one, returning the positions kept at the end."""
+    stored = []
+    for position in range(total):
+        stored.append(position)
+        stored = [stored[index] for index in history.keep(stored, 1, position + 1)]
+    return stored
+
+
+def append_in_batches(history, total):
+    """Like append_one_at_a_time, but only trimming once the history outgrows its trim threshold."""
+    stored = []
+    for position in range(total):
+        stored.append(position)
+        if history.needs_trim(len(stored)):
+            stored = [stored[index] for index in history.keep(stored, 1, position + 1)]
+    return stored
+
+
+class PolicyTest(unittest.TestCase):
+
+    def test_under_the_cap_keeps_everything(self):
+        for policy in (HISTORY_LAST, HISTORY_RESERVOIR, HISTORY_CENTROID):
+            with self.subTest(policy=policy):
+                self.assertEqual(SampleHistory(10, policy, seed=0).keep(ids(10), 3, 10), list(range(10)))
+
+    def test_last_keeps_most_recent(self):
+        history = SampleHistory(5, HISTORY_LAST)
+        self.assertEqual(history.keep(ids(8), 3, 8), [3, 4, 5, 6, 7])
+        # More new samples than the cap: only the newest of them
+        self.assertEqual(history.keep(ids(12), 8, 12), [7, 8, 9, 10, 11])
+        self.assertEqual(append_one_at_a_time(history, 30), list(range(25, 30)))
+        self.assertFalse(history.may_evict_new_samples)
+
+    def test_reservoir_keeps_a_uniform_sample(self):
+        max_samples, total, trials = 10, 50, 600
+        kept_counts = np.zeros(total)
+        for seed in range(trials):
+            kept = append_one_at_a_time(SampleHistory(max_samples, HISTORY_RESERVOIR, seed=seed), total)
+            self.assertEqual(len(kept), max_samples)
+            self.assertEqual(kept, sorted(kept))
+            kept_counts[kept] += 1
+        # Every position is kept with probability max_samples / total = 0.2
+        frequencies = kept_counts / trials
+        self.assertAlmostEqual(frequencies[:total // 2].mean(), 0.2, delta=0.02)
+        self.assertAlmostEqual(frequencies[total // 2:].mean(), 0.2, delta=0.02)
+        self.assertTrue(np.all(np.abs(frequencies - 0.2) < 0.08), frequencies)
+
+    def test_reservoir_trimmed_in_batches_stays_uniform(self):
+        max_samples, total, trials = 10, 54, 600
+        kept_counts = np.zeros(total)
+        for seed in range(trials):
+            # Histories are trimmed from 21 back to 10 samples, the last time on the 54th append
+            kept = append_in_batches(SampleHistory(max_samples, HISTORY_RESERVOIR, seed=seed), total)
+            self.assertEqual(len(kept), max_samples)
+            self.assertEqual(kept, sorted(kept))
+            kept_counts[kept] += 1
+        frequencies = kept_counts / trials
+        expected = max_samples / total
+        self.assertAlmostEqual(frequencies[:total // 2].mean(), expected, delta=0.02)
+        self.assertAlmostEqual(frequencies[total // 2:].mean(), expected, delta=0.02)
+        self.assertTrue(np.all(np.abs(frequencies - expected) < 0.08), frequencies)
+
+    def test_reservoir_may_drop_new_samples(self):
+        history = SampleHistory(10, HISTORY_RESERVOIR, seed=0)
+        self.assertTrue(history.may_evict_new_samples)
+        # Late in the stream a new sample enters with probability 10 / 1000
+        dropped = sum(10 not in history.keep(ids(11), 1, 1000) for _ in range(200))
+        self.assertGreater(dropped, 150)
+
+    def test_reservoir_after_lowering_the_cap(self):
+        kept = SampleHistory(4, HISTORY_RESERVOIR, seed=1).keep(ids(10), 1, 10)
+        self.assertEqual(len(kept), 4)
+        self.assertEqual(kept, sorted(kept))
+
+    def test_centroid_keeps_new_samples_and_drops_outliers(self):
+        rng = np.random.default_rng(0)
+        samples = [rng.normal(100, 5, size=6) for _ in range(10)]
+        samples[2] = np.full(6, 400.0)
+        samples[6] = np.full(6, -300.0)
+        # The new sample is kept however far it is from the centroid
+        samples.append(np.full(6, 1000.0))
+        history = SampleHistory(9, HISTORY_CENTROID)
+        self.assertEqual(history.keep(samples, 1, 11), [0, 1, 3, 4, 5, 7, 8, 9, 10])
+        self.assertFalse(history.may_evict_new_samples)
+
+    def test_centroid_with_samples_of_different_lengths(self):
+        samples = [np.full(length, 100.0) for length in (4, 5, 4, 6, 5)] + [np.full(7, 100.0)]
+        self.assertEqual(SampleHistory(4, HISTORY_CENTROID).keep(samples, 1, 6)[-1], 5)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            SampleHistory(10, 'fifo')
+        with self.assertRaises(ValueError):
+            SampleHistory(0)
+        with self.assertRaises(ValueError):
+            SampleHistory(10, trim_factor=0.5)
+
+    def test_needs_trim(self):
+        self.assertFalse(SampleHistory(5).needs_trim(10))
+        self.assertTrue(SampleHistory(5).needs_trim(11))
+        self.assertTrue(SampleHistory(5, trim_factor=1).needs_trim(6))
+
+
+class StorageHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def storages(self, history):
+        yield FileStorage(os.path.join(self.tmp_dir.name, 'files'), history=history)
+        yield SQLiteStorage(os.path.join(self.tmp_dir.name, 'keystroke.db'), history=history)
+
+    def stored(self, storage):
+        return [float(sample[0]) for sample in storage.read_samples('alice', FIXED_SCHEMA)]
+
+    def test_append_trims_past_the_threshold(self):
+        for storage in self.storages(SampleHistory(5, HISTORY_LAST)):
+            with self.subTest(storage=type(storage).__name__):
+                self.assertEqual(storage.append_samples('alice', ids(4), FIXED_SCHEMA), 4)
+                # Past the cap but within twice the cap, nothing is rewritten
+                self.assertEqual(storage.append_samples('alice', ids(3, start=4), FIXED_SCHEMA), 7)
+                self.assertEqual(storage.append_samples('alice', ids(3, start=7), FIXED_SCHEMA), 10)
+                self.assertEqual(self.stored(storage), [float(position) for position in range(10)])
+                self.assertEqual(storage.append_samples('alice', ids(1, start=10), FIXED_SCHEMA), 5)
+                self.assertEqual(self.stored(storage), [6.0, 7.0, 8.0, 9.0, 10.0])
+                info = storage.read_user_info('alice')
+                self.assertEqual(info['samples'], {FIXED_SCHEMA: 5})
+                self.assertEqual(info['appended'], {FIXED_SCHEMA: 11})
+
+    def test_trim_factor_one_trims_every_append(self):
+        for storage in self.storages(SampleHistory(5, HISTORY_LAST, trim_factor=1)):
+            with self.subTest(storage=type(storage).__name__):
+                self.assertEqual(storage.append_samples('alice', ids(4), FIXED_SCHEMA), 4)
+                self.assertEqual(storage.append_samples('alice', ids(3, start=4), FIXED_SCHEMA), 5)
+                self.assertEqual(self.stored(storage), [2.0, 3.0, 4.0, 5.0, 6.0])
+                self.assertEqual(storage.read_user_info('alice')['appended'], {FIXED_SCHEMA: 7})
+
+
+class TrainingAfterEvictionTest(unittest.TestCase):
+    """/train with a full sample history, for every policy."""
+
+    TEXT = 'correct horse battery'
+    MAX_SAMPLES = 8
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.rng = random.Random(42)
+        self.previous_history = app.storage.history
+
+    def tearDown(self):
+        app.storage.history = self.previous_history
+
+    def train(self, user_id):
+        response = self.client.post('/train', json={
+            'user_id': user_id,
+            'keystroke_data': test_support.generate_sample(self.TEXT, rng=self.rng)
+        })
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return response.get_json()
+
+    def enroll_past_a_trim(self, policy, trim_factor):
+        """Fill a user's history up to its trim threshold, then return the results of three more enrollments."""
+        app.storage.history = SampleHistory(self.MAX_SAMPLES, policy, seed=0, trim_factor=trim_factor)
+        user_id = f'history_{policy}_{trim_factor}'
+        n_fill = self.MAX_SAMPLES * trim_factor
+        for _ in range(n_fill):
+            self.train(user_id)
+        results = [self.train(user_id) for _ in range(3)]
+        metadata = app.load_user_metadata(user_id)
+        self.assertEqual(metadata['samples_count'], results[-1]['samples_count'])
+        self.assertEqual(metadata['samples_seen'], n_fill + 3)
+        return [result['samples_count'] for result in results], [result['training_mode'] for result in results]
+
+    def test_policies_keeping_new_samples_update_incrementally(self):
+        for policy in (HISTORY_LAST, HISTORY_CENTROID):
+            for trim_factor, counts in ((1, [8, 8, 8]), (2, [8, 9, 10])):
+                with self.subTest(policy=policy, trim_factor=trim_factor):
+                    self.assertEqual(self.enroll_past_a_trim(policy, trim_factor), (counts, ['incremental'] * 3))
+
+    def test_reservoir_refits_after_eviction(self):
+        self.assertEqual(self.enroll_past_a_trim(HISTORY_RESERVOIR, 1), ([8, 8, 8], ['full'] * 3))
+        # Between trims nothing is evicted, so the model is updated again
+        self.assertEqual(self.enroll_past_a_trim(HISTORY_RESERVOIR, 2),
+                         ([8, 9, 10], ['full', 'incremental', 'incremental']))
+
+if __name__ == '__main__':
+    unittest.main()
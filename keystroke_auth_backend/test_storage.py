@@ -0,0 +1,257 @@
+"""
+Unit Tests for the Storage Backends
+
+Both backends must give back what was stored in them: samples per schema,
+the user info index, models with their metadata and decision thresholds,
+also when read through another storage instance as another worker process
+would. Every user's files must survive a layout migration under the right
+user and schema, including user ids that end in a schema name.
+
+Usage: python -m unittest test_storage
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from compact_forest import FlatForest
+from feature_schema import FIXED_SCHEMA, POSITIONAL_SCHEMA
+from storage import LAYOUT_FLAT, LAYOUT_SHARDED, FileStorage, SQLiteStorage, copy_storage, migrate_layout
+
+
+def make_samples(count, length, seed):
+    """Random float32 feature vectors."""
+    rng = np.random.default_rng(seed)
+    return [rng.normal(100, 30, size=length).astype(np.float32) for _ in range(count)]
+
+
+def make_forest(seed=0):
+    """Small FlatForest fitted on random data."""
+    rng = np.random.default_rng(seed)
+    return FlatForest.from_sklearn(IsolationForest(n_estimators=10, random_state=seed).fit(rng.normal(size=(50, 6))))
+
+
+def assert_samples_equal(test, expected, actual):
+    test.assertEqual(len(expected), len(actual))
+    for expected_sample, actual_sample in zip(expected, actual):
+        np.testing.assert_array_equal(np.asarray(actual_sample), expected_sample)
+
+
+class StorageRoundTripTests:
+    """Round-trip tests run against every backend; subclasses implement open_storage."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = self.open_storage()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def open_storage(self):
+        raise NotImplementedError
+
+    def test_samples(self):
+        positional = [np.arange(length, dtype=np.float32) for length in (5, 9, 7)]
+        fixed = make_samples(6, 12, 0)
+        self.assertFalse(self.storage.has_samples('alice', POSITIONAL_SCHEMA))
+        self.assertEqual(self.storage.read_samples('alice', POSITIONAL_SCHEMA), [])
+
+        self.assertEqual(self.storage.append_sample('alice', positional[0], POSITIONAL_SCHEMA), 1)
+        self.assertEqual(self.storage.append_samples('alice', positional[1:], POSITIONAL_SCHEMA), 3)
+        self.assertEqual(self.storage.append_samples('alice', fixed, FIXED_SCHEMA), 6)
+
+        for storage in (self.storage, self.open_storage()):
+            self.assertTrue(storage.has_samples('alice', POSITIONAL_SCHEMA))
+            assert_samples_equal(self, positional, storage.read_samples('alice', POSITIONAL_SCHEMA))
+            assert_samples_equal(self, fixed, storage.read_samples('alice', FIXED_SCHEMA))
+            self.assertEqual(storage.read_samples('bob', FIXED_SCHEMA), [])
+
+        self.storage.write_samples('alice', fixed[:2], FIXED_SCHEMA)
+        assert_samples_equal(self, fixed[:2], self.open_storage().read_samples('alice', FIXED_SCHEMA))
+        assert_samples_equal(self, positional, self.storage.read_samples('alice', POSITIONAL_SCHEMA))
+
+    def test_user_info(self):
+        self.assertEqual(self.storage.read_user_info('alice'),
+                         {'samples': {}, 'appended': {}, 'has_model': False, 'model': None})
+
+        self.storage.append_samples('alice', make_samples(4, 12, 0), FIXED_SCHEMA)
+        self.storage.append_samples('alice', make_samples(2, 12, 1), FIXED_SCHEMA)
+        self.storage.append_samples('alice', make_samples(3, 20, 2), POSITIONAL_SCHEMA)
+        info = self.storage.read_user_info('alice')
+        self.assertEqual(info['samples'], {FIXED_SCHEMA: 6, POSITIONAL_SCHEMA: 3})
+        self.assertEqual(info['appended'], {FIXED_SCHEMA: 6, POSITIONAL_SCHEMA: 3})
+        self.assertFalse(info['has_model'])
+
+        # Rewriting keeps the count of samples ever appended unless one is given
+        self.storage.write_samples('alice', make_samples(2, 12, 3), FIXED_SCHEMA)
+        self.assertEqual(self.storage.read_user_info('alice')['appended'][FIXED_SCHEMA], 6)
+        self.storage.write_samples('alice', make_samples(2, 12, 3), FIXED_SCHEMA, appended=10)
+
+        metadata = {'model_version': 3, 'max_feature_length': 12, 'feature_schema': FIXED_SCHEMA,
+                    'created_at': '2024-01-01T00:00:00', 'samples_count': 2, 'samples_seen': 10}
+        self.storage.write_model('alice', make_forest(), metadata)
+        for storage in (self.storage, self.open_storage()):
+            info = storage.read_user_info('alice')
+            self.assertEqual(info['samples'], {FIXED_SCHEMA: 2, POSITIONAL_SCHEMA: 3})
+            self.assertEqual(info['appended'], {FIXED_SCHEMA: 10, POSITIONAL_SCHEMA: 3})
+            self.assertTrue(info['has_model'])
+            self.assertEqual(info['model'], {field: metadata[field] for field in
+                                             ('model_version', 'max_feature_length', 'feature_schema',
+                                              'created_at', 'samples_count')})
+
+    def test_model(self):
+        X = np.random.default_rng(1).normal(size=(40, 6))
+        self.assertIsNone(self.storage.read_model('alice'))
+        self.assertEqual(self.storage.read_metadata_with_stamp('alice'), (None, None))
+
+        forest = make_forest()
+        stamp = self.storage.write_model('alice', forest, {'model_version': 1})
+        self.assertEqual(self.storage.metadata_stamp('alice'), stamp)
+        sklearn_model = IsolationForest(n_estimators=10, random_state=0).fit(X)
+        self.storage.write_model('bob', sklearn_model, {'model_version': 1}, compression='zlib')
+
+        for storage in (self.storage, self.open_storage()):
+            loaded = storage.read_model('alice')
+            self.assertIsInstance(loaded, FlatForest)
+            np.testing.assert_array_equal(loaded.score_samples(X), forest.score_samples(X))
+            np.testing.assert_array_equal(storage.read_model('bob').score_samples(X), sklearn_model.score_samples(X))
+            self.assertEqual(sorted(storage.list_users()), ['alice', 'bob'])
+            self.assertEqual(storage.user_ids(), ['alice', 'bob'])
+
+            models = storage.read_models(['alice', 'bob', 'carol'])
+            self.assertEqual(sorted(models), ['alice', 'bob'])
+            model, metadata, model_stamp = models['alice']
+            np.testing.assert_array_equal(model.score_samples(X), forest.score_samples(X))
+            self.assertEqual(metadata, {'model_version': 1})
+            self.assertEqual(model_stamp, storage.metadata_stamp('alice'))
+
+        # Replacing the model replaces the metadata and changes the stamp
+        retrained = make_forest(seed=1)
+        new_stamp = self.storage.write_model('alice', retrained, {'model_version': 2})
+        self.assertNotEqual(new_stamp, stamp)
+        np.testing.assert_array_equal(self.open_storage().read_model('alice').score_samples(X),
+                                      retrained.score_samples(X))
+        self.assertEqual(self.open_storage().read_metadata('alice'), {'model_version': 2})
+
+    def test_threshold(self):
+        self.storage.write_model('alice', make_forest(), {'model_version': 1, 'decision_threshold': None})
+        stamp = self.storage.metadata_stamp('alice')
+
+        metadata = self.storage.read_metadata('alice')
+        metadata['decision_threshold'] = -0.0125
+        new_stamp = self.storage.write_metadata('alice', metadata)
+        self.assertNotEqual(new_stamp, stamp)
+
+        for storage in (self.storage, self.open_storage()):
+            metadata, metadata_stamp = storage.read_metadata_with_stamp('alice')
+            self.assertEqual(metadata['decision_threshold'], -0.0125)
+            self.assertEqual(metadata_stamp, new_stamp)
+            # Writing metadata alone keeps the model
+            self.assertIsNotNone(storage.read_model('alice'))
+
+        metadata['decision_threshold'] = None
+        self.storage.write_metadata('alice', metadata)
+        self.assertIsNone(self.open_storage().read_metadata('alice')['decision_threshold'])
+
+    def test_copy_to_sqlite(self):
+        self.storage.append_samples('alice', make_samples(3, 12, 0), FIXED_SCHEMA)
+        self.storage.write_samples('alice', make_samples(2, 12, 0), FIXED_SCHEMA, appended=7)
+        self.storage.write_model('alice', make_forest(), {'model_version': 4, 'decision_threshold': 0.01})
+        self.storage.append_samples('bob', make_samples(2, 20, 1), POSITIONAL_SCHEMA)
+
+        copy = SQLiteStorage(os.path.join(self.tmp_dir.name, 'copy.db'))
+        self.assertEqual(copy_storage(self.storage, copy), 2)
+        for user_id in ('alice', 'bob'):
+            self.assertEqual(copy.read_user_info(user_id), self.storage.read_user_info(user_id))
+            self.assertEqual(copy.read_metadata(user_id), self.storage.read_metadata(user_id))
+            for schema in (POSITIONAL_SCHEMA, FIXED_SCHEMA):
+                assert_samples_equal(self, self.storage.read_samples(user_id, schema), copy.read_samples(user_id, schema))
+
+
+class FlatFileStorageTest(StorageRoundTripTests, unittest.TestCase):
+
+    def open_storage(self):
+        return FileStorage(self.tmp_dir.name, LAYOUT_FLAT)
+
+
+class ShardedFileStorageTest(StorageRoundTripTests, unittest.TestCase):
+
+    def open_storage(self):
+        return FileStorage(self.tmp_dir.name, LAYOUT_SHARDED)
+
+    def test_numeric_user_id(self):
+        samples = make_samples(2, 12, 0)
+        self.storage.append_samples(12345, samples, FIXED_SCHEMA)
+        self.assertEqual(self.storage.user_dir(12345), self.storage.user_dir('12345'))
+        assert_samples_equal(self, samples, self.open_storage().read_samples('12345', FIXED_SCHEMA))
+
+
+class SQLiteStorageTest(StorageRoundTripTests, unittest.TestCase):
+
+    def open_storage(self):
+        return SQLiteStorage(os.path.join(self.tmp_dir.name, 'keystroke.db'))
+
+
+class MigrateLayoutTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        # 'bob_fixed' has positional samples, 'bob' samples in both schemas
+        self.samples = {
+            ('bob', POSITIONAL_SCHEMA): make_samples(3, 20, 1),
+            ('bob', FIXED_SCHEMA): make_samples(4, 12, 2),
+            ('bob_fixed', POSITIONAL_SCHEMA): make_samples(5, 20, 3),
+            ('bob_fixed_fixed', FIXED_SCHEMA): make_samples(6, 12, 4)
+        }
+        storage = FileStorage(self.root, LAYOUT_FLAT)
+        for (user_id, schema), samples in self.samples.items():
+            storage.append_samples(user_id, samples, schema)
+        storage.write_model('bob_fixed', make_forest(), {'feature_schema': POSITIONAL_SCHEMA, 'samples_count': 5})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assertUsersIntact(self, layout):
+        storage = FileStorage(self.root, layout)
+        self.assertEqual(storage.user_ids(), ['bob', 'bob_fixed', 'bob_fixed_fixed'])
+        for user_id in storage.user_ids():
+            for schema in (POSITIONAL_SCHEMA, FIXED_SCHEMA):
+                with self.subTest(layout=layout, user_id=user_id, schema=schema):
+                    assert_samples_equal(self, self.samples.get((user_id, schema), []),
+                                         storage.read_samples(user_id, schema))
+                    self.assertEqual(storage.has_samples(user_id, schema), (user_id, schema) in self.samples)
+        self.assertEqual(list(storage.list_users()), ['bob_fixed'])
+        self.assertIsNotNone(storage.read_model('bob_fixed'))
+        self.assertEqual(storage.read_user_info('bob')['samples'], {POSITIONAL_SCHEMA: 3, FIXED_SCHEMA: 4})
+        self.assertEqual(storage.read_user_info('bob_fixed')['samples'], {POSITIONAL_SCHEMA: 5})
+
+    def test_flat_to_sharded_and_back(self):
+        self.assertUsersIntact(LAYOUT_FLAT)
+
+        moved, users = migrate_layout(self.root, LAYOUT_SHARDED)
+        self.assertEqual(users, 3)
+        self.assertGreater(moved, 0)
+        self.assertUsersIntact(LAYOUT_SHARDED)
+        self.assertEqual(migrate_layout(self.root, LAYOUT_SHARDED), (0, 0))
+
+        migrate_layout(self.root, LAYOUT_FLAT)
+        self.assertUsersIntact(LAYOUT_FLAT)
+        self.assertEqual(migrate_layout(self.root, LAYOUT_FLAT), (0, 0))
+
+    def test_dry_run_moves_nothing(self):
+        before = sorted(os.path.relpath(os.path.join(directory, filename), self.root)
+                        for directory, _, filenames in os.walk(self.root) for filename in filenames)
+        moved, users = migrate_layout(self.root, LAYOUT_SHARDED, dry_run=True)
+        self.assertEqual(users, 3)
+        after = sorted(os.path.relpath(os.path.join(directory, filename), self.root)
+                       for directory, _, filenames in os.walk(self.root) for filename in filenames)
+        self.assertEqual(before, after)
+        self.assertUsersIntact(LAYOUT_FLAT)
+
+
+if __name__ == '__main__':
+    unittest.main()
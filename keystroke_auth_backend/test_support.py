@@ -0,0 +1,60 @@
+"""
+Shared Helpers for the Unit Tests of the Keystroke Dynamics Authentication Backend
+
+Importing this module points MODEL_DIR at a fresh temporary directory and
+makes training run inline before the app is imported, so test modules can
+import the app without touching a real model directory:
+
+    python -m unittest discover -p 'test_*.py'
+
+It also generates synthetic keystroke samples of a typist with a stable
+rhythm.
+"""
+
+import os
+import random
+import tempfile
+
+os.environ['MODEL_DIR'] = tempfile.mkdtemp(prefix='keystroke-tests-')
+os.environ.setdefault('ASYNC_TRAINING_ENABLED', 'false')
+os.environ.setdefault('MODEL_PRELOAD_ENABLED', 'false')
+os.environ.setdefault('LOG_SAMPLE_RATE', '0')
+os.environ.setdefault('LOG_REQUEST_SAMPLE_RATE', '0')
+
+
+def generate_sample(text, hold=(100, 140), flight=(80, 160), start=0, rng=random):
+    """
+    Keystroke events of one typed text, in timestamp order.
+
+    Args:
+        text (str): Typed characters, one key press each
+        hold (tuple): Range of hold times in milliseconds
+        flight (tuple): Range of keyup to next keydown times in milliseconds,
+                        negative values overlap consecutive presses
+        start (int): Timestamp of the first keydown
+        rng (random.Random): Random source
+
+    Returns:
+        list: Keystroke events
+    """
+    events = []
+    released = {}
+    timestamp = start
+    for key in text:
+        # A key cannot be pressed again before it is released
+        timestamp = max(timestamp, released.get(key, timestamp) + 1)
+        hold_time = rng.randint(*hold)
+        events.append({"key": key, "event": "down", "timestamp": timestamp})
+        events.append({"key": key, "event": "up", "timestamp": timestamp + hold_time})
+        released[key] = timestamp + hold_time
+        timestamp += hold_time + rng.randint(*flight)
+    return sorted(events, key=lambda event: event['timestamp'])
+
+
+def generate_stream(text, repetitions, pause=(300, 900), rng=random, **timing):
+    """Keystroke events of a text typed several times with pauses in between."""
+    events = []
+    for _ in range(repetitions):
+        start = events[-1]['timestamp'] + rng.randint(*pause) if events else 0
+        events.extend(generate_sample(text, start=start, rng=rng, **timing))
+    return events
@@ -0,0 +1,94 @@
+"""
+Unit Tests for Incremental Model Updates
+
+An incremental update must score with the kept trees and the new ones,
+anchor its decision offset on the whole retained history like a full refit,
+and refit the whole model when scikit-learn lacks the internals it splices.
+
+Usage: python -m unittest test_training
+"""
+
+import random
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import test_support
+import app
+from compact_forest import FlatForest
+from config import ModelConfig
+from training import IncrementalUpdateUnsupported, fit_full_model, update_model_incrementally
+
+
+class IncrementalUpdateTest(unittest.TestCase):
+
+    # Path lengths are summed in a different order than scikit-learn
+    TOLERANCE = 1e-8
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.history = rng.normal(100, 30, size=(300, 12))
+        # The recent window drifted away from the older samples
+        self.history[-40:] += 60
+        self.recent = self.history[-40:]
+        self.X = rng.normal(120, 40, size=(50, 12))
+        self.model = fit_full_model(self.history[:-40], n_jobs=1)
+
+    def test_scores_use_kept_and_new_trees(self):
+        updated = update_model_incrementally(self.model, self.recent, self.history, seed=1)
+        n_new_trees = ModelConfig.INCREMENTAL_TREES_PER_UPDATE
+        self.assertEqual(len(updated.estimators_), len(self.model.estimators_))
+        self.assertEqual(updated.estimators_[:-n_new_trees], self.model.estimators_[n_new_trees:])
+        # The passed model is left untouched
+        self.assertEqual(len(self.model._decision_path_lengths), len(self.model.estimators_))
+        self.assertNotEqual(updated.score_samples(self.X).tolist(), self.model.score_samples(self.X).tolist())
+        # Flattening the updated forest or updating the flattened forest gives the same scores
+        flat_updated = update_model_incrementally(FlatForest.from_sklearn(self.model), self.recent, self.history, seed=1)
+        np.testing.assert_allclose(FlatForest.from_sklearn(updated).score_samples(self.X), updated.score_samples(self.X),
+                                   rtol=0, atol=self.TOLERANCE)
+        np.testing.assert_allclose(flat_updated.score_samples(self.X), updated.score_samples(self.X),
+                                   rtol=0, atol=self.TOLERANCE)
+
+    def test_offset_covers_the_history(self):
+        contamination = 100.0 * app.config.ISOLATION_FOREST_CONTAMINATION
+        for model in (self.model, FlatForest.from_sklearn(self.model)):
+            with self.subTest(model=type(model).__name__):
+                updated = update_model_incrementally(model, self.recent, self.history, seed=1)
+                self.assertAlmostEqual(updated.offset_, np.percentile(updated.score_samples(self.history), contamination))
+                self.assertNotAlmostEqual(updated.offset_, np.percentile(updated.score_samples(self.recent), contamination))
+                np.testing.assert_allclose(updated.decision_function(self.X),
+                                           updated.score_samples(self.X) - updated.offset_, rtol=0, atol=self.TOLERANCE)
+
+    def test_missing_internals_are_reported(self):
+        del self.model._decision_path_lengths
+        with self.assertRaises(IncrementalUpdateUnsupported):
+            update_model_incrementally(self.model, self.recent, self.history, seed=1)
+
+
+class TrainingFallbackTest(unittest.TestCase):
+
+    TEXT = 'fallback to a refit'
+
+    def test_refits_when_the_update_is_unsupported(self):
+        client = app.app.test_client()
+        rng = random.Random(3)
+
+        def train():
+            response = client.post('/train', json={
+                'user_id': 'unsupported_update',
+                'keystroke_data': test_support.generate_sample(self.TEXT, rng=rng)
+            })
+            self.assertEqual(response.status_code, 200, response.get_json())
+            return response.get_json()
+
+        for _ in range(app.config.MIN_SAMPLES_FOR_TRAINING):
+            train()
+        self.assertEqual(train()['training_mode'], 'incremental')
+        with mock.patch.object(app, 'update_model_incrementally',
+                               side_effect=IncrementalUpdateUnsupported("IsolationForest has no _seeds")):
+            self.assertEqual(train()['training_mode'], 'full')
+
+
+if __name__ == '__main__':
+    unittest.main()
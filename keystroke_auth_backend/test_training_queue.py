@@ -0,0 +1,76 @@
+"""
+Unit Tests for a Full Training Queue
+
+When no more users can have a pending training job, /train, /train/bulk
+and the adaptive refresh keep the samples stored and report that training
+was not scheduled. They never fit a model on the calling thread.
+
+Usage: python -m unittest test_training_queue
+"""
+
+import random
+import unittest
+from unittest import mock
+
+import test_support
+import app
+from feature_schema import FIXED_SCHEMA
+from training_queue import TrainingQueueFull
+
+
+class FullQueue:
+    """Training queue that never accepts a job."""
+
+    def submit(self, user_id):
+        raise TrainingQueueFull("1 users already have pending training jobs")
+
+
+class FullQueueTest(unittest.TestCase):
+
+    TEXT = 'queue is full today'
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.rng = random.Random(7)
+        patches = [
+            mock.patch.object(app, 'training_queue', FullQueue()),
+            mock.patch.object(app, 'train_user_model', side_effect=AssertionError("fitted inline"))
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def sample(self):
+        return test_support.generate_sample(self.TEXT, rng=self.rng)
+
+    def test_train_returns_503_and_keeps_the_sample(self):
+        for expected_count in range(1, app.config.MIN_SAMPLES_FOR_TRAINING + 1):
+            response = self.client.post('/train', json={'user_id': 'full_queue', 'keystroke_data': self.sample()})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], str(app.config.TRAINING_RETRY_AFTER_SECONDS))
+        body = response.get_json()
+        self.assertEqual(body['samples_count'], expected_count)
+        self.assertIsNone(body['training_job'])
+        self.assertEqual(len(app.storage.read_samples('full_queue', FIXED_SCHEMA)), expected_count)
+
+    def test_bulk_reports_users_left_untrained(self):
+        n_samples = app.config.MIN_SAMPLES_FOR_TRAINING
+        response = self.client.post('/train/bulk', json={'users': [
+            {'user_id': 'full_queue_bulk', 'samples': [self.sample() for _ in range(n_samples)]}
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Retry-After', response.headers)
+        result = response.get_json()['users'][0]
+        self.assertEqual(result['samples_count'], n_samples)
+        self.assertIsNone(result['training_job'])
+        self.assertFalse(result['model_trained'])
+
+    def test_refresh_keeps_the_samples(self):
+        n_samples = app.config.MIN_SAMPLES_FOR_TRAINING
+        features = [app.extract_features(self.sample(), FIXED_SCHEMA) for _ in range(n_samples)]
+        app.refresh_user_model('full_queue_refresh', FIXED_SCHEMA, features)
+        self.assertEqual(len(app.storage.read_samples('full_queue_refresh', FIXED_SCHEMA)), n_samples)
+
+
+if __name__ == '__main__':
+    unittest.main()
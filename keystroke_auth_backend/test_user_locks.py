@@ -0,0 +1,85 @@
+"""
+Unit Tests for Per-User Locks and User Ids
+
+User ids arrive as JSON strings or numbers. A numeric id must lock, enroll
+and authenticate the same user as its string form instead of failing.
+
+Usage: python -m unittest test_user_locks
+"""
+
+import random
+import tempfile
+import threading
+import unittest
+
+import test_support
+import app
+from user_locks import UserLocks
+
+
+class UserLocksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.locks = UserLocks(self.tmp_dir.name, stripes=16)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_numeric_ids_share_the_stripe_of_their_string_form(self):
+        self.assertEqual(self.locks._stripe_path(12345), self.locks._stripe_path('12345'))
+        with self.locks.lock(12345):
+            pass
+
+    def test_lock_serializes_threads(self):
+        inside = []
+        overlaps = []
+
+        def work():
+            with self.locks.lock('alice'):
+                inside.append(1)
+                overlaps.append(len(inside) > 1)
+                threading.Event().wait(0.01)
+                inside.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [False] * 5)
+        self.assertEqual(self.locks._locks, {})
+
+
+class NumericUserIdTest(unittest.TestCase):
+
+    TEXT = 'numbers are users too'
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.rng = random.Random(12345)
+
+    def sample(self):
+        return test_support.generate_sample(self.TEXT, rng=self.rng)
+
+    def test_train_and_predict_with_a_numeric_id(self):
+        for _ in range(6):
+            response = self.client.post('/train', json={'user_id': 12345, 'keystroke_data': self.sample()})
+            self.assertEqual(response.status_code, 200, response.get_json())
+        self.assertTrue(response.get_json()['model_trained'])
+
+        for user_id in (12345, '12345'):
+            response = self.client.post('/predict', json={'user_id': user_id, 'keystroke_data': self.sample()})
+            self.assertEqual(response.status_code, 200, response.get_json())
+        self.assertEqual(self.client.get('/user/12345/info').status_code, 200)
+
+    def test_rejects_other_id_types(self):
+        for user_id in ([1, 2], {'id': 1}, None, True, 1.5):
+            for endpoint in ('/train', '/predict', '/predict/windows'):
+                with self.subTest(user_id=user_id, endpoint=endpoint):
+                    response = self.client.post(endpoint, json={'user_id': user_id, 'keystroke_data': self.sample()})
+                    self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+"""
+Model Training Module for Keystroke Dynamics Authentication Backend
+
+This module contains the IsolationForest training routines used by the Flask
+application. Besides the classic full refit over every stored sample, it
+provides an incremental update that replaces the oldest trees of an existing
+forest with a few new trees grown on the most recent samples, so the cost of
+a /train call stays flat as a user's sample history grows.
+"""
+
+import copy
+import logging
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from compact_forest import FlatForest
+from config import get_config, ModelConfig
+
+config = get_config()
+logger = logging.getLogger(__name__)
+
+# Private IsolationForest attributes spliced by update_model_incrementally
+INCREMENTAL_ATTRIBUTES = ('_seeds', '_average_path_length_per_tree', '_decision_path_lengths')
+
+
+class IncrementalUpdateUnsupported(Exception):
+    """Raised when the installed scikit-learn does not expose the forest internals an update splices."""
+
+
+def create_isolation_forest(n_estimators=None, max_samples=None, n_jobs=None, random_state=None):
+    """
+    Create an untrained IsolationForest using the application configuration.
+
+    Args:
+        n_estimators (int): Number of trees, defaults to ModelConfig.N_ESTIMATORS
+        max_samples (int or str): Samples drawn per tree, defaults to ModelConfig.MAX_SAMPLES
+        n_jobs (int): Parallel jobs for fitting, defaults to ModelConfig.N_JOBS
+        random_state (int): Random seed, defaults to the configured RANDOM_STATE
+
+    Returns:
+        IsolationForest: Unfitted model
+    """
+    return IsolationForest(
+        n_estimators=n_estimators if n_estimators is not None else ModelConfig.N_ESTIMATORS,
+        max_samples=max_samples if max_samples is not None else ModelConfig.MAX_SAMPLES,
+        contamination=config.ISOLATION_FOREST_CONTAMINATION,
+        random_state=random_state if random_state is not None else config.RANDOM_STATE,
+        bootstrap=ModelConfig.BOOTSTRAP,
+        n_jobs=n_jobs if n_jobs is not None else ModelConfig.N_JOBS
+    )
+
+
+def fit_full_model(padded_features, n_jobs=None):
+    """
+    Fit a fresh IsolationForest on every stored sample of a user.
+
+    Args:
+        padded_features (numpy.ndarray): 2D array of padded feature vectors
+        n_jobs (int): Parallel jobs for fitting, defaults to ModelConfig.N_JOBS
+
+    Returns:
+        IsolationForest: Trained model
+    """
+    model = create_isolation_forest(n_jobs=n_jobs)
+    model.fit(padded_features)
+    return model
+
+
+def needs_full_refit(model, max_feature_length, metadata, samples_count, new_feature_length):
+    """
+    Decide whether a training request must rebuild the whole forest.
+
+    A full refit is required when incremental training is disabled, when there
+    is no usable model yet, when the new sample is longer than the model input
+    (the feature dimension has to grow), or when FULL_REFIT_INTERVAL samples
+    have been added since the last full refit.
+
+    Args:
+        model: Currently trained model or None
+        max_feature_length (int): Input dimension of the current model
+        metadata (dict): Stored model metadata, may be empty
+        samples_count (int): Number of samples ever appended, including the new one
+        new_feature_length (int): Length of the newly extracted feature vector
+
+    Returns:
+        bool: True if a full refit should be performed
+    """
+    if not config.INCREMENTAL_TRAINING_ENABLED or model is None:
+        return True
+
+    if new_feature_length > max_feature_length:
+        return True
+
+    last_full_refit = metadata.get('full_refit_samples')
+    if last_full_refit is None:
+        # Models created before incremental training have no refit marker
+        return True
+
+    return samples_count - last_full_refit >= config.FULL_REFIT_INTERVAL
+
+
+def update_model_incrementally(model, recent_features, history_features=None, seed=None):
+    """
+    Replace the oldest trees of a fitted forest with trees grown on recent samples.
+
+    The new trees are fitted with the same per-tree sample size as the original
+    forest so path length normalisation stays consistent, and the decision
+    offset is recomputed over the retained sample history, as a full refit
+    would compute it. The passed model is left untouched; a shallow copy
+    carrying the new tree lists is returned, which keeps cached models safe
+    for concurrent prediction requests. A FlatForest is updated the same way,
+    with the new trees flattened before they are appended.
+
+    Args:
+        model (IsolationForest or FlatForest): Fitted model to update
+        recent_features (numpy.ndarray): 2D array of the most recent samples,
+                                         padded to the model input dimension
+        history_features (numpy.ndarray): 2D array of every retained sample,
+                                          padded the same way, used for the
+                                          decision offset; defaults to
+                                          recent_features
+        seed (int): Random seed for the new trees
+
+    Returns:
+        IsolationForest or FlatForest: Updated model of the same type
+
+    Raises:
+        IncrementalUpdateUnsupported: If the installed scikit-learn does not
+                                      expose the private attributes the
+                                      update relies on; refit the whole
+                                      model instead
+    """
+    if history_features is None:
+        history_features = recent_features
+    if not isinstance(model, FlatForest):
+        _check_incremental_attributes(model)
+
+    n_trees = model.n_estimators if isinstance(model, FlatForest) else len(model.estimators_)
+    n_new_trees = min(ModelConfig.INCREMENTAL_TREES_PER_UPDATE, n_trees)
+    max_samples = min(model.max_samples_, len(recent_features))
+
+    donor = create_isolation_forest(
+        n_estimators=n_new_trees,
+        max_samples=max_samples,
+        n_jobs=1,
+        random_state=seed
+    )
+    donor.fit(recent_features)
+    _check_incremental_attributes(donor)
+
+    if isinstance(model, FlatForest):
+        updated = model.replace_oldest_trees(FlatForest.from_sklearn(donor), model.offset_)
+        updated.offset_ = _history_offset(updated, history_features)
+        logger.debug("Replaced %s trees using %s recent samples", n_new_trees, len(recent_features))
+        return updated
+
+    updated = copy.copy(model)
+    updated.estimators_ = model.estimators_[n_new_trees:] + donor.estimators_
+    updated.estimators_features_ = model.estimators_features_[n_new_trees:] + donor.estimators_features_
+    updated._seeds = np.concatenate([model._seeds[n_new_trees:], donor._seeds])
+    updated._average_path_length_per_tree = (
+        tuple(model._average_path_length_per_tree[n_new_trees:]) +
+        tuple(donor._average_path_length_per_tree)
+    )
+    updated._decision_path_lengths = (
+        tuple(model._decision_path_lengths[n_new_trees:]) +
+        tuple(donor._decision_path_lengths)
+    )
+
+    updated.offset_ = _history_offset(updated, history_features)
+
+    logger.debug("Replaced %s trees using %s recent samples", n_new_trees, len(recent_features))
+    return updated
+
+
+def _check_incremental_attributes(model):
+    """Raise IncrementalUpdateUnsupported if a fitted IsolationForest lacks the internals an update splices."""
+    missing = [name for name in INCREMENTAL_ATTRIBUTES if not hasattr(model, name)]
+    if missing:
+        raise IncrementalUpdateUnsupported(f"IsolationForest has no {', '.join(missing)}")
+
+
+def _history_offset(model, history_features):
+    """Re-anchor the inlier/outlier threshold on the retained samples, like IsolationForest.fit."""
+    return np.percentile(
+        model.score_samples(history_features),
+        100.0 * config.ISOLATION_FOREST_CONTAMINATION
+    )
@@ -0,0 +1,266 @@
+"""
+Background Training Queue for Keystroke Dynamics Authentication Backend
+
+This module moves model fitting off the Flask request thread. Training jobs
+are executed on a bounded process pool so scikit-learn does not compete with
+request handling for the GIL. Jobs are coalesced per user: while a job for a
+user is still waiting, further /train requests for that user reuse it (the
+job reads the latest stored samples when it starts), and while a job is
+running at most one follow-up job is kept waiting.
+
+Job state is held in the memory of the process that accepted the request.
+
+run_user_jobs runs offline per-user jobs (bulk imports, retraining every
+user) on a process pool of its own, outside of any server.
+"""
+
+import logging
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from config import get_config
+
+config = get_config()
+logger = logging.getLogger(__name__)
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+
+class TrainingQueueFull(Exception):
+    """Raised when no more users can have a pending training job."""
+
+
+def run_training_job(user_id):
+    """
+    Train a user's model from the stored samples inside a worker process.
+
+    Args:
+        user_id (str): Unique identifier for the user
+
+    Returns:
+        dict: Training summary produced by app.train_user_model
+    """
+    # Imported lazily so worker processes only load the app when they run a job
+    from app import train_user_model
+    return train_user_model(user_id, n_jobs=1)
+
+
+def run_user_jobs(function, jobs, workers):
+    """
+    Run one job per user on a process pool and report the outcomes as they finish.
+
+    Args:
+        function (callable): Module level function, called as function(user_id, *args)
+                             in a worker process
+        jobs (list): (user_id, args) pairs
+        workers (int): Number of worker processes
+
+    Yields:
+        tuple: (user_id, result, error) in completion order, error being the
+               message of a job that raised and None otherwise
+    """
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context(config.TRAINING_START_METHOD)) as executor:
+        futures = {executor.submit(function, user_id, *args): user_id for user_id, args in jobs}
+        for future in as_completed(futures):
+            try:
+                result, error = future.result(), None
+            except Exception as e:
+                result, error = None, str(e)
+            yield futures[future], result, error
+
+
+class TrainingQueue:
+    """Bounded, per-user coalescing queue of background training jobs."""
+
+    def __init__(self, max_workers=None, max_pending_users=None, max_job_history=None, on_complete=None):
+        """
+        Args:
+            max_workers (int): Number of worker processes
+            max_pending_users (int): Maximum number of users with an unfinished job
+            max_job_history (int): Number of job records kept for status lookups
+            on_complete (callable): Called with (user_id, job) after a job finishes
+        """
+        self.max_workers = max_workers or config.TRAINING_WORKERS
+        self.max_pending_users = max_pending_users or config.TRAINING_QUEUE_SIZE
+        self.max_job_history = max_job_history or config.TRAINING_JOB_HISTORY
+        self.on_complete = on_complete
+
+        self._executor = None
+        # Re-entrant because a job that fails to submit finishes while the lock is held
+        self._lock = threading.RLock()
+        self._jobs = OrderedDict()
+        # user_id -> {'active': job_id or None, 'waiting': job_id or None}
+        self._users = {}
+
+    def _get_executor(self):
+        """Create the process pool on first use so importing the app stays cheap."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(config.TRAINING_START_METHOD)
+            )
+        return self._executor
+
+    def _new_job(self, user_id):
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'user_id': user_id,
+            'status': JOB_QUEUED,
+            'coalesced_requests': 1,
+            'created_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+        self._jobs[job['job_id']] = job
+        self._prune_history()
+        return job
+
+    def _prune_history(self):
+        while len(self._jobs) > self.max_job_history:
+            oldest_id = next(iter(self._jobs))
+            if self._jobs[oldest_id]['status'] not in (JOB_COMPLETED, JOB_FAILED):
+                break
+            self._jobs.popitem(last=False)
+
+    def submit(self, user_id):
+        """
+        Schedule a retrain for a user, coalescing with any job not yet started.
+
+        Args:
+            user_id (str): Unique identifier for the user
+
+        Returns:
+            dict: Snapshot of the job that will include the latest samples
+
+        Raises:
+            TrainingQueueFull: If too many users already have pending jobs
+        """
+        with self._lock:
+            state = self._users.get(user_id)
+
+            if state is None:
+                if len(self._users) >= self.max_pending_users:
+                    raise TrainingQueueFull(f"{len(self._users)} users already have pending training jobs")
+                state = {'active': None, 'waiting': None}
+                self._users[user_id] = state
+
+            # A job that has not started yet will read the new sample anyway
+            for slot in ('waiting', 'active'):
+                job_id = state[slot]
+                if job_id and self._jobs[job_id]['status'] == JOB_QUEUED and not self._started(job_id):
+                    self._jobs[job_id]['coalesced_requests'] += 1
+                    return self._snapshot(self._jobs[job_id])
+
+            job = self._new_job(user_id)
+            if state['active'] is None:
+                self._start(job)
+            else:
+                # Only one job per user runs at a time; this one follows it
+                state['waiting'] = job['job_id']
+            return self._snapshot(job)
+
+    def _started(self, job_id):
+        future = self._jobs[job_id].get('_future')
+        return future is not None and (future.running() or future.done())
+
+    def _start(self, job):
+        """Submit a job to the pool. Must be called with the lock held."""
+        state = self._users[job['user_id']]
+        state['active'] = job['job_id']
+        try:
+            future = self._get_executor().submit(run_training_job, job['user_id'])
+        except Exception as e:
+            # A broken pool is replaced on the next submission
+            logger.error(f"Could not submit training job for user {job['user_id']}: {e}")
+            self._executor = None
+            self._finish(job, error=str(e))
+            return
+        job['_future'] = future
+        future.add_done_callback(lambda f, job_id=job['job_id']: self._on_done(job_id, f))
+
+    def _on_done(self, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            try:
+                result, error = future.result(), None
+            except Exception as e:
+                logger.error(f"Training job {job_id} for user {job['user_id']} failed: {e}")
+                result, error = None, str(e)
+            self._finish(job, result=result, error=error)
+
+    def _finish(self, job, result=None, error=None):
+        """Record a job outcome and start the user's follow-up job. Lock must be held."""
+        job['status'] = JOB_FAILED if error else JOB_COMPLETED
+        job['result'] = result
+        job['error'] = error
+        job['finished_at'] = datetime.now().isoformat()
+        job.pop('_future', None)
+
+        user_id = job['user_id']
+        state = self._users[user_id]
+        state['active'] = None
+
+        if self.on_complete:
+            try:
+                self.on_complete(user_id, self._snapshot(job))
+            except Exception as e:
+                logger.error(f"Training completion hook failed for user {user_id}: {e}")
+
+        if state['waiting']:
+            waiting_job = self._jobs[state['waiting']]
+            state['waiting'] = None
+            self._start(waiting_job)
+        else:
+            del self._users[user_id]
+
+    def get_job(self, job_id):
+        """
+        Look up a job by id.
+
+        Returns:
+            dict: Job snapshot or None if unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def get_user_job(self, user_id):
+        """
+        Return the most relevant job for a user: waiting, running or last finished.
+
+        Returns:
+            dict: Job snapshot or None if the user has no known job
+        """
+        with self._lock:
+            state = self._users.get(user_id)
+            if state:
+                job_id = state['waiting'] or state['active']
+                return self._snapshot(self._jobs[job_id])
+            for job in reversed(self._jobs.values()):
+                if job['user_id'] == user_id:
+                    return self._snapshot(job)
+            return None
+
+    def _snapshot(self, job):
+        snapshot = {key: value for key, value in job.items() if not key.startswith('_')}
+        if job['status'] == JOB_QUEUED and self._started(job['job_id']):
+            snapshot['status'] = JOB_RUNNING
+        return snapshot
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
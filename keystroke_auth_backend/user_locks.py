@@ -0,0 +1,93 @@
+"""
+Per-User Locks for Keystroke Dynamics Authentication Backend
+
+This module serializes work on one user's model across the threads of a
+worker and across the worker and training processes on one machine, so two
+concurrent /train requests cannot fit and save the same user's model at the
+same time.
+
+Within a process every user gets its own lock. Across processes users are
+hashed onto a fixed number of lock files locked with flock(), so the number
+of lock files stays bounded however many users enroll; two users sharing a
+lock file only wait for each other while one of them is being trained. On
+platforms without fcntl (Windows) only the in-process locks are used.
+"""
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+DEFAULT_STRIPES = 256
+
+
+def user_digest(user_id):
+    """
+    MD5 digest of a user id, used to spread users over lock files and shards.
+
+    Ids are hashed in their string form, so a numeric id sent as a JSON
+    number maps to the same place as its string form in a URL.
+    """
+    return hashlib.md5(str(user_id).encode('utf-8')).digest()
+
+
+class UserLocks:
+    """Table of per-user locks shared by threads and processes."""
+
+    def __init__(self, directory, stripes=DEFAULT_STRIPES):
+        """
+        Args:
+            directory (str): Directory holding the lock files
+            stripes (int): Number of lock files users are hashed onto
+        """
+        self.directory = directory
+        self.stripes = stripes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # user_id -> [lock, number of threads holding or waiting for it]
+        self._locks = {}
+
+    def _stripe_path(self, user_id):
+        digest = user_digest(user_id)
+        stripe = int.from_bytes(digest[:4], 'little') % self.stripes
+        return os.path.join(self.directory, f"{stripe:03d}.lock")
+
+    @contextmanager
+    def _thread_lock(self, user_id):
+        """In-process lock of a user, dropped from the table once unused."""
+        with self._lock:
+            entry = self._locks.setdefault(user_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[user_id]
+
+    @contextmanager
+    def lock(self, user_id):
+        """
+        Hold a user's lock for the duration of the with block.
+
+        Args:
+            user_id (str): Unique identifier for the user
+        """
+        with self._thread_lock(user_id):
+            if fcntl is None:
+                yield
+                return
+            with open(self._stripe_path(user_id), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)